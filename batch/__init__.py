@@ -0,0 +1 @@
+"""Évaluation hors interface de tout le catalogue sous tous les scénarios."""
@@ -0,0 +1,161 @@
+"""Évalue chaque bien sous chaque scénario et écrit les résultats (CSV ou Parquet).
+
+Exemples :
+    python -m batch.run --output resultats.csv
+    python -m batch.run --output resultats.parquet --series series.parquet --pas-series 12
+    python -m batch.run --scenario default --workers 4 --taille-lot 500 --output resultats.csv
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.property import Property
+from models.repository import open_repository
+from models.scenario import ScenarioConfig, load_scenarios
+from models.simulation import SERIES, batch_metrics, simulate_batch
+
+PROPERTIES_FILE = os.getenv("PROPERTIES_STORE", 'data/properties.json')
+SCENARIOS_FILE = 'data/scenarios.yaml'
+
+# Paramètres du financement repris dans le tableau des métriques
+COLONNES_PARAMETRES = ('cout_total', 'montant_pret', 'apport_immobilier', 'taux_credit', 'duree_credit',
+                       'evolution_immobilier')
+
+
+def evaluate_chunk(properties: List[Property], scenarios: Dict[str, ScenarioConfig],
+                   pas_series: Optional[int] = None):
+    """Évalue un lot de biens sous tous les scénarios (une simulation groupée par scénario).
+
+    Renvoie le tableau des métriques et, si pas_series est fourni, les séries
+    mensuelles au format long (un point tous les pas_series mois, dernier mois inclus).
+    """
+    metriques, series = [], []
+    for nom, config in scenarios.items():
+        resultat = simulate_batch(properties, config)
+        colonnes = {'bien': resultat.parametres['bien'], 'scenario': nom}
+        colonnes.update({champ: resultat.parametres[champ] for champ in COLONNES_PARAMETRES})
+        colonnes.update(batch_metrics(resultat, properties, config))
+        colonnes.update({f"{composante}_final": resultat.serie(composante)[:, -1] for composante in SERIES})
+        metriques.append(pd.DataFrame(colonnes))
+
+        if pas_series:
+            nb_mois = resultat.series.shape[1] - 1
+            mois = np.unique(np.append(np.arange(0, nb_mois + 1, pas_series), nb_mois))
+            extrait = resultat.series[:, mois, :]
+            nb_scenarios = extrait.shape[0]
+            long = {'bien': np.repeat(resultat.parametres['bien'], len(mois)), 'scenario': nom,
+                    'mois': np.tile(mois, nb_scenarios)}
+            long.update({composante: extrait[..., i].ravel() for i, composante in enumerate(resultat.composantes)})
+            series.append(pd.DataFrame(long))
+
+    return pd.concat(metriques, ignore_index=True), (pd.concat(series, ignore_index=True) if series else None)
+
+
+def entier_positif(valeur: str) -> int:
+    """Type argparse des options qui attendent un entier supérieur ou égal à 1."""
+    nombre = int(valeur)
+    if nombre < 1:
+        raise argparse.ArgumentTypeError(f"doit être un entier supérieur ou égal à 1 (reçu : {valeur})")
+    return nombre
+
+
+def _evaluate_chunk(args):
+    return evaluate_chunk(*args)
+
+
+class TableWriter:
+    """Écriture incrémentale d'un tableau, lot par lot, en CSV ou en Parquet (selon l'extension)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = Path(path).suffix == '.parquet'
+        self._writer = None
+        self._entete = True
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("L'écriture Parquet nécessite pyarrow (pip install pyarrow)")
+
+    def write(self, table: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            lot = pa.Table.from_pandas(table, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, lot.schema)
+            self._writer.write_table(lot)
+        else:
+            table.to_csv(self.path, mode='w' if self._entete else 'a', header=self._entete, index=False)
+            self._entete = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Évalue tous les biens sous tous les scénarios.")
+    parser.add_argument('--properties', default=PROPERTIES_FILE, help="Stockage des biens (.json ou .db)")
+    parser.add_argument('--scenarios', default=SCENARIOS_FILE, help="Fichier YAML des scénarios")
+    parser.add_argument('--scenario', action='append', help="Scénario à évaluer (tous par défaut, option répétable)")
+    parser.add_argument('--output', required=True, help="Fichier des métriques (.csv ou .parquet)")
+    parser.add_argument('--series', help="Fichier des séries mensuelles (.csv ou .parquet), optionnel")
+    parser.add_argument('--pas-series', type=entier_positif, default=1, help="Un point des séries tous les N mois")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Nombre de processus")
+    parser.add_argument('--taille-lot', type=entier_positif, default=250, help="Biens par lot envoyé à un processus")
+    args = parser.parse_args(argv)
+
+    rapport = open_repository(args.properties).load_report()
+    for erreur in rapport.erreurs:
+        print(f"Bien ignoré {erreur.id} ({erreur.champ or '-'}) : {erreur.message}", file=sys.stderr)
+    properties = list(rapport.properties.values())
+    if not properties:
+        print(f"Aucun bien à évaluer dans {args.properties} : seuls les en-têtes seront écrits", file=sys.stderr)
+
+    scenarios = load_scenarios(args.scenarios)
+    if args.scenario:
+        inconnus = set(args.scenario) - set(scenarios)
+        if inconnus:
+            parser.error(f"Scénario(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+        scenarios = {nom: scenarios[nom] for nom in args.scenario}
+
+    # Catalogue vide : un lot vide, pour que les fichiers de sortie soient créés avec leurs en-têtes
+    lots = [properties[i:i + args.taille_lot] for i in range(0, len(properties), args.taille_lot)] or [[]]
+    taches = [(lot, scenarios, args.pas_series if args.series else None) for lot in lots]
+
+    sortie_metriques = TableWriter(args.output)
+    sortie_series = TableWriter(args.series) if args.series else None
+    debut = time.perf_counter()
+    executor = ProcessPoolExecutor(args.workers) if args.workers > 1 and len(lots) > 1 else None
+    try:
+        resultats = executor.map(_evaluate_chunk, taches) if executor else map(_evaluate_chunk, taches)
+        for n, (metriques, series) in enumerate(resultats, start=1):
+            sortie_metriques.write(metriques)
+            if sortie_series is not None:
+                sortie_series.write(series)
+            print(f"\rLots traités : {n}/{len(lots)} ({min(n * args.taille_lot, len(properties))} biens, "
+                  f"{time.perf_counter() - debut:.1f} s)", end='', file=sys.stderr, flush=True)
+    finally:
+        if executor:
+            executor.shutdown()
+        sortie_metriques.close()
+        if sortie_series is not None:
+            sortie_series.close()
+
+    print(f"\n{len(properties)} biens x {len(scenarios)} scénario(s) évalués en "
+          f"{time.perf_counter() - debut:.1f} s -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Mesures de performance (temps, mémoire) sur des données synthétiques."""
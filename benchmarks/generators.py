@@ -0,0 +1,139 @@
+from dataclasses import replace
+from typing import Dict, List
+import numpy as np
+from models.property import Property
+from models.scenario import ScenarioConfig
+
+# Communes de petite couronne (code postal, nom utilisé dans l'identifiant)
+COMMUNES = {
+    '92': [('92100', 'Boulogne-Billancourt'), ('92120', 'Montrouge'), ('92130', 'Issy-les-Moulineaux'),
+           ('92240', 'Malakoff'), ('92300', 'Levallois-Perret')],
+    '93': [('93100', 'Montreuil'), ('93400', 'Saint-Ouen'), ('93500', 'Pantin'),
+           ('93200', 'Saint-Denis'), ('93310', 'Le-Pré-Saint-Gervais')],
+    '94': [('94200', 'Ivry-sur-Seine'), ('94300', 'Vincennes'), ('94220', 'Charenton-le-Pont'),
+           ('94270', 'Le-Kremlin-Bicêtre'), ('94160', 'Saint-Mandé')],
+}
+
+# Prix moyen au m² par département (Paris : par arrondissement, de 1 à 20)
+PRIX_M2_PARIS = np.array([13500, 12500, 12800, 13200, 12600, 15000, 14500, 11800, 11000, 9800,
+                          10300, 9600, 8900, 10400, 10500, 11300, 10800, 9200, 8800, 8900])
+PRIX_M2_COURONNE = {'92': 8200, '93': 5200, '94': 6300}
+
+RUES = ['rue de la République', 'avenue Jean Jaurès', 'rue Victor Hugo', 'boulevard Voltaire',
+        'rue des Pyrénées', 'rue de Belleville', 'avenue Gambetta', 'rue du Faubourg Saint-Antoine',
+        'rue Championnet', 'rue de Charonne', 'avenue de Paris', 'rue Marcadet']
+LIGNES = ['M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M7', 'M8', 'M9', 'M10', 'M11', 'M12', 'M13', 'M14', 'RER B', 'RER D']
+STATIONS = ['République', 'Gambetta', 'Jourdain', 'Pyrénées', 'Belleville', 'Nation', 'Bastille',
+            'Marcadet-Poissonniers', 'Porte de Clignancourt', 'Mairie de Montreuil', 'Pantin', 'Télégraphe']
+DPE = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+# Emprise de Paris et de la petite couronne (degrés)
+EMPRISE_LATITUDE = (48.80, 48.93)
+EMPRISE_LONGITUDE = (2.24, 2.47)
+TYPES = ['Studio', 'T2', 'T3', 'T4', 'T5']
+
+
+def generate_property_entries(nb_biens: int, graine: int = 0) -> Dict[str, Dict]:
+    """Génère des entrées au format properties.json (Paris et petite couronne).
+
+    Les tirages sont reproductibles pour une graine donnée ; les identifiants
+    suivent le format de Property.generate_id (ville-numéro).
+    """
+    rng = np.random.default_rng(graine)
+    departements = rng.choice(['75', '92', '93', '94'], size=nb_biens, p=[0.55, 0.15, 0.15, 0.15])
+    surfaces = np.round(rng.lognormal(np.log(45), 0.45, nb_biens).clip(12, 180), 2)
+    frais_acquereur = rng.random(nb_biens) < 0.4
+    honoraires = np.round(rng.uniform(3, 6, nb_biens), 1)
+    dpe = rng.choice(DPE, size=nb_biens, p=[0.02, 0.05, 0.15, 0.35, 0.25, 0.12, 0.06])
+    nb_metros = rng.integers(0, 4, nb_biens)
+    # Coordonnées tirées à part pour ne pas modifier les autres tirages d'une graine
+    rng_geo = np.random.default_rng((graine, 1))
+    latitudes = np.round(rng_geo.uniform(*EMPRISE_LATITUDE, nb_biens), 5)
+    longitudes = np.round(rng_geo.uniform(*EMPRISE_LONGITUDE, nb_biens), 5)
+
+    entries = {}
+    compteurs = {}
+    for i in range(nb_biens):
+        departement = departements[i]
+        if departement == '75':
+            arrondissement = int(rng.integers(1, 21))
+            cp = f"750{arrondissement:02d}"
+            commune, ville = 'Paris', f"paris{arrondissement:02d}"
+            prix_m2 = PRIX_M2_PARIS[arrondissement - 1]
+        else:
+            cp, commune = COMMUNES[departement][int(rng.integers(len(COMMUNES[departement])))]
+            ville = commune.lower()
+            prix_m2 = PRIX_M2_COURONNE[departement]
+        prix_m2 = round(prix_m2 * rng.normal(1, 0.12))
+
+        surface = float(surfaces[i])
+        hors_honoraires = round(surface * prix_m2, -3)
+        annonce = round(hors_honoraires * (1 + honoraires[i] / 100), -3) if frais_acquereur[i] else hors_honoraires
+        pieces = int(np.clip(surface // 20, 0, 4))
+
+        compteurs[ville] = compteurs.get(ville, 0) + 1
+        entries[f"{ville}-{compteurs[ville]:03d}"] = {
+            'adresse': f"{int(rng.integers(1, 150))} {RUES[int(rng.integers(len(RUES)))]}, {cp} {commune}",
+            'bien': {
+                'type': TYPES[pieces],
+                'surface': surface,
+                'etage': f"{int(rng.integers(0, 7))}/7",
+                'orientation': None,
+                'pieces': {'sejour_cuisine': 1, 'chambre': max(pieces, 0)},
+                'dpe': str(dpe[i]),
+                'ges': None,
+                'cave': bool(rng.random() < 0.5)
+            },
+            'prix': {
+                'annonce': annonce,
+                'hors_honoraires': hors_honoraires,
+                'm2': round(annonce / surface),
+                'honoraires': {'montant': annonce - hors_honoraires,
+                               'pourcentage': float(honoraires[i]) if frais_acquereur[i] else 0},
+                'negociable': None,
+                'frais_agence_acquereur': bool(frais_acquereur[i])
+            },
+            'metros': [
+                {'ligne': LIGNES[int(rng.integers(len(LIGNES)))],
+                 'station': STATIONS[int(rng.integers(len(STATIONS)))],
+                 'distance': int(rng.integers(50, 1200))}
+                for _ in range(nb_metros[i])
+            ],
+            'localisation': {'latitude': float(latitudes[i]), 'longitude': float(longitudes[i])},
+            'charges': {
+                'mensuelles': round(float(surface * rng.uniform(1.5, 4.5))),
+                'taxe_fonciere': round(float(surface * rng.uniform(12, 25))),
+                'energie': round(float(surface * rng.uniform(0.8, 2.5))),
+                'chauffage': str(rng.choice(['individuel électrique', 'individuel gaz', 'collectif']))
+            },
+            'copro': {'lots': int(rng.integers(5, 200))},
+            'atouts': [],
+            'vigilance': [],
+            'contact': 'agence'
+        }
+    return entries
+
+
+def generate_properties(nb_biens: int, graine: int = 0) -> List[Property]:
+    """Génère des biens synthétiques validés."""
+    return list(Property.validate_bulk(generate_property_entries(nb_biens, graine)).properties.values())
+
+
+def generate_scenario_configs(base: ScenarioConfig, nb_scenarios: int, graine: int = 0) -> List[ScenarioConfig]:
+    """Variantes reproductibles d'une configuration (financement, rendements, répartition)."""
+    rng = np.random.default_rng(graine)
+    configs = []
+    for _ in range(nb_scenarios):
+        repartition_immobilier = float(rng.uniform(20, 80))
+        part_epargne = float(rng.uniform(0.2, 0.8))
+        configs.append(replace(
+            base,
+            repartition_immobilier=repartition_immobilier,
+            repartition_epargne=(100 - repartition_immobilier) * part_epargne,
+            repartition_investissement=(100 - repartition_immobilier) * (1 - part_epargne),
+            taux_credit=round(float(rng.uniform(2.5, 4.5)), 2),
+            duree_credit=int(rng.choice([15, 20, 25])),
+            rendement_epargne=round(float(rng.uniform(1, 3.5)), 2),
+            rendement_investissement=round(float(rng.uniform(4, 9)), 2),
+            evolution_immobilier=round(float(rng.uniform(-1, 4)), 2)
+        ))
+    return configs
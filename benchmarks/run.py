@@ -0,0 +1,250 @@
+"""Suite de mesures de performance.
+
+Exemples :
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --rapide --comparer bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.property import Property
+from models.repository import SQLitePropertyRepository
+from models.scenario import Scenario, ScenarioConfig, CACHE_SIMULATIONS
+from models.simulation import simulate_batch
+from models.comparison import comparison_table
+from models.catalog import CatalogIndex
+from models.downsampling import lttb
+from models.stations import StationIndex, biens_proches_ligne, coordonnees
+from benchmarks.generators import generate_property_entries, generate_properties, generate_scenario_configs
+
+SCENARIOS_FILE = Path(__file__).parent.parent / 'data' / 'scenarios.yaml'
+STATIONS_FILE = Path(__file__).parent.parent / 'data' / 'stations.csv'
+
+HORIZONS = [5, 10, 15, 20, 25, 30]
+CATALOGUES = [10, 100, 1000, 10000, 100000]
+HORIZONS_RAPIDE = [5, 30]
+CATALOGUES_RAPIDE = [10, 1000]
+
+# Taille maximale d'un lot simulate_batch (biens x scénarios), pour borner la mémoire
+LOT_MAX = 20000
+
+
+def mesurer(fonction: Callable[[], object], repetitions: int) -> Dict[str, float]:
+    """Temps (médiane et minimum sur repetitions exécutions) et pic mémoire d'une fonction.
+
+    Le pic mémoire est mesuré par tracemalloc lors d'une exécution séparée,
+    pour ne pas fausser les temps.
+    """
+    temps = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        temps.append(time.perf_counter() - debut)
+
+    tracemalloc.start()
+    try:
+        fonction()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'temps_median_s': statistics.median(temps),
+        'temps_min_s': min(temps),
+        'memoire_pic_octets': pic,
+        'repetitions': repetitions
+    }
+
+
+def sans_cache(fonction: Callable[[], object]) -> Callable[[], object]:
+    """Vide le cache des simulations avant chaque appel, pour mesurer le calcul lui-même."""
+    def appel():
+        CACHE_SIMULATIONS.clear()
+        return fonction()
+    return appel
+
+
+def cas_horizons(config: ScenarioConfig, horizons: List[int], repetitions: int, graine: int):
+    """Simulation et métriques d'un scénario, simulation groupée et réduction des courbes du graphique, selon l'horizon."""
+    bien = generate_properties(1, graine)[0]
+    biens = generate_properties(100, graine)
+    superposes = biens[:20]
+    for horizon in horizons:
+        config_horizon = ScenarioConfig(**{**config.__dict__, 'horizon_simulation': horizon})
+        scenario = Scenario(bien, config_horizon)
+        yield 'simulate_patrimoine', {'horizon': horizon}, sans_cache(scenario.simulate_patrimoine), repetitions
+        yield 'calculate_metrics', {'horizon': horizon}, sans_cache(scenario.calculate_metrics), repetitions
+        yield ('simulate_batch', {'horizon': horizon, 'biens': len(biens), 'taux': 5},
+               lambda: simulate_batch(biens, config_horizon, taux_credit=np.linspace(2.5, 4.5, 5)), repetitions)
+        # Patrimoine de 20 biens superposés, réduit à 150 points par courbe
+        courbes = simulate_batch(superposes, config_horizon).serie('patrimoine_total')
+        annees = np.arange(courbes.shape[1]) / 12
+        yield 'lttb', {'horizon': horizon, 'courbes': len(courbes), 'points': 150}, lambda: lttb(annees, courbes, 150), repetitions
+
+
+def cas_catalogues(config: ScenarioConfig, catalogues: List[int], repetitions: int, graine: int, dossier: str):
+    """Chargement, génération d'identifiant, scores de comparaison, index du catalogue et insertion selon la taille du catalogue."""
+    for nb_biens in catalogues:
+        entries = generate_property_entries(nb_biens, graine)
+        chemin = os.path.join(dossier, f"properties_{nb_biens}.json")
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump({'properties': entries}, f, ensure_ascii=False)
+        ids = list(entries)
+        biens = list(Property.validate_bulk(entries).properties.values())
+        # Les grands catalogues sont mesurés une seule fois
+        n = repetitions if nb_biens <= 10000 else 1
+
+        def load_properties(chemin=chemin):
+            with contextlib.redirect_stdout(io.StringIO()):
+                return Property.load_properties(chemin)
+
+        yield 'load_properties', {'biens': nb_biens}, load_properties, n
+        yield 'load_properties_bulk', {'biens': nb_biens}, lambda chemin=chemin: Property.load_properties_bulk(chemin), n
+        yield ('generate_id', {'biens': nb_biens},
+               lambda ids=ids: Property.generate_id("12 rue de Belleville, 75020 Paris", ids), n)
+        yield 'score_transport', {'biens': nb_biens}, lambda biens=biens: [b.score_transport() for b in biens], n
+        yield 'comparison_table', {'biens': nb_biens}, lambda biens=biens: comparison_table(biens, config), n
+        stations = StationIndex.from_csv(STATIONS_FILE)
+        latitudes, longitudes = coordonnees(biens)
+        yield ('distances_lignes', {'biens': nb_biens},
+               lambda latitudes=latitudes, longitudes=longitudes: stations.distances_lignes(latitudes, longitudes), n)
+        lignes, distances = stations.distances_lignes(latitudes, longitudes)
+        yield ('biens_proches_ligne', {'biens': nb_biens},
+               lambda distances=distances: biens_proches_ligne(distances, lignes, 'M11', 500), repetitions)
+        yield 'catalog_index', {'biens': nb_biens}, lambda biens=biens: CatalogIndex(stations).reconstruire(biens), n
+        index = CatalogIndex(stations)
+        index.reconstruire(biens)
+        yield ('catalog_requete', {'biens': nb_biens},
+               lambda index=index: index.requete({'prix': (250000, 450000), 'surface': (30, None)},
+                                                 {'dpe': ['A', 'B', 'C', 'D']}), repetitions)
+        yield 'catalog_upsert', {'biens': nb_biens}, lambda index=index, bien=biens[0]: index.upsert([bien]), repetitions
+
+        def insert_many(entries=list(entries.values()), compteur=iter(range(10**6))):
+            # Base neuve à chaque exécution : attribution des IDs et écriture en une transaction
+            repository = SQLitePropertyRepository(os.path.join(dossier, f"insert_{nb_biens}_{next(compteur)}.db"))
+            try:
+                return repository.insert_many(entries)
+            finally:
+                repository.close()
+
+        yield 'insert_many', {'biens': nb_biens}, insert_many, n
+
+
+def cas_scenarios(config: ScenarioConfig, catalogues: List[int], repetitions: int, graine: int):
+    """Grille biens x scénarios synthétiques, simulée par lots."""
+    configs = generate_scenario_configs(config, 10, graine)
+    for nb_biens in catalogues:
+        biens = generate_properties(nb_biens, graine)
+        taille_lot = max(1, LOT_MAX // len(configs))
+
+        def grille(biens=biens):
+            for c in configs:
+                for debut in range(0, len(biens), taille_lot):
+                    simulate_batch(biens[debut:debut + taille_lot], c)
+
+        yield 'grille_scenarios', {'biens': nb_biens, 'scenarios': len(configs)}, grille, repetitions if nb_biens <= 10000 else 1
+
+
+def commit_courant():
+    """Identifiant du commit git courant, s'il est disponible."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparer(resultats: List[Dict], reference_path: str, seuil: float) -> List[str]:
+    """Liste les cas dont le temps médian dépasse la référence de plus de seuil %."""
+    with open(reference_path, 'r') as f:
+        reference = {(r['cas'], json.dumps(r['parametres'], sort_keys=True)): r for r in json.load(f)['resultats']}
+
+    regressions = []
+    for resultat in resultats:
+        ancien = reference.get((resultat['cas'], json.dumps(resultat['parametres'], sort_keys=True)))
+        if not ancien or ancien['temps_median_s'] <= 0:
+            continue
+        ratio = resultat['temps_median_s'] / ancien['temps_median_s']
+        resultat['ratio_reference'] = ratio
+        if ratio > 1 + seuil / 100:
+            regressions.append(f"{resultat['cas']} {resultat['parametres']}: x{ratio:.2f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure les temps et la mémoire des calculs principaux.")
+    parser.add_argument('--horizons', type=int, nargs='+', help="Horizons de simulation (années)")
+    parser.add_argument('--catalogues', type=int, nargs='+', help="Tailles de catalogue (nombre de biens)")
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--rapide', action='store_true', help="Jeu réduit d'horizons et de catalogues")
+    parser.add_argument('--cas', nargs='+', help="Ne mesurer que ces cas (ex. simulate_patrimoine generate_id)")
+    parser.add_argument('--output', help="Fichier JSON de résultats (sortie standard par défaut)")
+    parser.add_argument('--comparer', help="Fichier JSON de référence (commit précédent)")
+    parser.add_argument('--seuil', type=float, default=20.0, help="Régression tolérée en % du temps médian")
+    args = parser.parse_args(argv)
+
+    horizons = args.horizons or (HORIZONS_RAPIDE if args.rapide else HORIZONS)
+    catalogues = args.catalogues or (CATALOGUES_RAPIDE if args.rapide else CATALOGUES)
+    config = ScenarioConfig.from_yaml(SCENARIOS_FILE)
+
+    resultats = []
+    with tempfile.TemporaryDirectory() as dossier:
+        cas = [
+            cas_horizons(config, horizons, args.repetitions, args.graine),
+            cas_catalogues(config, catalogues, args.repetitions, args.graine, dossier),
+            cas_scenarios(config, catalogues, args.repetitions, args.graine),
+        ]
+        for generateur in cas:
+            for nom, parametres, fonction, repetitions in generateur:
+                if args.cas and nom not in args.cas:
+                    continue
+                mesure = mesurer(fonction, repetitions)
+                resultats.append({'cas': nom, 'parametres': parametres, **mesure})
+                print(f"{nom:22s} {json.dumps(parametres):45s} {mesure['temps_median_s'] * 1000:10.2f} ms "
+                      f"{mesure['memoire_pic_octets'] / 2**20:9.1f} Mo", file=sys.stderr)
+
+    regressions = comparer(resultats, args.comparer, args.seuil) if args.comparer else []
+
+    rapport = {
+        'meta': {
+            'commit': commit_courant(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plateforme': platform.platform(),
+            'graine': args.graine
+        },
+        'resultats': resultats,
+        'regressions': regressions
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rapport, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(rapport, sys.stdout, ensure_ascii=False, indent=2)
+
+    for regression in regressions:
+        print(f"Régression : {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+class LRUCache:
+    """Cache mémoire à éviction LRU avec compteurs de succès/échecs."""
+
+    def __init__(self, maxsize: int = 128):
+        if maxsize <= 0:
+            raise ValueError("La taille du cache doit être strictement positive")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Renvoie la valeur associée à key, en la calculant si elle est absente."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Vide le cache et remet les compteurs à zéro."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs d'utilisation du cache."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'taille': len(self._entries),
+            'taille_max': self.maxsize
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Après une éviction, le cache est ramené à cette fraction de max_octets (marge avant le prochain balayage)
+TAUX_APRES_EVICTION = 0.9
+
+
+class DiskCache:
+    """Cache persistant adressé par contenu : une entrée texte par fichier.
+
+    La clé est l'empreinte SHA-256 des éléments fournis à key(). Les entrées
+    plus anciennes que max_age secondes sont ignorées et supprimées ; au-delà
+    de max_octets, les entrées les moins récemment lues sont évincées (la
+    date de modification d'un fichier est mise à jour à chaque lecture).
+    La taille et le nombre d'entrées sont tenus à jour à chaque écriture ; le
+    répertoire n'est parcouru qu'à l'ouverture et lorsque la taille dépasse
+    max_octets.
+    """
+
+    def __init__(self, directory: str, max_octets: int = 100 * 2**20, max_age: Optional[float] = None):
+        if max_octets <= 0:
+            raise ValueError("La taille du cache doit être strictement positive")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_octets = max_octets
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._octets = 0
+        self._nb_entrees = 0
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Empreinte d'éléments sérialisables en JSON (ordre des clés normalisé)."""
+        contenu = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _expire(self, path: Path) -> bool:
+        return self.max_age is not None and time.time() - path.stat().st_mtime > self.max_age
+
+    def get(self, key: str) -> Optional[str]:
+        """Renvoie la valeur associée à key, ou None si elle est absente ou expirée."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                if self._expire(path):
+                    self._supprimer(path)
+                    raise FileNotFoundError(path)
+                valeur = path.read_text(encoding='utf-8')
+                os.utime(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return valeur
+
+    def set(self, key: str, valeur: str):
+        """Enregistre une valeur (écriture atomique), puis évince si la taille dépasse max_octets."""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        with self._lock:
+            try:
+                ancienne = path.stat().st_size
+            except FileNotFoundError:
+                ancienne = None
+            fd, temporaire = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(valeur)
+            os.replace(temporaire, path)
+            self._octets += path.stat().st_size - (ancienne or 0)
+            self._nb_entrees += ancienne is None
+            if self._octets > self.max_octets:
+                self._evict()
+
+    def _supprimer(self, path: Path):
+        """Supprime une entrée et la retire des compteurs."""
+        try:
+            taille = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        self._octets -= taille
+        self._nb_entrees -= 1
+
+    def _entries(self):
+        return list(self.directory.glob('*/*.json'))
+
+    def _evict(self):
+        """Parcourt le répertoire et recalcule les compteurs.
+
+        Supprime les entrées expirées puis, si la taille dépasse max_octets,
+        les moins récemment lues jusqu'à TAUX_APRES_EVICTION * max_octets.
+        """
+        entrees = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self.max_age is not None and time.time() - stat.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entrees.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(taille for _, taille, _ in entrees)
+        nb_entrees = len(entrees)
+        if total > self.max_octets:
+            for _, taille, path in sorted(entrees):
+                if total <= self.max_octets * TAUX_APRES_EVICTION:
+                    break
+                path.unlink(missing_ok=True)
+                total -= taille
+                nb_entrees -= 1
+        self._octets, self._nb_entrees = total, nb_entrees
+
+    def clear(self):
+        """Supprime toutes les entrées et remet les compteurs à zéro."""
+        with self._lock:
+            for path in self._entries():
+                path.unlink(missing_ok=True)
+            self.hits = 0
+            self.misses = 0
+            self._octets = 0
+            self._nb_entrees = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs d'utilisation et occupation du cache."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'taille': self._nb_entrees,
+            'octets': self._octets,
+            'octets_max': self.max_octets
+        }
+
+    def __len__(self):
+        return self._nb_entrees
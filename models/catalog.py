@@ -0,0 +1,384 @@
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from .property import Property
+from .repository import arrondissement
+from .comparison import scores_transport
+from .stations import StationIndex, distances_transport
+
+# Champs interrogeables par intervalle (index trié) et par égalité (index bitmap)
+CHAMPS_INTERVALLE = ('prix', 'prix_m2', 'surface', 'charges_mensuelles', 'score_transport')
+CHAMPS_EGALITE = ('dpe', 'arrondissement')
+CAPACITE_INITIALE = 1024
+
+
+class SortedIndex:
+    """Index trié d'une colonne numérique.
+
+    valeurs est croissant et emplacements donne l'emplacement du bien de
+    chaque valeur : un intervalle se résout par deux recherches
+    dichotomiques. Les valeurs absentes (NaN) ne sont pas indexées.
+    """
+
+    def __init__(self):
+        self.valeurs = np.empty(0)
+        self.emplacements = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.valeurs)
+
+    @staticmethod
+    def _presentes(valeurs, emplacements) -> Tuple[np.ndarray, np.ndarray]:
+        valeurs = np.asarray(valeurs, dtype=float)
+        emplacements = np.asarray(emplacements, dtype=np.int64)
+        presentes = ~np.isnan(valeurs)
+        return valeurs[presentes], emplacements[presentes]
+
+    def construire(self, valeurs, emplacements):
+        """Construit l'index d'un bloc de valeurs (un seul tri)."""
+        valeurs, emplacements = self._presentes(valeurs, emplacements)
+        ordre = np.lexsort((emplacements, valeurs))
+        self.valeurs, self.emplacements = valeurs[ordre], emplacements[ordre]
+
+    def inserer(self, valeurs, emplacements):
+        """Insère des couples (valeur, emplacement) à leur rang, en une seule recopie des tableaux."""
+        valeurs, emplacements = self._presentes(valeurs, emplacements)
+        ordre = np.argsort(valeurs, kind='stable')
+        valeurs, emplacements = valeurs[ordre], emplacements[ordre]
+        positions = np.searchsorted(self.valeurs, valeurs, side='right')
+        self.valeurs = np.insert(self.valeurs, positions, valeurs)
+        self.emplacements = np.insert(self.emplacements, positions, emplacements)
+
+    def supprimer(self, valeurs, emplacements):
+        """Retire des couples (valeur, emplacement), retrouvés par dichotomie sur la valeur."""
+        valeurs, emplacements = self._presentes(valeurs, emplacements)
+        debuts = np.searchsorted(self.valeurs, valeurs, side='left')
+        fins = np.searchsorted(self.valeurs, valeurs, side='right')
+        # Parmi les valeurs égales, position de l'emplacement recherché
+        positions = [debut + int(np.flatnonzero(self.emplacements[debut:fin] == emplacement)[0])
+                     for debut, fin, emplacement in zip(debuts, fins, emplacements)]
+        self.valeurs = np.delete(self.valeurs, positions)
+        self.emplacements = np.delete(self.emplacements, positions)
+
+    def intervalle(self, minimum: Optional[float] = None, maximum: Optional[float] = None) -> Tuple[int, int]:
+        """Plage [début, fin) des valeurs comprises entre minimum et maximum (inclus)."""
+        debut = 0 if minimum is None else int(np.searchsorted(self.valeurs, minimum, side='left'))
+        fin = len(self.valeurs) if maximum is None else int(np.searchsorted(self.valeurs, maximum, side='right'))
+        return debut, max(debut, fin)
+
+    def etendue(self) -> Optional[Tuple[float, float]]:
+        """Plus petite et plus grande valeur indexées (None si l'index est vide)."""
+        return (float(self.valeurs[0]), float(self.valeurs[-1])) if len(self.valeurs) else None
+
+
+class BitmapIndex:
+    """Index bitmap d'une colonne à valeurs discrètes : un masque des emplacements par valeur.
+
+    Les valeurs absentes (None) ne sont pas indexées.
+    """
+
+    def __init__(self, capacite: int):
+        self.capacite = capacite
+        self.masques: Dict[object, np.ndarray] = {}
+        self.effectifs: Dict[object, int] = {}
+
+    def redimensionner(self, capacite: int):
+        """Agrandit les masques à la nouvelle capacité du catalogue."""
+        for valeur, masque in self.masques.items():
+            self.masques[valeur] = np.r_[masque, np.zeros(capacite - len(masque), dtype=bool)]
+        self.capacite = capacite
+
+    def _groupes(self, valeurs, emplacements):
+        """Emplacements regroupés par valeur."""
+        valeurs = np.asarray(valeurs, dtype=object)
+        emplacements = np.asarray(emplacements, dtype=np.int64)
+        for valeur in set(valeurs.tolist()) - {None}:
+            yield valeur, emplacements[valeurs == valeur]
+
+    def inserer(self, valeurs, emplacements):
+        for valeur, selection in self._groupes(valeurs, emplacements):
+            masque = self.masques.setdefault(valeur, np.zeros(self.capacite, dtype=bool))
+            masque[selection] = True
+            self.effectifs[valeur] = self.effectifs.get(valeur, 0) + len(selection)
+
+    def supprimer(self, valeurs, emplacements):
+        for valeur, selection in self._groupes(valeurs, emplacements):
+            self.masques[valeur][selection] = False
+            self.effectifs[valeur] -= len(selection)
+            if not self.effectifs[valeur]:
+                del self.masques[valeur], self.effectifs[valeur]
+
+    def compter(self, valeurs: Iterable) -> int:
+        """Nombre de biens ayant l'une des valeurs."""
+        return sum(self.effectifs.get(valeur, 0) for valeur in set(valeurs))
+
+    def masque(self, valeurs: Iterable) -> np.ndarray:
+        """Union des masques des valeurs demandées."""
+        resultat = np.zeros(self.capacite, dtype=bool)
+        for valeur in set(valeurs):
+            if valeur in self.masques:
+                resultat |= self.masques[valeur]
+        return resultat
+
+    def valeurs(self) -> List:
+        """Valeurs présentes dans le catalogue, triées."""
+        return sorted(self.masques)
+
+
+class CatalogIndex:
+    """Index en mémoire du catalogue pour les requêtes par intervalle et par égalité.
+
+    Chaque bien occupe un emplacement dans des colonnes de taille fixe
+    (doublée au besoin) ; les emplacements libérés par une suppression sont
+    réutilisés, et le rang d'insertion de chaque bien (conservé par ses
+    mises à jour) restitue l'ordre du catalogue. Les champs de
+    CHAMPS_INTERVALLE ont un index trié, ceux de CHAMPS_EGALITE un index
+    bitmap, tenus à jour à chaque ajout, mise à jour ou suppression sans
+    reconstruction. Une requête part du prédicat le plus
+    sélectif, dont l'effectif est connu sans parcourir le catalogue, et ne
+    vérifie les autres que sur ses candidats.
+    """
+
+    def __init__(self, stations: Optional[StationIndex] = None, capacite: int = CAPACITE_INITIALE):
+        self.stations = stations
+        self.signature = None  # version du stockage reflétée par l'index
+        self._lock = RLock()
+        self._vider(capacite)
+
+    def _vider(self, capacite: int):
+        self.capacite = capacite
+        self.ids = np.empty(capacite, dtype=object)
+        self.actifs = np.zeros(capacite, dtype=bool)
+        self.rangs = np.zeros(capacite, dtype=np.int64)  # ordre d'insertion dans le catalogue
+        self.colonnes: Dict[str, np.ndarray] = {champ: np.full(capacite, np.nan) for champ in CHAMPS_INTERVALLE}
+        self.colonnes.update({champ: np.empty(capacite, dtype=object) for champ in CHAMPS_EGALITE})
+        self.tries = {champ: SortedIndex() for champ in CHAMPS_INTERVALLE}
+        self.bitmaps = {champ: BitmapIndex(capacite) for champ in CHAMPS_EGALITE}
+        self._emplacements: Dict[str, int] = {}
+        self._libres: List[int] = []
+        self._suivant = 0
+        self._rang_suivant = 0
+
+    def __len__(self) -> int:
+        return len(self._emplacements)
+
+    def __contains__(self, property_id: str) -> bool:
+        return property_id in self._emplacements
+
+    def _valeurs(self, properties: Sequence[Property]) -> Dict[str, np.ndarray]:
+        """Valeurs indexées des biens, calculées comme dans comparison_table."""
+        prix = np.array([p.prix for p in properties], dtype=float)
+        surface = np.array([p.surface for p in properties], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prix_m2 = np.where(surface > 0, prix / surface, np.array([p.prix_m2 for p in properties], dtype=float))
+        if self.stations is not None:
+            distances, nb_stations = distances_transport(properties, self.stations)
+        else:
+            nb_stations = np.array([len(p.metros) for p in properties], dtype=int)
+            distances = np.array([m.distance for p in properties for m in p.metros], dtype=float)
+        return {
+            'prix': prix,
+            'prix_m2': prix_m2,
+            'surface': surface,
+            'charges_mensuelles': np.array([p.charges_mensuelles for p in properties], dtype=float),
+            'score_transport': scores_transport(distances, nb_stations),
+            'dpe': np.array([p.dpe for p in properties], dtype=object),
+            'arrondissement': np.array([arrondissement(p.adresse) for p in properties], dtype=object),
+        }
+
+    def _agrandir(self, capacite: int):
+        supplement = capacite - self.capacite
+        self.ids = np.r_[self.ids, np.empty(supplement, dtype=object)]
+        self.actifs = np.r_[self.actifs, np.zeros(supplement, dtype=bool)]
+        self.rangs = np.r_[self.rangs, np.zeros(supplement, dtype=np.int64)]
+        for champ, colonne in self.colonnes.items():
+            vide = np.full(supplement, np.nan) if champ in CHAMPS_INTERVALLE else np.empty(supplement, dtype=object)
+            self.colonnes[champ] = np.r_[colonne, vide]
+        for bitmap in self.bitmaps.values():
+            bitmap.redimensionner(capacite)
+        self.capacite = capacite
+
+    def _allouer(self, nombre: int) -> np.ndarray:
+        """Emplacements pour de nouveaux biens : d'abord ceux libérés, puis à la suite."""
+        reutilises = [self._libres.pop() for _ in range(min(nombre, len(self._libres)))]
+        nouveaux = np.arange(self._suivant, self._suivant + nombre - len(reutilises))
+        self._suivant += len(nouveaux)
+        if self._suivant > self.capacite:
+            capacite = self.capacite
+            while capacite < self._suivant:
+                capacite *= 2
+            self._agrandir(capacite)
+        return np.r_[np.array(reutilises, dtype=np.int64), nouveaux].astype(np.int64)
+
+    def _desindexer(self, emplacements: np.ndarray):
+        """Retire des biens des index (leurs emplacements restent attribués)."""
+        for champ, index in self.tries.items():
+            index.supprimer(self.colonnes[champ][emplacements], emplacements)
+        for champ, index in self.bitmaps.items():
+            index.supprimer(self.colonnes[champ][emplacements], emplacements)
+
+    def reconstruire(self, properties: Iterable[Property], signature=None):
+        """Reconstruit tout l'index à partir du catalogue (un tri par colonne)."""
+        properties = list({p.id: p for p in properties}.values())
+        with self._lock:
+            capacite = CAPACITE_INITIALE
+            while capacite < len(properties):
+                capacite *= 2
+            self._vider(capacite)
+            emplacements = np.arange(len(properties), dtype=np.int64)
+            self._suivant = len(properties)
+            self._emplacements = {p.id: i for i, p in enumerate(properties)}
+            self.ids[emplacements] = [p.id for p in properties]
+            self.actifs[emplacements] = True
+            self.rangs[emplacements] = emplacements
+            self._rang_suivant = len(properties)
+            if properties:
+                for champ, valeurs in self._valeurs(properties).items():
+                    self.colonnes[champ][emplacements] = valeurs
+                for champ, index in self.tries.items():
+                    index.construire(self.colonnes[champ][emplacements], emplacements)
+                for champ, index in self.bitmaps.items():
+                    index.inserer(self.colonnes[champ][emplacements], emplacements)
+            self.signature = signature
+
+    def upsert(self, properties: Iterable[Property]):
+        """Ajoute ou remplace des biens ; seules leurs entrées d'index sont modifiées."""
+        properties = list({p.id: p for p in properties}.values())
+        if not properties:
+            return
+        with self._lock:
+            existants = np.array([self._emplacements[p.id] for p in properties if p.id in self._emplacements],
+                                 dtype=np.int64)
+            self._desindexer(existants)
+            ajoutes = [p for p in properties if p.id not in self._emplacements]
+            allouees = self._allouer(len(ajoutes))
+            # Les biens ajoutés prennent place en fin de catalogue, les biens remplacés gardent leur rang
+            self.rangs[allouees] = np.arange(self._rang_suivant, self._rang_suivant + len(ajoutes))
+            self._rang_suivant += len(ajoutes)
+            self._emplacements.update((p.id, int(e)) for p, e in zip(ajoutes, allouees))
+            emplacements = np.array([self._emplacements[p.id] for p in properties], dtype=np.int64)
+            self.ids[emplacements] = [p.id for p in properties]
+            self.actifs[emplacements] = True
+            for champ, valeurs in self._valeurs(properties).items():
+                self.colonnes[champ][emplacements] = valeurs
+            for champ, index in self.tries.items():
+                index.inserer(self.colonnes[champ][emplacements], emplacements)
+            for champ, index in self.bitmaps.items():
+                index.inserer(self.colonnes[champ][emplacements], emplacements)
+
+    def supprimer(self, property_ids: Iterable[str]) -> int:
+        """Retire des biens de l'index ; renvoie le nombre de biens effectivement retirés."""
+        with self._lock:
+            emplacements = np.array(sorted({self._emplacements.pop(i) for i in property_ids if i in self._emplacements}),
+                                    dtype=np.int64)
+            self._desindexer(emplacements)
+            self.ids[emplacements] = None
+            self.actifs[emplacements] = False
+            for champ, colonne in self.colonnes.items():
+                colonne[emplacements] = np.nan if champ in CHAMPS_INTERVALLE else None
+            self._libres.extend(emplacements.tolist())
+            return len(emplacements)
+
+    def appliquer(self, avant, apres, upserts: Iterable[Property] = (), suppressions: Iterable[str] = ()) -> bool:
+        """Répercute une écriture du stockage (version avant -> apres) sans reconstruire l'index.
+
+        Si l'index ne reflétait pas la version avant (stockage modifié par
+        ailleurs), il est laissé tel quel et sera reconstruit par synchroniser.
+        """
+        with self._lock:
+            if self.signature is None or self.signature != avant:
+                return False
+            self.supprimer(suppressions)
+            self.upsert(upserts)
+            self.signature = apres
+            return True
+
+    def synchroniser(self, signature, properties: Iterable[Property]):
+        """Reconstruit l'index s'il ne reflète pas la version signature du stockage."""
+        with self._lock:
+            if self.signature is None or self.signature != signature:
+                self.reconstruire(properties, signature)
+
+    def _verifier(self, bornes: Dict, egal: Dict):
+        inconnus = (set(bornes) - set(CHAMPS_INTERVALLE)) | (set(egal) - set(CHAMPS_EGALITE))
+        if inconnus:
+            raise ValueError(f"Champs non indexés: {', '.join(sorted(inconnus))}")
+
+    def _emplacements_retenus(self, bornes: Dict, egal: Dict) -> np.ndarray:
+        """Emplacements des biens satisfaisant tous les prédicats, du plus sélectif au moins sélectif."""
+        predicats = []
+        for champ, (minimum, maximum) in bornes.items():
+            if minimum is not None or maximum is not None:
+                debut, fin = self.tries[champ].intervalle(minimum, maximum)
+                predicats.append((fin - debut, champ, (minimum, maximum), (debut, fin)))
+        for champ, valeurs in egal.items():
+            if valeurs:
+                predicats.append((self.bitmaps[champ].compter(valeurs), champ, list(valeurs), None))
+        if not predicats:
+            return self._dans_l_ordre(np.flatnonzero(self.actifs))
+
+        predicats.sort(key=lambda p: p[0])
+        _, champ, condition, plage = predicats[0]
+        if plage is not None:
+            candidats = np.sort(self.tries[champ].emplacements[plage[0]:plage[1]])
+        else:
+            candidats = np.flatnonzero(self.bitmaps[champ].masque(condition))
+        for _, champ, condition, plage in predicats[1:]:
+            if not len(candidats):
+                break
+            if plage is not None:
+                minimum, maximum = condition
+                valeurs = self.colonnes[champ][candidats]
+                garder = ~np.isnan(valeurs)
+                if minimum is not None:
+                    garder &= valeurs >= minimum
+                if maximum is not None:
+                    garder &= valeurs <= maximum
+            else:
+                garder = self.bitmaps[champ].masque(condition)[candidats]
+            candidats = candidats[garder]
+        return self._dans_l_ordre(candidats)
+
+    def _dans_l_ordre(self, emplacements: np.ndarray) -> np.ndarray:
+        """Emplacements remis dans l'ordre du catalogue (les emplacements libérés sont réutilisés)."""
+        return emplacements[np.argsort(self.rangs[emplacements], kind='stable')]
+
+    def requete(self, bornes: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                egal: Optional[Dict[str, Sequence]] = None, tri: Optional[str] = None,
+                croissant: bool = True) -> np.ndarray:
+        """Identifiants des biens satisfaisant tous les prédicats.
+
+        bornes associe à un champ de CHAMPS_INTERVALLE un couple (minimum,
+        maximum) inclus, None pour une borne ouverte ; egal associe à un champ
+        de CHAMPS_EGALITE les valeurs acceptées (liste vide : pas de filtre).
+        Sans tri, les biens sont dans l'ordre du catalogue ; sinon selon le
+        champ de tri (valeurs absentes en dernier, ex aequo dans l'ordre du
+        catalogue).
+        """
+        bornes, egal = bornes or {}, egal or {}
+        self._verifier(bornes, egal)
+        if tri is not None and tri not in CHAMPS_INTERVALLE:
+            raise ValueError(f"Tri impossible sur {tri} (attendu: {', '.join(CHAMPS_INTERVALLE)})")
+        with self._lock:
+            emplacements = self._emplacements_retenus(bornes, egal)
+            if tri is not None:
+                valeurs = self.colonnes[tri][emplacements]
+                emplacements = emplacements[np.argsort(valeurs if croissant else -valeurs, kind='stable')]
+            return self.ids[emplacements]
+
+    def compter(self, bornes=None, egal=None) -> int:
+        """Nombre de biens satisfaisant tous les prédicats."""
+        bornes, egal = bornes or {}, egal or {}
+        self._verifier(bornes, egal)
+        with self._lock:
+            return len(self._emplacements_retenus(bornes, egal))
+
+    def etendue(self, champ: str) -> Optional[Tuple[float, float]]:
+        """Plus petite et plus grande valeur d'un champ de CHAMPS_INTERVALLE dans le catalogue."""
+        with self._lock:
+            return self.tries[champ].etendue()
+
+    def valeurs(self, champ: str) -> List:
+        """Valeurs présentes d'un champ de CHAMPS_EGALITE, triées."""
+        with self._lock:
+            return self.bitmaps[champ].valeurs()
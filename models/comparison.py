@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from .property import Property
+from .loan import mensualite_credit
+from .simulation import cout_acquisition
+from .stations import StationIndex, coordonnees, distances_transport
+
+# Score énergétique par classe DPE (20 pour E, F, G ou inconnu)
+SCORES_DPE = {'A': 100, 'B': 80, 'C': 60, 'D': 40}
+SCORE_DPE_DEFAUT = 20
+# Axes du graphique radar (colonne, libellé)
+AXES_RADAR = (('score_prix', 'Prix/m²'), ('score_transport', 'Transport'),
+              ('score_dpe', 'DPE'), ('score_atouts', 'Atouts'))
+
+
+def scores_transport(distances: np.ndarray, nb_stations: np.ndarray) -> np.ndarray:
+    """Score transport (0-100) de chaque bien, à partir des distances de toutes ses stations.
+
+    distances concatène les distances (en mètres) des stations de tous les
+    biens, nb_stations donne le nombre de stations de chaque bien. Même
+    calcul que Property.score_transport : moyenne de max(0, 100 - d / 10).
+    """
+    nb_stations = np.asarray(nb_stations, dtype=int)
+    scores = np.maximum(0, 100 - np.asarray(distances, dtype=float) / 10)
+    sommes = np.zeros(len(nb_stations))
+    avec_stations = nb_stations > 0
+    if scores.size:
+        debuts = np.concatenate(([0], np.cumsum(nb_stations)[:-1]))
+        sommes[avec_stations] = np.add.reduceat(scores, debuts[avec_stations])
+    with np.errstate(invalid='ignore'):
+        return np.where(avec_stations, np.round(sommes / np.maximum(nb_stations, 1), 2), 0.0)
+
+
+def scores_dpe(dpe: np.ndarray) -> np.ndarray:
+    """Score énergétique (0-100) de chaque classe DPE."""
+    classes, inverse = np.unique(np.asarray(dpe, dtype=str), return_inverse=True)
+    return np.array([SCORES_DPE.get(c.upper(), SCORE_DPE_DEFAUT) for c in classes], dtype=float)[inverse]
+
+
+@dataclass
+class ComparisonTable:
+    """Vue en colonnes du catalogue et de ses indicateurs dérivés.
+
+    Chaque colonne est un tableau aligné sur les biens ; les requêtes
+    (filtre, tri, pagination) renvoient des indices dans ces tableaux.
+    """
+    colonnes: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.colonnes['id'])
+
+    def filtrer(self, bornes: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                dpe: Optional[Sequence[str]] = None, recherche: str = '',
+                parmi: Optional[np.ndarray] = None) -> np.ndarray:
+        """Masque des biens dont les colonnes sont dans les bornes (incluses), la classe DPE et l'adresse.
+
+        parmi restreint éventuellement le résultat à une liste d'indices
+        (par exemple les biens proches d'une ligne de métro).
+        """
+        masque = np.ones(len(self), dtype=bool)
+        if parmi is not None:
+            masque[:] = False
+            masque[parmi] = True
+        for colonne, (minimum, maximum) in (bornes or {}).items():
+            valeurs = self.colonnes[colonne]
+            if minimum is not None:
+                masque &= valeurs >= minimum
+            if maximum is not None:
+                masque &= valeurs <= maximum
+        if dpe:
+            masque &= np.isin(self.colonnes['dpe'], list(dpe))
+        if recherche:
+            recherche = recherche.lower()
+            masque &= np.fromiter((recherche in a.lower() or recherche in i
+                                   for a, i in zip(self.colonnes['adresse'], self.colonnes['id'])),
+                                  dtype=bool, count=len(self))
+        return masque
+
+    def trier(self, indices: np.ndarray, colonne: str, croissant: bool = True) -> np.ndarray:
+        """Trie des indices selon une colonne (tri stable, valeurs absentes en dernier)."""
+        valeurs = self.colonnes[colonne][indices]
+        if valeurs.dtype.kind == 'f':
+            cle = valeurs if croissant else -valeurs
+        else:
+            # Rang de chaque valeur, pour trier aussi les chaînes en ordre décroissant
+            _, rangs = np.unique(valeurs.astype(str), return_inverse=True)
+            cle = rangs if croissant else -rangs
+        return indices[np.argsort(cle, kind='stable')]
+
+    def selection(self, bornes=None, dpe=None, recherche: str = '', tri: str = 'prix_m2',
+                  croissant: bool = True, parmi: Optional[np.ndarray] = None) -> np.ndarray:
+        """Indices des biens retenus par les filtres, dans l'ordre du tri."""
+        return self.trier(np.flatnonzero(self.filtrer(bornes, dpe, recherche, parmi)), tri, croissant)
+
+    def requete(self, bornes=None, dpe=None, recherche: str = '', tri: str = 'prix_m2', croissant: bool = True,
+                page: int = 0, taille_page: int = 50) -> Tuple[np.ndarray, int]:
+        """Filtre, trie et pagine le catalogue ; renvoie les indices de la page et le nombre de résultats."""
+        indices = self.selection(bornes, dpe, recherche, tri, croissant)
+        debut = max(page, 0) * taille_page
+        return indices[debut:debut + taille_page], len(indices)
+
+    def dataframe(self, indices: Optional[np.ndarray] = None):
+        """Lignes demandées (toutes par défaut) sous forme de DataFrame pandas."""
+        import pandas as pd
+        if indices is None:
+            indices = slice(None)
+        return pd.DataFrame({nom: valeurs[indices] for nom, valeurs in self.colonnes.items()})
+
+
+def comparison_table(properties: Sequence[Property], config=None, negociation: float = 0,
+                     stations: Optional[StationIndex] = None) -> ComparisonTable:
+    """Calcule en une passe vectorisée les indicateurs de comparaison de tous les biens.
+
+    Le coût mensuel total comprend, si config est fourni, la mensualité du
+    crédit (assurance comprise) pour l'apport immobilier de la configuration,
+    puis les charges de copropriété, l'énergie et la taxe foncière mensualisée.
+    Avec un index de stations, le score transport des biens localisés est
+    recalculé à partir des stations les plus proches de chaque ligne, et une
+    colonne distance_<ligne> permet de filtrer les biens proches d'une ligne.
+    """
+    properties = list(properties)
+    prix = np.array([p.prix for p in properties], dtype=float)
+    surface = np.array([p.surface for p in properties], dtype=float)
+    charges = np.array([p.charges_mensuelles for p in properties], dtype=float)
+    taxe_fonciere = np.array([p.taxe_fonciere or 0 for p in properties], dtype=float)
+    energie = np.array([p.energie or 0 for p in properties], dtype=float)
+    dpe = np.array([p.dpe for p in properties], dtype=object)
+    if stations is not None:
+        distances, nb_stations = distances_transport(properties, stations)
+    else:
+        nb_stations = np.array([len(p.metros) for p in properties], dtype=int)
+        distances = np.array([m.distance for p in properties for m in p.metros], dtype=float)
+    latitudes, longitudes = coordonnees(properties)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prix_m2 = np.where(surface > 0, prix / surface,
+                           np.array([p.prix_m2 for p in properties], dtype=float))
+
+    cout_mensuel = charges + energie + taxe_fonciere / 12
+    if config is not None:
+        cout_total = cout_acquisition(prix, np.array([p.prix_hors_honoraires for p in properties], dtype=float),
+                                      np.array([p.frais_agence_acquereur for p in properties], dtype=bool),
+                                      negociation)
+        montant_pret = cout_total - config.apport_total * config.repartition_immobilier / 100
+        cout_mensuel = cout_mensuel + np.where(montant_pret > 0, mensualite_credit(
+            montant_pret, config.taux_credit, config.duree_credit, config.taux_assurance), 0.0)
+
+    # Distance à la station la plus proche de chaque ligne (inf au-delà de la portée ou sans coordonnées)
+    proximite = {}
+    if stations is not None:
+        lignes, matrice = stations.distances_lignes(latitudes, longitudes)
+        proximite = {f"distance_{ligne}": matrice[:, j] for j, ligne in enumerate(lignes)}
+
+    nb_atouts = np.array([len(p.atouts) for p in properties], dtype=float)
+    return ComparisonTable(colonnes={
+        'id': np.array([p.id for p in properties], dtype=object),
+        'adresse': np.array([p.adresse for p in properties], dtype=object),
+        'latitude': latitudes,
+        'longitude': longitudes,
+        'surface': surface,
+        'prix': prix,
+        'prix_m2': prix_m2,
+        'charges_mensuelles': charges,
+        'taxe_fonciere': taxe_fonciere,
+        'cout_mensuel': cout_mensuel,
+        'dpe': dpe,
+        'score_transport': scores_transport(distances, nb_stations),
+        'score_dpe': scores_dpe(dpe),
+        'nb_atouts': nb_atouts,
+        # Échelles du radar (0-100)
+        'score_prix': prix_m2 / 100,
+        'score_atouts': np.minimum(nb_atouts * 10, 100),
+        **proximite,
+    })
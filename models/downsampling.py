@@ -0,0 +1,51 @@
+from typing import Optional, Tuple
+import numpy as np
+
+
+def lttb(x, y, nb_points: int) -> np.ndarray:
+    """Indices des points retenus par Largest-Triangle-Three-Buckets.
+
+    y a la forme (n,) ou (séries, n), les séries partageant l'abscisse x
+    (croissante). Le premier et le dernier point sont conservés ; chaque
+    seau intermédiaire garde le point formant le plus grand triangle avec le
+    point retenu précédemment et la moyenne du seau suivant, ce qui préserve
+    les pics et la forme de la courbe. Les seaux sont parcourus une seule
+    fois pour toutes les séries. Renvoie des indices de forme (nb_points,)
+    ou (séries, nb_points), ou tous les indices si la série est assez courte.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    simple = y.ndim == 1
+    y = np.atleast_2d(y)
+    nb_series, n = y.shape
+    if nb_points >= n or nb_points < 3:
+        indices = np.broadcast_to(np.arange(n), (nb_series, n))
+        return indices[0] if simple else indices
+
+    # Seaux intermédiaires [bornes[i], bornes[i + 1]) entre le premier et le dernier point
+    bornes = np.arange(nb_points - 1) * (n - 2) // (nb_points - 2) + 1
+    lignes = np.arange(nb_series)
+    indices = np.empty((nb_series, nb_points), dtype=int)
+    indices[:, 0] = 0
+    indices[:, -1] = n - 1
+    precedent = np.zeros(nb_series, dtype=int)
+    for i in range(nb_points - 2):
+        debut, fin = bornes[i], bornes[i + 1]
+        # Sommet du triangle dans le seau suivant : sa moyenne (ou le dernier point)
+        suivant_debut, suivant_fin = (fin, bornes[i + 2]) if i + 2 < len(bornes) else (n - 1, n)
+        x_moyen = x[suivant_debut:suivant_fin].mean()
+        y_moyen = y[:, suivant_debut:suivant_fin].mean(axis=1)
+        xa, ya = x[precedent], y[lignes, precedent]
+        aires = np.abs((xa - x_moyen)[:, None] * (y[:, debut:fin] - ya[:, None])
+                       - (xa[:, None] - x[None, debut:fin]) * (y_moyen - ya)[:, None])
+        precedent = debut + np.argmax(aires, axis=1)
+        indices[:, i + 1] = precedent
+    return indices[0] if simple else indices
+
+
+def fenetre(x, periode: Optional[Tuple[float, float]] = None) -> np.ndarray:
+    """Masque des abscisses comprises dans la période affichée (toutes par défaut)."""
+    x = np.asarray(x, dtype=float)
+    if periode is None:
+        return np.ones(len(x), dtype=bool)
+    return (x >= periode[0]) & (x <= periode[1])
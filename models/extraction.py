@@ -0,0 +1,392 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+import asyncio
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import unicodedata
+import yaml
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError
+from .cache import DiskCache, LRUCache
+
+PROMPTS_FILE = 'data/renseignement-prompt.yaml'
+
+# Réponses du modèle conservées sur disque (LLM_CACHE_DIR pour un autre emplacement)
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", 'data/cache/llm')
+
+# Prompts relus uniquement quand le fichier change (clé : chemin, date, taille)
+_PROMPTS = LRUCache(maxsize=8)
+
+# Format de réponse attendu (structure de properties.json)
+PROPERTY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "error": {
+            "type": "string",
+            "description": "Message d'erreur si les informations sont insuffisantes"
+        },
+        "property": {
+            "type": "object",
+            "properties": {
+                # Copie du schéma de notre properties.json
+                "adresse": {"type": "string"},
+                "lien_annonce": {"type": ["string", "null"]},
+                "bien": {
+                    "type": "object",
+                    "properties": {
+                        "type": {"type": "string"},
+                        "surface": {"type": "number"},
+                        "etage": {"type": "string"},
+                        "nb_pieces": {"type": ["integer", "null"]},
+                        "orientation": {"type": ["string", "null"]},
+                        "pieces": {
+                            "type": "object",
+                            "properties": {
+                                "sejour_cuisine": {"type": ["number", "null"]},
+                                "chambre": {"type": ["number", "null"]}
+                            },
+                            "required": ["sejour_cuisine", "chambre"],
+                            "additionalProperties": False
+                        },
+                        "dpe": {"type": ["string", "null"]},
+                        "ges": {"type": ["string", "null"]},
+                        "cave": {"type": "boolean"}
+                    },
+                    "required": ["type", "surface", "etage", "orientation", "pieces", "dpe", "ges", "cave"],
+                    "additionalProperties": False
+                },
+                "prix": {
+                    "type": "object",
+                    "properties": {
+                        "annonce": {"type": "number"},
+                        "hors_honoraires": {"type": "number"},
+                        "m2": {"type": "number"},
+                        "honoraires": {
+                            "type": "object",
+                            "properties": {
+                                "montant": {"type": "number"},
+                                "pourcentage": {"type": "number"}
+                            },
+                            "required": ["montant", "pourcentage"],
+                            "additionalProperties": False
+                        },
+                        "negociable": {"type": ["boolean", "null"]},
+                        "frais_agence_acquereur": {"type": "boolean"}
+                    },
+                    "required": ["annonce", "hors_honoraires", "m2", "honoraires", "negociable", "frais_agence_acquereur"],
+                    "additionalProperties": False
+                },
+                "metros": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "ligne": {"type": "string"},
+                            "station": {"type": "string"},
+                            "distance": {"type": "number"}
+                        },
+                        "required": ["ligne", "station", "distance"],
+                        "additionalProperties": False
+                    }
+                },
+                "charges": {
+                    "type": "object",
+                    "properties": {
+                        "mensuelles": {"type": "number"},
+                        "taxe_fonciere": {"type": ["number", "null"]},
+                        "energie": {"type": ["number", "null"]},
+                        "chauffage": {"type": ["string", "null"]}
+                    },
+                    "required": ["mensuelles", "taxe_fonciere", "energie", "chauffage"],
+                    "additionalProperties": False
+                },
+                "copro": {
+                    "type": "object",
+                    "properties": {
+                        "lots": {"type": ["number", "null"]}
+                    },
+                    "required": ["lots"],
+                    "additionalProperties": False
+                },
+                "atouts": {
+                    "type": "array",
+                    "items": {"type": "string"}
+                },
+                "vigilance": {
+                    "type": "array",
+                    "items": {"type": "string"}
+                },
+                "contact": {"type": "string"}
+            },
+            "required": ["adresse", "bien", "prix", "metros", "charges", "copro", "atouts", "vigilance", "contact"],
+            "additionalProperties": False
+        }
+    },
+    "required": ["error", "property"],
+    "additionalProperties": False
+}
+
+
+def load_prompts(path: str = PROMPTS_FILE) -> Dict:
+    """Charge les prompts depuis le fichier YAML (mis en cache tant qu'il n'est pas modifié)."""
+    stat = os.stat(path)
+
+    def lire():
+        with open(path, 'r') as f:
+            return yaml.safe_load(f)
+    return _PROMPTS.get_or_compute((path, stat.st_mtime_ns, stat.st_size), lire)
+
+
+def build_messages(prompts: Dict, text: str, existing_property: Optional[Dict] = None) -> List[Dict]:
+    """Messages envoyés au modèle pour une annonce (création ou mise à jour d'un bien)."""
+    if existing_property:
+        prompt = prompts['prompts']['update_property'].format(
+            existing_property=json.dumps(existing_property, ensure_ascii=False, indent=2),
+            user_input=text
+        )
+    else:
+        prompt = prompts['prompts']['new_property'].format(user_input=text)
+    return [
+        {"role": "system", "content": prompts['system']},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def normalize_text(text: str) -> str:
+    """Forme canonique d'une annonce : Unicode NFC, espaces consécutifs fusionnés."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def response_key(text: str, existing_property: Optional[Dict], messages_prompt: Dict, model: str) -> str:
+    """Clé de cache d'une extraction : annonce normalisée, prompts, schéma, modèle et bien existant."""
+    return DiskCache.key(normalize_text(text), messages_prompt, PROPERTY_SCHEMA, model, existing_property)
+
+
+@dataclass
+class ExtractionConfig:
+    model: str = "gpt-4o-mini"
+    concurrence: int = 8  # requêtes simultanées au maximum
+    requetes_par_minute: int = 500
+    tokens_par_minute: int = 200000
+    tokens_reponse: int = 1500  # estimation des tokens de sortie réservés par requête
+    tentatives: int = 5
+    delai_initial: float = 1.0  # secondes avant la première nouvelle tentative
+    delai_max: float = 30.0
+    timeout: float = 60.0
+    base_url: Optional[str] = None  # serveur compatible OpenAI (tests, proxy)
+    hors_ligne: bool = False  # réponses servies uniquement depuis le cache (rejeu sans réseau)
+
+
+@dataclass
+class ExtractionResult:
+    indice: int
+    succes: bool
+    contenu: Optional[str] = None  # réponse JSON brute du modèle
+    erreur: Optional[str] = None
+    tentatives: int = 0
+    duree: float = 0.0
+    tokens: Optional[int] = None
+    en_cache: bool = False
+
+    @property
+    def donnees(self) -> Optional[Dict]:
+        """Réponse décodée, ou None si l'extraction a échoué."""
+        return json.loads(self.contenu) if self.succes else None
+
+
+class RateLimiter:
+    """Seau à jetons asynchrone : capacite unités par minute, rechargées en continu."""
+
+    def __init__(self, par_minute: float):
+        self.capacite = float(par_minute)
+        self.disponible = float(par_minute)
+        self.debit = par_minute / 60
+        self._dernier = time.monotonic()
+        self._verrou = asyncio.Lock()
+
+    def _recharger(self):
+        maintenant = time.monotonic()
+        self.disponible = min(self.capacite, self.disponible + (maintenant - self._dernier) * self.debit)
+        self._dernier = maintenant
+
+    async def acquire(self, quantite: float = 1):
+        """Attend que quantite unités soient disponibles puis les consomme (ordre d'arrivée)."""
+        quantite = min(quantite, self.capacite)
+        async with self._verrou:
+            self._recharger()
+            while self.disponible < quantite:
+                await asyncio.sleep((quantite - self.disponible) / self.debit)
+                self._recharger()
+            self.disponible -= quantite
+
+
+def _reessayable(erreur: Exception) -> bool:
+    """Erreurs transitoires : réseau, délai dépassé, limitation de débit (429) et erreurs serveur."""
+    if isinstance(erreur, APIConnectionError):
+        return True
+    return isinstance(erreur, APIStatusError) and (erreur.status_code == 429 or erreur.status_code >= 500)
+
+
+def _delai_serveur(erreur: Exception) -> Optional[float]:
+    """Délai demandé par le serveur (en-tête Retry-After), s'il est présent."""
+    response = getattr(erreur, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def creer_client(config: Optional[ExtractionConfig] = None) -> AsyncOpenAI:
+    """Client de l'API pour ListingExtractor (les nouvelles tentatives sont gérées par l'extracteur)."""
+    config = config or ExtractionConfig()
+    return AsyncOpenAI(base_url=config.base_url, timeout=config.timeout, max_retries=0)
+
+
+class ListingExtractor:
+    """Extraction concurrente d'annonces par le modèle, avec un client HTTP partagé.
+
+    À utiliser comme gestionnaire de contexte asynchrone :
+        async with ListingExtractor() as extracteur:
+            resultats = await extracteur.extract_batch(textes)
+    Le nombre de requêtes simultanées est borné par config.concurrence, le
+    débit par deux seaux à jetons (requêtes et tokens par minute). Les erreurs
+    transitoires sont retentées avec un délai exponentiel aléatoire ; chaque
+    annonce produit un ExtractionResult, sans interrompre le lot. Les réponses
+    valides sont conservées dans cache, si fourni, et resservies sans appel.
+    Un client fourni n'est pas fermé en sortie du contexte.
+    """
+
+    def __init__(self, config: Optional[ExtractionConfig] = None, prompts_path: str = PROMPTS_FILE,
+                 client: Optional[AsyncOpenAI] = None, cache: Optional[DiskCache] = None):
+        self.config = config or ExtractionConfig()
+        self.prompts = load_prompts(prompts_path)
+        self.cache = cache
+        self._client_propre = client is None
+        self.client = client or creer_client(self.config)
+        self._semaphore = asyncio.Semaphore(self.config.concurrence)
+        self._requetes = RateLimiter(self.config.requetes_par_minute)
+        self._tokens = RateLimiter(self.config.tokens_par_minute)
+
+    async def __aenter__(self) -> 'ListingExtractor':
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._client_propre:
+            await self.client.close()
+
+    def _estimer_tokens(self, messages: List[Dict]) -> int:
+        """Estimation grossière (4 caractères par token) des tokens consommés par une requête."""
+        return sum(len(m['content']) for m in messages) // 4 + self.config.tokens_reponse
+
+    async def extract(self, text: str, existing_property: Optional[Dict] = None, indice: int = 0) -> ExtractionResult:
+        """Extrait les informations d'une annonce ; les erreurs sont renvoyées dans le résultat."""
+        messages = build_messages(self.prompts, text, existing_property)
+        debut = time.monotonic()
+        if self.cache is not None:
+            # Seuls les gabarits comptent dans la clé : l'annonce y figure sous forme normalisée
+            prompt = {'system': self.prompts['system'], 'prompts': self.prompts['prompts']}
+            cle = response_key(text, existing_property, prompt, self.config.model)
+            contenu = self.cache.get(cle)
+            if contenu is not None:
+                return ExtractionResult(indice=indice, succes=True, contenu=contenu,
+                                        duree=time.monotonic() - debut, en_cache=True)
+        if self.config.hors_ligne:
+            return ExtractionResult(indice=indice, succes=False, erreur="Réponse absente du cache (mode hors ligne)")
+
+        tentative = 0
+        async with self._semaphore:
+            while True:
+                tentative += 1
+                await self._requetes.acquire()
+                await self._tokens.acquire(self._estimer_tokens(messages))
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=self.config.model,
+                        messages=messages,
+                        response_format={
+                            "type": "json_schema",
+                            "json_schema": {"name": "property_schema", "schema": PROPERTY_SCHEMA, "strict": True}
+                        }
+                    )
+                    contenu = response.choices[0].message.content
+                    json.loads(contenu)
+                except Exception as e:
+                    if tentative < self.config.tentatives and _reessayable(e):
+                        delai = _delai_serveur(e)
+                        if delai is None:
+                            delai = min(self.config.delai_max, self.config.delai_initial * 2 ** (tentative - 1))
+                            delai *= random.uniform(0.5, 1)
+                        await asyncio.sleep(delai)
+                        continue
+                    return ExtractionResult(indice=indice, succes=False, erreur=f"Erreur lors de l'appel à l'API : {e}",
+                                            tentatives=tentative, duree=time.monotonic() - debut)
+
+                if self.cache is not None:
+                    self.cache.set(cle, contenu)
+                usage = getattr(response, 'usage', None)
+                return ExtractionResult(indice=indice, succes=True, contenu=contenu, tentatives=tentative,
+                                        duree=time.monotonic() - debut,
+                                        tokens=getattr(usage, 'total_tokens', None))
+
+    async def extract_batch(self, texts: Sequence[str], existing_properties: Optional[Sequence[Optional[Dict]]] = None,
+                            progression: Optional[Callable[[ExtractionResult], None]] = None) -> List[ExtractionResult]:
+        """Extrait un lot d'annonces en parallèle ; les résultats suivent l'ordre des textes."""
+        existing_properties = existing_properties or [None] * len(texts)
+
+        async def tache(indice, text, existing):
+            resultat = await self.extract(text, existing, indice)
+            if progression:
+                progression(resultat)
+            return resultat
+
+        return list(await asyncio.gather(*(tache(i, text, existing) for i, (text, existing)
+                                           in enumerate(zip(texts, existing_properties)))))
+
+
+# Boucle d'événements des clients partagés : le pool de connexions d'un AsyncOpenAI est lié à
+# la boucle qui l'utilise, un client réutilisé d'un appel à l'autre doit donc toujours tourner sur la même
+_boucle_partagee: Optional[asyncio.AbstractEventLoop] = None
+_verrou_boucle = threading.Lock()
+
+
+def _boucle_clients() -> asyncio.AbstractEventLoop:
+    """Boucle d'événements des clients partagés, démarrée au premier appel dans un fil de fond."""
+    global _boucle_partagee
+    with _verrou_boucle:
+        if _boucle_partagee is None:
+            _boucle_partagee = asyncio.new_event_loop()
+            threading.Thread(target=_boucle_partagee.run_forever, name='extraction', daemon=True).start()
+        return _boucle_partagee
+
+
+def extract_listings(texts: Sequence[str], existing_properties: Optional[Sequence[Optional[Dict]]] = None,
+                     config: Optional[ExtractionConfig] = None, prompts_path: str = PROMPTS_FILE,
+                     progression: Optional[Callable[[ExtractionResult], None]] = None,
+                     cache: Optional[DiskCache] = None, client: Optional[AsyncOpenAI] = None) -> List[ExtractionResult]:
+    """Version synchrone de ListingExtractor.extract_batch.
+
+    Sans client, un client est créé puis fermé pour ce lot. Un client fourni
+    (voir creer_client) est conservé : le lot s'exécute sur la boucle
+    d'événements partagée, pour que ses connexions servent aux appels
+    suivants, et progression est appelée dans le fil de l'appelant.
+    """
+    async def executer(rapporter):
+        async with ListingExtractor(config, prompts_path, client=client, cache=cache) as extracteur:
+            return await extracteur.extract_batch(texts, existing_properties, rapporter)
+
+    if client is None:
+        return asyncio.run(executer(progression))
+
+    termines = queue.Queue()
+    futur = asyncio.run_coroutine_threadsafe(executer(termines.put if progression else None), _boucle_clients())
+    futur.add_done_callback(lambda _: termines.put(None))
+    while progression is not None:
+        resultat = termines.get()
+        if resultat is None:
+            break
+        progression(resultat)
+    return futur.result()
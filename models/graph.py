@@ -0,0 +1,215 @@
+from typing import Any, Callable, Dict, Sequence, Tuple
+import numpy as np
+from .loan import Pret, Tranche, RemboursementAnticipe
+from .profiling import section
+from .simulation import (croissance_composee, serie_epargne, simulate_charges, deflater,
+                         LIVRET_A_PLAFOND, LDD_PLAFOND, ECART_COMPTE_TERME, TAUX_FRAIS_NOTAIRE)
+
+# Frais d'agence estimés à la revente
+TAUX_FRAIS_REVENTE = 0.05
+
+
+def _identiques(a, b) -> bool:
+    """Vrai si une valeur recalculée est identique à la précédente (tableaux compris)."""
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return isinstance(a, np.ndarray) and isinstance(b, np.ndarray) and np.array_equal(a, b)
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False  # comparaison ambiguë (dictionnaires de tableaux...) : considérée comme un changement
+
+
+class ComputationGraph:
+    """Graphe de calcul incrémental, évalué à la demande.
+
+    Chaque nœud déclare les entrées ou nœuds dont il dépend (déjà définis, ce
+    qui exclut les cycles). À la lecture, un nœud n'est recalculé que si la
+    version de l'une de ses dépendances a changé depuis son dernier calcul ;
+    une valeur recalculée à l'identique garde sa version, sans propager de
+    recalcul à ses dépendants. recalculs compte les calculs de chaque nœud.
+    """
+
+    def __init__(self, entrees: Sequence[str] = ()):
+        self._entrees = set(entrees)
+        self._noeuds: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {}
+        self._valeurs: Dict[str, Any] = {}
+        self._versions: Dict[str, int] = {}
+        self._vues: Dict[str, Tuple[int, ...]] = {}  # versions des dépendances au dernier calcul
+        self.recalculs: Dict[str, int] = {}
+
+    def noeud(self, nom: str, fonction: Callable, *dependances: str):
+        """Définit un nœud calculé par fonction(*valeurs des dépendances)."""
+        if nom in self._entrees or nom in self._noeuds:
+            raise ValueError(f"Nœud déjà défini: {nom}")
+        inconnues = [d for d in dependances if d not in self._entrees and d not in self._noeuds]
+        if inconnues:
+            raise ValueError(f"Dépendances inconnues pour {nom}: {', '.join(inconnues)}")
+        self._noeuds[nom] = (fonction, dependances)
+        self.recalculs[nom] = 0
+
+    def definir(self, **valeurs):
+        """Fixe des entrées ; seules celles dont la valeur change invalident leurs dépendants."""
+        for nom, valeur in valeurs.items():
+            if nom not in self._entrees:
+                raise KeyError(f"Entrée inconnue: {nom}")
+            if nom not in self._valeurs or not _identiques(self._valeurs[nom], valeur):
+                self._valeurs[nom] = valeur
+                self._versions[nom] = self._versions.get(nom, 0) + 1
+
+    def __getitem__(self, nom: str):
+        if nom in self._entrees:
+            if nom not in self._valeurs:
+                raise KeyError(f"Entrée non définie: {nom}")
+            return self._valeurs[nom]
+        fonction, dependances = self._noeuds[nom]
+        arguments = [self[d] for d in dependances]
+        vues = tuple(self._versions[d] for d in dependances)
+        if self._vues.get(nom) != vues:
+            with section(f"graphe.{nom}"):
+                valeur = fonction(*arguments)
+            self.recalculs[nom] += 1
+            if nom not in self._valeurs or not _identiques(self._valeurs[nom], valeur):
+                self._valeurs[nom] = valeur
+                self._versions[nom] = self._versions.get(nom, 0) + 1
+            self._vues[nom] = vues
+        return self._valeurs[nom]
+
+    def dependances(self, nom: str) -> Tuple[str, ...]:
+        """Dépendances directes d'un nœud."""
+        return self._noeuds[nom][1]
+
+
+# Entrées de l'interface de simulation d'un bien
+ENTREES_SIMULATION = (
+    'bien', 'negociation', 'apport_total', 'apport_immobilier', 'horizon',
+    'taux_credit', 'duree_credit', 'taux_assurance', 'montant_ptz', 'duree_ptz', 'differe_ptz',
+    'annee_anticipe', 'montant_anticipe', 'evolution_immobilier', 'part_securisee',
+    'rendement_epargne', 'rendement_investissement', 'inflation', 'evolution_charges',
+)
+
+
+def _pret(montant_pret, taux_credit, duree_credit, taux_assurance, montant_ptz, duree_ptz, differe_ptz,
+          annee_anticipe, montant_anticipe) -> Pret:
+    """Prêt principal, PTZ éventuel (plafonné au montant emprunté) et remboursement anticipé."""
+    montant_ptz = min(montant_ptz, montant_pret)
+    tranches = [Tranche(montant_pret - montant_ptz, taux_credit, duree_credit, taux_assurance)]
+    if montant_ptz > 0:
+        tranches.append(Tranche(montant_ptz, 0.0, duree_ptz, taux_assurance, differe=differe_ptz * 12, nom="PTZ"))
+    remboursements = ()
+    if annee_anticipe > 0 and montant_anticipe > 0:
+        remboursements = (RemboursementAnticipe(mois=annee_anticipe * 12, montant=montant_anticipe),)
+    return Pret(tranches=tuple(tranches), remboursements=remboursements)
+
+
+def _repartition(apport_total, apport_immobilier, part_securisee) -> Dict[str, float]:
+    """Répartition de l'apport en pourcentages, comme dans ScenarioConfig."""
+    immobilier = (apport_immobilier / apport_total) * 100 if apport_total > 0 else 0
+    return {
+        'immobilier': immobilier,
+        'epargne': (100 - immobilier) * (part_securisee / 100),
+        'investissement': (100 - immobilier) * (1 - part_securisee / 100),
+    }
+
+
+def _placements(apport_total, apport_immobilier, part_securisee, rendement_epargne,
+                rendement_investissement) -> Dict[str, float]:
+    """Ventilation de l'épargne sécurisée (Livret A, LDD, compte à terme) et rendement moyen."""
+    hors_immobilier = apport_total - apport_immobilier
+    securise = hors_immobilier * (part_securisee / 100)
+    dynamique = hors_immobilier * (1 - part_securisee / 100)
+    livret_a = min(securise, LIVRET_A_PLAFOND)
+    ldd = min(securise - livret_a, LDD_PLAFOND)
+    compte_terme = max(0, securise - livret_a - ldd)
+    total = securise + dynamique
+    rendement_moyen = ((livret_a * rendement_epargne + ldd * rendement_epargne
+                        + compte_terme * (rendement_epargne - ECART_COMPTE_TERME)
+                        + dynamique * rendement_investissement) / total) if total > 0 else 0
+    return {'livret_a': livret_a, 'ldd': ldd, 'compte_terme': compte_terme, 'dynamique': dynamique,
+            'rendement_moyen': rendement_moyen}
+
+
+def _patrimoine(valeur_bien, amortissement, epargne, investissement, inflation, nb_mois) -> Dict[str, np.ndarray]:
+    """Séries du patrimoine, assemblées comme dans simulate_series."""
+    capital_restant = amortissement.total('capital_restant')
+    patrimoine_total = valeur_bien - capital_restant + epargne + investissement
+    return {
+        'valeur_bien': valeur_bien,
+        'capital_restant': capital_restant,
+        'epargne': epargne,
+        'investissement': investissement,
+        'patrimoine_total': patrimoine_total,
+        'patrimoine_reel': deflater(patrimoine_total, inflation, nb_mois),
+    }
+
+
+def _resultats(patrimoine, amortissement, pret, cout_total, nb_mois) -> Dict[str, float]:
+    """Patrimoine à l'horizon en cas de revente (capital restant dû, IRA, frais d'agence)."""
+    capital_restant = float(patrimoine['capital_restant'][nb_mois])
+    valeur_bien = float(patrimoine['valeur_bien'][nb_mois])
+    epargne = float(patrimoine['epargne'][nb_mois] + patrimoine['investissement'][nb_mois])
+    frais_revente = valeur_bien * TAUX_FRAIS_REVENTE
+    # Indemnités de remboursement anticipé sur le capital restant de chaque tranche
+    penalites = float(sum(pret.penalite(capital, tranche.taux)
+                          for capital, tranche in zip(amortissement.capital_restant[:, nb_mois], pret.tranches)))
+    total_revente = valeur_bien - capital_restant - penalites - frais_revente
+    return {
+        'capital_restant': capital_restant,
+        'valeur_bien': valeur_bien,
+        'epargne': epargne,
+        'frais_revente': frais_revente,
+        'penalites': penalites,
+        'total_revente': total_revente,
+        'plus_value': total_revente - cout_total,
+        'patrimoine_final': total_revente + epargne,
+    }
+
+
+def simulation_graph() -> ComputationGraph:
+    """Grandeurs dérivées de la simulation d'un bien, des entrées de l'interface au patrimoine final.
+
+    Les séries sont celles de Scenario.simulate_patrimoine avec le prêt
+    construit à partir des entrées : changer la répartition de l'épargne ne
+    recalcule ni le prêt ni son amortissement, changer la négociation ne
+    recalcule pas les séries d'épargne.
+    """
+    g = ComputationGraph(ENTREES_SIMULATION)
+    g.noeud('nb_mois', lambda horizon: horizon * 12, 'horizon')
+    g.noeud('prix_negocie', lambda bien, negociation: bien.prix * (1 - negociation / 100), 'bien', 'negociation')
+    g.noeud('frais_notaire',
+            lambda bien, negociation, prix_negocie: TAUX_FRAIS_NOTAIRE * (
+                prix_negocie if bien.frais_agence_acquereur else bien.prix_hors_honoraires * (1 - negociation / 100)),
+            'bien', 'negociation', 'prix_negocie')
+    g.noeud('cout_total', lambda prix_negocie, frais_notaire: prix_negocie + frais_notaire, 'prix_negocie', 'frais_notaire')
+    g.noeud('montant_pret', lambda cout_total, apport: max(0, cout_total - apport), 'cout_total', 'apport_immobilier')
+    g.noeud('pret', _pret, 'montant_pret', 'taux_credit', 'duree_credit', 'taux_assurance',
+            'montant_ptz', 'duree_ptz', 'differe_ptz', 'annee_anticipe', 'montant_anticipe')
+    # Échéancier sur toute la durée du prêt (mensualité, tableau d'amortissement) et sur l'horizon (séries)
+    g.noeud('echeancier', lambda pret: pret.echeancier(), 'pret')
+    g.noeud('mensualite', lambda pret, e: float(e.mensualite[1]) if pret.duree_mois > 0 else 0.0, 'pret', 'echeancier')
+    g.noeud('assurance_mensuelle', lambda pret, e: float(e.total('assurance')[1]) if pret.duree_mois > 0 else 0.0,
+            'pret', 'echeancier')
+    g.noeud('amortissement', lambda pret, nb_mois: pret.echeancier(nb_mois), 'pret', 'nb_mois')
+    g.noeud('repartition', _repartition, 'apport_total', 'apport_immobilier', 'part_securisee')
+    g.noeud('placements', _placements, 'apport_total', 'apport_immobilier', 'part_securisee',
+            'rendement_epargne', 'rendement_investissement')
+    g.noeud('serie_epargne',
+            lambda apport_total, repartition, rendement, nb_mois: serie_epargne(
+                apport_total * (repartition['epargne'] / 100), rendement, nb_mois),
+            'apport_total', 'repartition', 'rendement_epargne', 'nb_mois')
+    g.noeud('serie_investissement',
+            lambda apport_total, repartition, rendement, nb_mois: croissance_composee(
+                apport_total * (repartition['investissement'] / 100), rendement, nb_mois),
+            'apport_total', 'repartition', 'rendement_investissement', 'nb_mois')
+    g.noeud('serie_valeur_bien', croissance_composee, 'cout_total', 'evolution_immobilier', 'nb_mois')
+    g.noeud('patrimoine', _patrimoine, 'serie_valeur_bien', 'amortissement', 'serie_epargne',
+            'serie_investissement', 'inflation', 'nb_mois')
+    g.noeud('resultats', _resultats, 'patrimoine', 'amortissement', 'pret', 'cout_total', 'nb_mois')
+    g.noeud('charges',
+            lambda bien, amortissement, evolution_charges, nb_mois: simulate_charges(
+                charges_mensuelles=bien.charges_mensuelles, taxe_fonciere=bien.taxe_fonciere or 0,
+                energie=bien.energie or 0, assurance=amortissement.total('assurance'),
+                evolution_charges=evolution_charges, nb_mois=nb_mois),
+            'bien', 'amortissement', 'evolution_charges', 'nb_mois')
+    return g
@@ -0,0 +1,211 @@
+from dataclasses import dataclass
+from typing import Tuple
+import numpy as np
+
+# Indemnités de remboursement anticipé : plafonds légaux
+PENALITE_TAUX_MAX = 3.0  # pourcentage du capital remboursé
+PENALITE_MOIS_INTERETS = 6  # mois d'intérêts sur le capital remboursé
+
+# Capital restant considéré comme soldé (résidus d'arrondi des calculs en forme fermée)
+RESIDU_CAPITAL = 1e-6
+
+
+def mensualite_constante(montant, taux, nombre_mois):
+    """Mensualité hors assurance d'un prêt amortissable à taux fixe (vectorisée)."""
+    montant = np.asarray(montant, dtype=float)
+    taux_mensuel = np.asarray(taux, dtype=float) / 12 / 100
+    nombre_mois = np.asarray(nombre_mois)
+    facteur = (1 + taux_mensuel) ** nombre_mois
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(
+            taux_mensuel > 0,
+            montant * (taux_mensuel * facteur) / (facteur - 1),
+            montant / np.maximum(nombre_mois, 1)
+        )
+
+
+def mensualite_credit(montant_pret, taux_credit, duree_credit, taux_assurance):
+    """Mensualité totale (crédit + assurance) arrondie au centime, vectorisée."""
+    mensualite = mensualite_constante(montant_pret, taux_credit, np.asarray(duree_credit) * 12)
+    mensualite_assurance = (np.asarray(montant_pret, dtype=float) * np.asarray(taux_assurance, dtype=float) / 100) / 12
+    return np.round(mensualite + mensualite_assurance, 2)
+
+
+def penalite_remboursement(montant_rembourse, taux, taux_max: float = PENALITE_TAUX_MAX,
+                           mois_interets: int = PENALITE_MOIS_INTERETS):
+    """Indemnité de remboursement anticipé : min(taux_max % du capital, mois_interets mois d'intérêts)."""
+    montant_rembourse = np.asarray(montant_rembourse, dtype=float)
+    interets = montant_rembourse * np.asarray(taux, dtype=float) / 12 / 100 * mois_interets
+    return np.minimum(montant_rembourse * taux_max / 100, interets)
+
+
+def capital_restant_du(montant_pret, mensualite, taux_credit, nb_mois: int) -> np.ndarray:
+    """Capital restant dû mois par mois, en forme fermée (nb_mois + 1 valeurs).
+
+    Reproduit la récurrence C[m] = max(0, C[m-1] * (1 + i) - mensualite) :
+    la suite affine est calculée d'un bloc, puis repart de zéro à partir du
+    premier mois où elle devient négative.
+    """
+    c0 = np.asarray(montant_pret, dtype=float)[..., None]
+    p = np.asarray(mensualite, dtype=float)[..., None]
+    i = np.asarray(taux_credit, dtype=float)[..., None] / 12 / 100
+    mois = np.arange(nb_mois + 1)
+
+    # (1 + i)^n et somme des (1 + i)^k pour k < n, par produit cumulé
+    pas = np.empty(i.shape[:-1] + (nb_mois + 1,))
+    pas[..., 0] = 1
+    pas[..., 1:] = 1 + i
+    facteur = np.cumprod(pas, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuites = np.where(i != 0, (facteur - 1) / np.where(i != 0, i, 1), mois)
+
+    # Suite affine x[m] = x[m-1] * (1 + i) - mensualite, sans plancher
+    libre = c0 * facteur - p * annuites
+
+    # Premier mois (m >= 1) où le capital serait négatif : il est ramené à zéro
+    # et la suite repart de zéro à partir de ce mois
+    negatif = libre <= 0
+    negatif[..., 0] = False
+    solde = np.logical_or.accumulate(negatif, axis=-1)
+    premier = np.argmax(negatif, axis=-1)[..., None]
+    depuis_solde = np.maximum(mois - premier, 0)
+    annuites = np.broadcast_to(annuites, np.broadcast_shapes(annuites.shape, depuis_solde.shape))
+    apres = -p * np.take_along_axis(annuites, depuis_solde, axis=-1)
+
+    return np.where(solde, np.maximum(0, apres), libre)
+
+
+@dataclass(frozen=True)
+class Tranche:
+    montant: float
+    taux: float  # taux annuel en pourcentage
+    duree: int  # durée d'amortissement en années (hors différé)
+    taux_assurance: float = 0.0  # pourcentage annuel du capital emprunté
+    differe: int = 0  # différé total en mois (intérêts capitalisés, aucune échéance)
+    nom: str = "Prêt principal"
+
+
+@dataclass(frozen=True)
+class RemboursementAnticipe:
+    mois: int  # mois du remboursement (après l'échéance de ce mois)
+    montant: float
+    tranche: int = 0  # indice de la tranche remboursée
+    reduire_duree: bool = True  # sinon la mensualité est recalculée sur la durée restante
+
+
+@dataclass
+class Echeancier:
+    """Tableau d'amortissement : chaque tableau a la forme (tranche, mois).
+
+    Le mois 0 correspond au déblocage des fonds (aucun flux). Le principal
+    est négatif pendant un différé (intérêts capitalisés).
+    """
+    interets: np.ndarray
+    principal: np.ndarray
+    assurance: np.ndarray
+    remboursements_anticipes: np.ndarray
+    penalites: np.ndarray
+    capital_restant: np.ndarray
+    noms: Tuple[str, ...]
+
+    def total(self, composante: str) -> np.ndarray:
+        """Somme d'une composante sur toutes les tranches."""
+        return getattr(self, composante).sum(axis=0)
+
+    @property
+    def mensualite(self) -> np.ndarray:
+        """Échéance hors assurance, toutes tranches confondues."""
+        return self.total('interets') + self.total('principal')
+
+    @property
+    def mensualite_totale(self) -> np.ndarray:
+        """Échéance assurance comprise, toutes tranches confondues."""
+        return self.mensualite + self.total('assurance')
+
+    @property
+    def cout_credit(self) -> float:
+        """Coût total du crédit (intérêts, assurance et pénalités)."""
+        return float(self.interets.sum() + self.assurance.sum() + self.penalites.sum())
+
+
+@dataclass(frozen=True)
+class Pret:
+    tranches: Tuple[Tranche, ...]
+    remboursements: Tuple[RemboursementAnticipe, ...] = ()
+    penalite_taux_max: float = PENALITE_TAUX_MAX
+    penalite_mois_interets: int = PENALITE_MOIS_INTERETS
+
+    @classmethod
+    def simple(cls, montant: float, taux: float, duree: int, taux_assurance: float = 0.0) -> 'Pret':
+        """Prêt amortissable à une seule tranche."""
+        return cls(tranches=(Tranche(montant=montant, taux=taux, duree=duree, taux_assurance=taux_assurance),))
+
+    @property
+    def duree_mois(self) -> int:
+        """Durée totale du prêt en mois (différés compris)."""
+        return max((t.differe + t.duree * 12 for t in self.tranches), default=0)
+
+    def penalite(self, montant_rembourse, taux):
+        """Indemnité de remboursement anticipé selon les plafonds du prêt."""
+        return penalite_remboursement(montant_rembourse, taux, self.penalite_taux_max, self.penalite_mois_interets)
+
+    def echeancier(self, nb_mois: int = None) -> Echeancier:
+        """Calcule le tableau d'amortissement sur nb_mois mois (durée du prêt par défaut).
+
+        Chaque tranche est découpée en segments entre le différé et les
+        remboursements anticipés ; le capital de chaque segment est calculé
+        d'un bloc en forme fermée.
+        """
+        nb_mois = self.duree_mois if nb_mois is None else nb_mois
+        nb_tranches = len(self.tranches)
+        capital = np.zeros((nb_tranches, nb_mois + 1))
+        anticipe = np.zeros((nb_tranches, nb_mois + 1))
+        penalites = np.zeros((nb_tranches, nb_mois + 1))
+
+        for t, tranche in enumerate(self.tranches):
+            montant = max(0.0, tranche.montant)
+            fin = tranche.differe + tranche.duree * 12
+            evenements = sorted((r for r in self.remboursements if r.tranche == t and 0 < r.mois <= nb_mois),
+                                key=lambda r: r.mois)
+            bornes = sorted({0, min(tranche.differe, nb_mois), nb_mois} | {r.mois for r in evenements})
+
+            capital[t, 0] = montant
+            mensualite = mensualite_constante(montant, tranche.taux, tranche.duree * 12) if tranche.differe == 0 else 0.0
+            for debut, suivant in zip(bornes, bornes[1:]):
+                if debut == tranche.differe and tranche.differe > 0:
+                    # Fin du différé : amortissement du capital augmenté des intérêts capitalisés
+                    mensualite = mensualite_constante(capital[t, debut], tranche.taux, tranche.duree * 12)
+                capital[t, debut:suivant + 1] = capital_restant_du(
+                    capital[t, debut], mensualite if debut >= tranche.differe else 0.0, tranche.taux, suivant - debut
+                )
+                for remboursement in (r for r in evenements if r.mois == suivant):
+                    montant_rembourse = min(remboursement.montant, capital[t, suivant])
+                    anticipe[t, suivant] += montant_rembourse
+                    penalites[t, suivant] += self.penalite(montant_rembourse, tranche.taux)
+                    capital[t, suivant] -= montant_rembourse
+                    if not remboursement.reduire_duree and suivant >= tranche.differe and fin > suivant:
+                        mensualite = mensualite_constante(capital[t, suivant], tranche.taux, fin - suivant)
+
+        # Résidus d'arrondi en fin de prêt
+        capital[capital < RESIDU_CAPITAL] = 0.0
+
+        taux_mensuel = np.array([t.taux for t in self.tranches], dtype=float)[:, None] / 12 / 100
+        interets = np.zeros_like(capital)
+        principal = np.zeros_like(capital)
+        interets[:, 1:] = capital[:, :-1] * taux_mensuel
+        principal[:, 1:] = capital[:, :-1] - capital[:, 1:] - anticipe[:, 1:]
+
+        # Assurance sur le capital emprunté, due tant que le prêt court
+        prime = np.array([max(0.0, t.montant) * t.taux_assurance / 100 / 12 for t in self.tranches])[:, None]
+        assurance = np.zeros_like(capital)
+        assurance[:, 1:] = np.where(capital[:, :-1] > 0, prime, 0.0)
+
+        return Echeancier(
+            interets=interets,
+            principal=principal,
+            assurance=assurance,
+            remboursements_anticipes=anticipe,
+            penalites=penalites,
+            capital_restant=capital,
+            noms=tuple(t.nom for t in self.tranches)
+        )
@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+import yaml
+import numpy as np
+from .simulation import simulate_series
+
+
+@dataclass
+class MonteCarloConfig:
+    nb_trajectoires: int = 10000
+    volatilite_investissement: float = 15.0  # écart-type annuel en pourcentage
+    volatilite_immobilier: float = 5.0
+    correlation: float = 0.2  # corrélation des rendements marché / immobilier
+    graine: Optional[int] = None
+    taille_lot: int = 5000  # trajectoires simulées par lot (borne la mémoire)
+    pas_mois: int = 12  # résolution des bandes de percentiles
+    percentiles: Sequence[int] = field(default_factory=lambda: (5, 50, 95))
+
+    @classmethod
+    def from_yaml(cls, yaml_path):
+        """Charge les paramètres stochastiques depuis un fichier YAML (section optionnelle)."""
+        with open(yaml_path, 'r') as f:
+            data = yaml.safe_load(f)['scenarios']['default'].get('monte_carlo') or {}
+        return cls(**data)
+
+
+@dataclass
+class MonteCarloResult:
+    mois: np.ndarray
+    bandes: Dict[str, np.ndarray]  # 'P5', 'P50', 'P95'... de patrimoine_total
+    patrimoine_initial: float
+    patrimoine_final: np.ndarray  # valeur finale de chaque trajectoire
+    probabilite_perte: float  # part des trajectoires finissant sous le patrimoine initial
+
+
+def simulate_monte_carlo(cout_total, montant_pret, mensualite, epargne, investissement,
+                         taux_credit, evolution_immobilier, rendement_epargne,
+                         rendement_investissement, nb_mois: int,
+                         parametres: MonteCarloConfig,
+                         capital_restant: Optional[np.ndarray] = None) -> MonteCarloResult:
+    """Simule des trajectoires aléatoires du patrimoine.
+
+    Les rendements mensuels du marché et de l'immobilier suivent une loi
+    log-normale corrélée dont l'espérance correspond aux taux fixes du
+    scénario ; le crédit et l'épargne sécurisée restent déterministes. Les
+    trajectoires sont tirées par lots de taille_lot pour borner la mémoire ;
+    les tirages étant consommés dans l'ordre, le résultat ne dépend pas de la
+    taille des lots pour une graine donnée.
+    """
+    if not -1 <= parametres.correlation <= 1:
+        raise ValueError("La corrélation doit être comprise entre -1 et 1")
+
+    base = simulate_series(cout_total, montant_pret, mensualite, epargne, investissement,
+                           taux_credit, evolution_immobilier, rendement_epargne,
+                           rendement_investissement, nb_mois, capital_restant=capital_restant)
+
+    # Mois conservés pour les bandes (le dernier mois est toujours inclus)
+    mois = np.unique(np.append(np.arange(0, nb_mois + 1, max(parametres.pas_mois, 1)), nb_mois))
+    deterministe = (base['epargne'] - base['capital_restant'])[mois].astype(np.float32)
+
+    # Rendements log-normaux mensuels : indice 0 immobilier, indice 1 marché
+    sigma = np.array([parametres.volatilite_immobilier, parametres.volatilite_investissement]) / 100 / np.sqrt(12)
+    taux = np.array([evolution_immobilier, rendement_investissement], dtype=float)
+    derive = np.log1p(taux / 12 / 100) - sigma ** 2 / 2
+    rho = parametres.correlation
+    # Coefficients de Cholesky pour corréler les tirages indépendants
+    poids_marche = np.array([rho, np.sqrt(1 - rho ** 2)], dtype=np.float32) * np.float32(sigma[1])
+    sigma = sigma.astype(np.float32)
+    derive = derive.astype(np.float32)
+    decales = mois[mois > 0] - 1
+
+    rng = np.random.default_rng(parametres.graine)
+    patrimoine = np.empty((parametres.nb_trajectoires, len(mois)), dtype=np.float32)
+    patrimoine[:, 0] = patrimoine_initial = float(base['patrimoine_total'][0])
+    for debut in range(0, parametres.nb_trajectoires, parametres.taille_lot):
+        n = min(parametres.taille_lot, parametres.nb_trajectoires - debut)
+        tirages = rng.standard_normal((n, 2, nb_mois), dtype=np.float32)
+
+        immobilier = tirages[:, 0] * sigma[0] + derive[0]
+        marche = tirages[:, 0] * poids_marche[0] + tirages[:, 1] * poids_marche[1] + derive[1]
+        # Croissance cumulée aux seuls mois conservés
+        immobilier = np.exp(np.cumsum(immobilier, axis=1)[:, decales])
+        marche = np.exp(np.cumsum(marche, axis=1)[:, decales])
+
+        patrimoine[debut:debut + n, 1:] = (immobilier * np.float32(cout_total)
+                                           + marche * np.float32(investissement)
+                                           + deterministe[1:])
+
+    valeurs = np.percentile(patrimoine, parametres.percentiles, axis=0)
+    patrimoine_final = patrimoine[:, -1].astype(float)
+
+    return MonteCarloResult(
+        mois=mois,
+        bandes={f"P{p}": v.astype(float) for p, v in zip(parametres.percentiles, valeurs)},
+        patrimoine_initial=patrimoine_initial,
+        patrimoine_final=patrimoine_final,
+        probabilite_perte=float(np.mean(patrimoine_final < patrimoine_initial))
+    )
@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+import numpy as np
+from .property import Property
+from .monte_carlo import MonteCarloConfig
+from .simulation import simulate_batch
+
+OBJECTIFS = ('patrimoine', 'ajuste')
+
+
+@dataclass
+class AllocationResult:
+    """Résultat d'une optimisation de la répartition de l'apport.
+
+    candidats contient, pour chaque allocation testée, les paramètres et les
+    indicateurs (tableaux de même longueur) ; frontiere les indices des
+    allocations efficaces (aucune autre n'offre plus de patrimoine pour un
+    risque inférieur ou égal), triées par risque croissant.
+    """
+    meilleure: Dict[str, float]
+    candidats: Dict[str, np.ndarray]
+    frontiere: np.ndarray
+    objectif: str
+
+    def allocation(self, indice: int) -> Dict[str, float]:
+        """Paramètres et indicateurs d'une allocation candidate."""
+        return {nom: float(valeurs[indice]) for nom, valeurs in self.candidats.items()}
+
+
+def ecart_type_final(investissement, valeur_bien, nb_mois: int, mc_config: MonteCarloConfig) -> np.ndarray:
+    """Écart-type du patrimoine final sous le modèle log-normal du Monte Carlo.
+
+    investissement et valeur_bien sont les valeurs finales espérées ; le
+    crédit et l'épargne sécurisée étant déterministes, seules ces deux
+    composantes contribuent à la dispersion.
+    """
+    annees = nb_mois / 12
+    s_inv = mc_config.volatilite_investissement / 100
+    s_immo = mc_config.volatilite_immobilier / 100
+    variance = (investissement ** 2 * np.expm1(s_inv ** 2 * annees)
+                + valeur_bien ** 2 * np.expm1(s_immo ** 2 * annees)
+                + 2 * investissement * valeur_bien * np.expm1(mc_config.correlation * s_inv * s_immo * annees))
+    return np.sqrt(np.maximum(variance, 0))
+
+
+def optimize_allocation(property: Property, config, negociation: float = 0,
+                        apports_immobilier=None, parts_securisees=None, durees=None,
+                        objectif: str = 'patrimoine', aversion_risque: float = 0.5,
+                        reserve_min: Optional[float] = None,
+                        mc_config: Optional[MonteCarloConfig] = None) -> AllocationResult:
+    """Cherche la répartition de l'apport qui maximise le patrimoine final.
+
+    Toutes les combinaisons (apport immobilier x part sécurisée du reste x
+    durée du crédit) sont simulées d'un bloc par simulate_batch. Les
+    allocations qui laissent moins de reserve_min en épargne sécurisée (par
+    défaut seuils_alertes.reserve_securite_min) ou un apport supérieur au coût
+    du bien sont écartées. L'objectif 'ajuste' pénalise le patrimoine espéré
+    de aversion_risque fois son écart-type.
+    """
+    if objectif not in OBJECTIFS:
+        raise ValueError(f"Objectif inconnu: {objectif} (attendu: {', '.join(OBJECTIFS)})")
+    mc_config = mc_config or MonteCarloConfig()
+    if reserve_min is None:
+        reserve_min = config.seuils_alertes.get('reserve_securite_min', 0)
+    if apports_immobilier is None:
+        apports_immobilier = np.linspace(0, config.apport_total, 21)
+    if parts_securisees is None:
+        parts_securisees = np.linspace(0, 100, 11)
+    if durees is None:
+        durees = config.duree_credit
+
+    resultat = simulate_batch([property], config, duree_credit=durees, apport_immobilier=apports_immobilier,
+                              negociation=negociation, part_securisee=parts_securisees)
+    parametres = resultat.parametres
+    final = resultat.series[:, -1, :]
+    composantes = {nom: final[:, i] for i, nom in enumerate(resultat.composantes)}
+
+    nb_mois = config.horizon_simulation * 12
+    risque = ecart_type_final(composantes['investissement'], composantes['valeur_bien'], nb_mois, mc_config)
+    patrimoine = composantes['patrimoine_total']
+    score = patrimoine if objectif == 'patrimoine' else patrimoine - aversion_risque * risque
+
+    admissible = ((parametres['epargne'] >= reserve_min - 1e-9)
+                  & (parametres['montant_pret'] >= 0)
+                  & (parametres['apport_immobilier'] >= 0))
+    if not admissible.any():
+        raise ValueError("Aucune répartition ne respecte les contraintes (réserve de sécurité, apport)")
+
+    candidats = {
+        'apport_immobilier': parametres['apport_immobilier'],
+        'part_securisee': parametres['part_securisee'],
+        'duree_credit': parametres['duree_credit'],
+        'epargne': parametres['epargne'],
+        'investissement': parametres['investissement'],
+        'montant_pret': parametres['montant_pret'],
+        'mensualite': parametres['mensualite'],
+        'patrimoine_final': patrimoine,
+        'ecart_type': risque,
+        'score': score,
+        'admissible': admissible
+    }
+
+    # Frontière efficace : parmi les allocations admissibles triées par risque
+    # croissant, celles qui battent le meilleur patrimoine déjà atteint
+    indices = np.flatnonzero(admissible)
+    indices = indices[np.lexsort((-patrimoine[indices], risque[indices]))]
+    record = np.maximum.accumulate(patrimoine[indices])
+    efficace = np.ones(len(indices), dtype=bool)
+    efficace[1:] = patrimoine[indices][1:] > record[:-1]
+
+    meilleur = int(np.flatnonzero(admissible)[np.argmax(score[admissible])])
+    return AllocationResult(
+        meilleure={nom: float(valeurs[meilleur]) for nom, valeurs in candidats.items()},
+        candidats=candidats,
+        frontiere=indices[efficace],
+        objectif=objectif
+    )
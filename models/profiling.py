@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from threading import Lock, local
+from typing import Callable, Dict, List, Optional
+import functools
+import json
+import time
+import tracemalloc
+
+
+class _Courant(local):
+    """Trace active du fil d'exécution courant (une session Streamlit par fil)."""
+    trace = None  # valeur par défaut de classe : pas d'exception à la lecture hors trace
+
+
+_courant = _Courant()
+
+# tracemalloc est global au processus : démarré par la première trace qui mesure la mémoire, arrêté par la dernière
+_verrou_memoire = Lock()
+_traces_memoire = 0
+_tracemalloc_demarre = False
+
+
+@dataclass
+class Mesure:
+    """Un appel instrumenté : temps inclusif, imbrication et allocations éventuelles."""
+    nom: str
+    debut_s: float  # depuis le début de la trace
+    duree_s: float
+    profondeur: int
+    memoire_pic_octets: Optional[int] = None  # pic au-dessus de la mémoire allouée à l'entrée
+    memoire_nette_octets: Optional[int] = None  # allouée et encore présente à la sortie
+
+
+@dataclass
+class Trace:
+    """Mesures d'une exécution, dans l'ordre de fin des appels."""
+    nom: str = "exécution"
+    memoire: bool = False
+    mesures: List[Mesure] = field(default_factory=list)
+    date: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+    duree_s: Optional[float] = None
+    _debut: float = field(default_factory=time.perf_counter, repr=False)
+    _pile: List[list] = field(default_factory=list, repr=False)
+
+    def _entrer(self, nom: str):
+        courant, pic = tracemalloc.get_traced_memory() if self.memoire else (0, 0)
+        if self.memoire:
+            # Le pic atteint jusqu'ici appartient à l'appel englobant
+            if self._pile:
+                self._pile[-1][3] = max(self._pile[-1][3], pic)
+            tracemalloc.reset_peak()
+        self._pile.append([nom, time.perf_counter(), courant, 0])
+
+    def _sortir(self):
+        nom, debut, courant_entree, pic_enfants = self._pile.pop()
+        fin = time.perf_counter()
+        pic = nette = None
+        if self.memoire:
+            courant, pic_absolu = tracemalloc.get_traced_memory()
+            pic_absolu = max(pic_absolu, pic_enfants)
+            pic, nette = pic_absolu - courant_entree, courant - courant_entree
+            if self._pile:
+                self._pile[-1][3] = max(self._pile[-1][3], pic_absolu)
+        self.mesures.append(Mesure(nom, debut - self._debut, fin - debut, len(self._pile), pic, nette))
+
+    def resume(self) -> List[Dict]:
+        """Appels, temps (inclusifs) et allocations par fonction, du plus long au plus court."""
+        par_nom: Dict[str, Dict] = {}
+        for m in self.mesures:
+            ligne = par_nom.setdefault(m.nom, {'nom': m.nom, 'appels': 0, 'temps_total_s': 0.0, 'temps_max_s': 0.0,
+                                               'memoire_pic_octets': None, 'memoire_nette_octets': None})
+            ligne['appels'] += 1
+            ligne['temps_total_s'] += m.duree_s
+            ligne['temps_max_s'] = max(ligne['temps_max_s'], m.duree_s)
+            if m.memoire_pic_octets is not None:
+                ligne['memoire_pic_octets'] = max(ligne['memoire_pic_octets'] or 0, m.memoire_pic_octets)
+                ligne['memoire_nette_octets'] = (ligne['memoire_nette_octets'] or 0) + m.memoire_nette_octets
+        for ligne in par_nom.values():
+            ligne['temps_moyen_s'] = ligne['temps_total_s'] / ligne['appels']
+        return sorted(par_nom.values(), key=lambda ligne: ligne['temps_total_s'], reverse=True)
+
+    def to_dict(self) -> Dict:
+        """Trace exportable (résumé et appels détaillés)."""
+        return {
+            'nom': self.nom,
+            'date': self.date,
+            'duree_s': self.duree_s,
+            'memoire': self.memoire,
+            'resume': self.resume(),
+            'mesures': [asdict(m) for m in self.mesures],
+        }
+
+    def to_json(self) -> str:
+        """Trace au format JSON, pour comparaison hors ligne entre deux exécutions."""
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+
+def trace_active() -> Optional[Trace]:
+    """Trace en cours sur ce fil d'exécution, s'il y en a une."""
+    return _courant.trace
+
+
+def activer(trace: Trace) -> Trace:
+    """Enregistre les appels instrumentés de ce fil d'exécution dans trace."""
+    global _traces_memoire, _tracemalloc_demarre
+    if trace_active() is not None:
+        raise RuntimeError("Une trace est déjà active sur ce fil d'exécution")
+    if trace.memoire:
+        with _verrou_memoire:
+            if _traces_memoire == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_demarre = True
+            _traces_memoire += 1
+    trace._debut = time.perf_counter()
+    _courant.trace = trace
+    return trace
+
+
+def desactiver() -> Optional[Trace]:
+    """Termine la trace active et la renvoie."""
+    global _traces_memoire, _tracemalloc_demarre
+    trace = trace_active()
+    if trace is None:
+        return None
+    _courant.trace = None
+    trace.duree_s = time.perf_counter() - trace._debut
+    if trace.memoire:
+        with _verrou_memoire:
+            _traces_memoire -= 1
+            if _traces_memoire == 0 and _tracemalloc_demarre:
+                tracemalloc.stop()
+                _tracemalloc_demarre = False
+    return trace
+
+
+class section:
+    """Contexte mesurant un bloc de code ; sans trace active, il ne fait que tester son absence."""
+    __slots__ = ('nom', '_trace')
+
+    def __init__(self, nom: str):
+        self.nom = nom
+
+    def __enter__(self):
+        self._trace = _courant.trace
+        if self._trace is not None:
+            self._trace._entrer(self.nom)
+        return self
+
+    def __exit__(self, *exc):
+        if self._trace is not None:
+            self._trace._sortir()
+        return False
+
+
+def instrumenter(nom: str = None) -> Callable:
+    """Décorateur mesurant chaque appel de la fonction (nom qualifié par défaut) quand une trace est active."""
+    def decorateur(fonction: Callable) -> Callable:
+        libelle = nom or fonction.__qualname__
+
+        @functools.wraps(fonction)
+        def mesuree(*args, **kwargs):
+            trace = _courant.trace
+            if trace is None:
+                return fonction(*args, **kwargs)
+            trace._entrer(libelle)
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                trace._sortir()
+        return mesuree
+    return decorateur
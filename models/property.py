@@ -1,7 +1,11 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, WrapValidator
+from dataclasses import dataclass, field
+from typing import Annotated, List, Dict, Optional
 import json
 import re
+import numpy as np
+from .loan import mensualite_constante
+from .profiling import instrumenter
 
 class Metro(BaseModel):
     ligne: str
@@ -9,6 +13,9 @@ class Metro(BaseModel):
     distance: int = Field(description="Distance en mètres")
 
 class Property(BaseModel):
+    # Étage ou DPE saisis comme nombres dans properties.json (« etage": 3 »)
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
     id: str
     adresse: str
     surface: float
@@ -27,14 +34,21 @@ class Property(BaseModel):
     dpe: str
     ges: Optional[str] = None
     metros: List[Metro] = []
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     atouts: List[str] = []
     vigilance: List[str] = []
     frais_agence_acquereur: bool
     lien_annonce: Optional[str] = None
 
     @staticmethod
-    def generate_id(adresse: str, existing_ids: List[str]) -> str:
-        """Génère un ID unique basé sur l'adresse."""
+    def ville_id(adresse: str, prefixes=()) -> str:
+        """Préfixe d'identifiant (ville ou arrondissement) déduit de l'adresse.
+
+        Le nom de ville s'arrête à la virgule, au cedex ou au pays qui suit ;
+        s'il prolonge un préfixe déjà utilisé (saint-ouen-sur-seine pour
+        saint-ouen), c'est ce préfixe qui est renvoyé.
+        """
         # Extraction du code postal
         cp_match = re.search(r'(?:75|93|94|92)\d{3}', adresse)
         if not cp_match:
@@ -44,32 +58,35 @@ class Property(BaseModel):
         
         # Détermination de la ville/arrondissement
         if cp.startswith('75'):
-            ville = f"paris{cp[3:5]}"  # paris18, paris19, etc.
+            return f"paris{cp[3:5]}"  # paris18, paris19, etc.
+        # Nom de la ville après le code postal ("93400 Saint-Ouen, France"), sinon avant ("Saint-Ouen, 93400")
+        ville_match = re.search(r'(?:75|93|94|92)\d{3}\s+([^\W\d_][^,\d]*)', adresse)
+        if ville_match:
+            nom = re.sub(r'\s+(?:cedex|france)\b.*$', '', ville_match.group(1).strip(), flags=re.IGNORECASE)
         else:
-            # Extraction du nom de la ville avant le code postal
-            ville_match = re.search(r'(?:[\w-]+)[,\s]+(?:75|93|94|92)\d{3}', adresse)
+            ville_match = re.search(r'([\w-]+)[,\s]+(?:75|93|94|92)\d{3}', adresse)
             if not ville_match:
                 raise ValueError("Impossible d'extraire le nom de la ville de l'adresse")
-            ville = ville_match.group().split(',')[0].strip().lower().replace(' ', '-')
-        
+            nom = ville_match.group(1)
+        ville = re.sub(r"[\s'-]+", '-', nom.lower()).strip('-')
+
+        # Rattachement au plus long préfixe déjà utilisé que le nom prolonge
+        connus = [p for p in prefixes if ville.startswith(f"{p}-")]
+        return max(connus, key=len) if connus else ville
+
+    @staticmethod
+    def generate_id(adresse: str, existing_ids: List[str]) -> str:
+        """Génère un ID unique basé sur l'adresse (pour plusieurs biens, voir IdAllocator)."""
+        ville = Property.ville_id(adresse, {id.rpartition('-')[0] for id in existing_ids})
         # Recherche du dernier numéro pour cette ville
-        ville_ids = [id for id in existing_ids if id.startswith(ville)]
-        if not ville_ids:
-            next_num = 1
-        else:
-            # Extraction des numéros existants
-            nums = [int(id.split('-')[-1]) for id in ville_ids]
-            next_num = max(nums) + 1
-        
-        # Création du nouvel ID
-        return f"{ville}-{next_num:03d}"
+        nums = [int(num) for prefixe, _, num in (id.rpartition('-') for id in existing_ids if id.startswith(ville))
+                if prefixe == ville and num.isdigit()]
+        return f"{ville}-{max(nums, default=0) + 1:03d}"
 
     def cout_mensuel(self, montant_pret: float, taux: float, duree_annees: int) -> float:
         """Calcule le coût mensuel total (crédit + charges)."""
         # Calcul de la mensualité du prêt
-        taux_mensuel = taux / 12 / 100
-        nombre_mois = duree_annees * 12
-        mensualite = montant_pret * (taux_mensuel * (1 + taux_mensuel)**nombre_mois) / ((1 + taux_mensuel)**nombre_mois - 1)
+        mensualite = float(mensualite_constante(montant_pret, taux, duree_annees * 12))
         
         # Ajout des charges
         cout_total = mensualite + self.charges_mensuelles
@@ -98,6 +115,102 @@ class Property(BaseModel):
         return round(sum(scores) / len(scores), 2)
 
     @staticmethod
+    def _champs_json(prop_id: str, prop_data: Dict) -> Dict:
+        """Correspondance entre une entrée de properties.json et les champs de Property.
+
+        Les clés sont renommées et les valeurs nulles de etage et
+        frais_agence_acquereur remplacées par leur défaut ; les autres
+        conversions (nombres, booléens, chaînes) sont faites par la
+        validation pydantic.
+        """
+        # Vérification des clés requises
+        for cle in ('bien', 'prix', 'charges'):
+            if cle not in prop_data:
+                raise ValueError(f"'{cle}' manquant pour {prop_id}")
+
+        bien = prop_data['bien']
+        prix = prop_data['prix']
+        charges = prop_data['charges']
+
+        localisation = prop_data.get('localisation') or {}
+        etage = bien.get('etage')
+
+        # Les champs optionnels absents prennent la valeur par défaut de Property
+        return {
+            'id': prop_id,
+            'adresse': prop_data.get('adresse', ''),
+            'surface': bien.get('surface', 0),
+            'etage': '0' if etage is None else etage,
+            'prix': prix.get('annonce', 0),
+            'prix_hors_honoraires': prix.get('hors_honoraires', 0),
+            'prix_m2': prix.get('m2', 0),
+            'charges_mensuelles': charges.get('mensuelles', 0),
+            'dpe': bien.get('dpe', 'NC'),
+            'frais_agence_acquereur': prix.get('frais_agence_acquereur') or False,
+            'exposition': bien.get('orientation'),
+            'type_chauffage': charges.get('chauffage'),
+            'taxe_fonciere': charges.get('taxe_fonciere'),
+            'energie': charges.get('energie'),
+            'ges': bien.get('ges'),
+            'metros': prop_data.get('metros', []),
+            'latitude': localisation.get('latitude'),
+            'longitude': localisation.get('longitude'),
+            'atouts': prop_data.get('atouts', []),
+            'vigilance': prop_data.get('vigilance', []),
+        }
+
+    @staticmethod
+    def from_json_data(prop_id: str, prop_data: Dict) -> 'Property':
+        """Construit un bien à partir de son entrée dans properties.json."""
+        return Property(**Property._champs_json(prop_id, prop_data))
+
+    @staticmethod
+    def validate_bulk(entries: Dict[str, Dict]) -> 'LoadReport':
+        """Valide d'un bloc des entrées au format properties.json.
+
+        La liste est validée en une passe par un TypeAdapter pydantic ; si
+        elle contient un bien invalide, elle est revalidée bien par bien pour
+        écarter les biens invalides, décrits dans le rapport au lieu d'être
+        affichés.
+        """
+        erreurs = []
+        ids, candidats = [], []
+        for prop_id, prop_data in entries.items():
+            try:
+                candidats.append(Property._champs_json(prop_id, prop_data))
+                ids.append(prop_id)
+            except Exception as e:
+                erreurs.append(LoadError(id=prop_id, champ=None, message=str(e)))
+
+        try:
+            resultats = _PROPERTIES_ADAPTER.validate_python(candidats)
+        except ValidationError:
+            resultats = _PROPERTIES_ADAPTER_SIGNALE.validate_python(candidats)
+
+        properties = {}
+        for prop_id, resultat in zip(ids, resultats):
+            if isinstance(resultat, ValidationError):
+                for detail in resultat.errors():
+                    champ = '.'.join(str(part) for part in detail['loc']) or None
+                    erreurs.append(LoadError(id=prop_id, champ=champ, message=detail['msg']))
+            else:
+                properties[prop_id] = resultat
+
+        return LoadReport(properties=properties, erreurs=erreurs)
+
+    @staticmethod
+    def load_properties_bulk(json_file: str) -> 'LoadReport':
+        """Charge tous les biens d'un fichier JSON en mode rapide (sans affichage)."""
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+        
+        if not isinstance(data, dict) or 'properties' not in data:
+            raise ValueError("Format JSON invalide: 'properties' manquant")
+        
+        return Property.validate_bulk(data['properties'])
+
+    @staticmethod
+    @instrumenter()
     def load_properties(json_file: str) -> Dict[str, 'Property']:
         """Charge tous les biens depuis un fichier JSON."""
         try:
@@ -110,60 +223,20 @@ class Property(BaseModel):
             properties = {}
             for prop_id, prop_data in data['properties'].items():
                 try:
-                    # Vérification des clés requises
-                    if 'bien' not in prop_data:
-                        print(f"Erreur: 'bien' manquant pour {prop_id}")
-                        continue
-                    if 'prix' not in prop_data:
-                        print(f"Erreur: 'prix' manquant pour {prop_id}")
-                        continue
-                    if 'charges' not in prop_data:
-                        print(f"Erreur: 'charges' manquant pour {prop_id}")
-                        continue
-
-                    bien = prop_data['bien']
-                    prix = prop_data['prix']
-                    charges = prop_data['charges']
-
-                    # Construction du dictionnaire avec vérifications
-                    property_dict = {
-                        'id': prop_id,
-                        'adresse': prop_data.get('adresse', ''),
-                        'surface': float(bien.get('surface', 0)),
-                        'etage': str(bien.get('etage', '0')),
-                        'prix': float(prix.get('annonce', 0)),
-                        'prix_hors_honoraires': float(prix.get('hors_honoraires', 0)),
-                        'prix_m2': float(prix.get('m2', 0)),
-                        'charges_mensuelles': float(charges.get('mensuelles', 0)),
-                        'dpe': bien.get('dpe', 'NC'),
-                        'frais_agence_acquereur': bool(prix.get('frais_agence_acquereur', False)),
-                        # Champs optionnels
-                        'nb_pieces': None,
-                        'exposition': bien.get('orientation'),
-                        'type_chauffage': charges.get('chauffage'),
-                        'travaux': None,
-                        'etat': None,
-                        'taxe_fonciere': float(charges.get('taxe_fonciere', 0)) if charges.get('taxe_fonciere') is not None else None,
-                        'energie': float(charges.get('energie', 0)) if charges.get('energie') is not None else None,
-                        'ges': bien.get('ges'),
-                        'metros': [Metro(**m) for m in prop_data.get('metros', [])],
-                        'atouts': prop_data.get('atouts', []),
-                        'vigilance': prop_data.get('vigilance', []),
-                        'lien_annonce': None
-                    }
+                    prop = Property.from_json_data(prop_id, prop_data)
 
                     # Debug: afficher les valeurs extraites
                     print(f"\nDébug {prop_id}:")
-                    print(f"surface: {property_dict['surface']}")
-                    print(f"etage: {property_dict['etage']}")
-                    print(f"prix: {property_dict['prix']}")
-                    print(f"prix_hors_honoraires: {property_dict['prix_hors_honoraires']}")
-                    print(f"prix_m2: {property_dict['prix_m2']}")
-                    print(f"charges_mensuelles: {property_dict['charges_mensuelles']}")
-                    print(f"dpe: {property_dict['dpe']}")
-                    print(f"frais_agence_acquereur: {property_dict['frais_agence_acquereur']}")
+                    print(f"surface: {prop.surface}")
+                    print(f"etage: {prop.etage}")
+                    print(f"prix: {prop.prix}")
+                    print(f"prix_hors_honoraires: {prop.prix_hors_honoraires}")
+                    print(f"prix_m2: {prop.prix_m2}")
+                    print(f"charges_mensuelles: {prop.charges_mensuelles}")
+                    print(f"dpe: {prop.dpe}")
+                    print(f"frais_agence_acquereur: {prop.frais_agence_acquereur}")
                     
-                    properties[prop_id] = Property(**property_dict)
+                    properties[prop_id] = prop
                     print(f"Bien {prop_id} chargé avec succès")
                 
                 except Exception as e:
@@ -174,4 +247,80 @@ class Property(BaseModel):
             
         except Exception as e:
             print(f"Erreur lors du chargement du fichier JSON: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+
+class IdAllocator:
+    """Attribution des identifiants ville-numéro.
+
+    Un index du dernier numéro attribué par ville est construit une fois à
+    partir des identifiants existants puis tenu à jour : chaque attribution
+    est en temps constant, au lieu de reparcourir tout le catalogue.
+    """
+
+    def __init__(self, existing_ids=()):
+        self.compteurs: Dict[str, int] = {}
+        for property_id in existing_ids:
+            self.register(property_id)
+
+    def register(self, property_id: str):
+        """Prend en compte un identifiant existant (ville-numéro)."""
+        self.register_in(self.compteurs, property_id)
+
+    @staticmethod
+    def register_in(compteurs: Dict[str, int], property_id: str):
+        """Met à jour un index ville -> dernier numéro avec un identifiant existant."""
+        ville, _, numero = property_id.rpartition('-')
+        if ville and numero.isdigit():
+            compteurs[ville] = max(compteurs.get(ville, 0), int(numero))
+
+    def allocate(self, adresse: str) -> str:
+        """Attribue le numéro suivant de la ville de l'adresse."""
+        ville = Property.ville_id(adresse, self.compteurs)
+        numero = self.compteurs.get(ville, 0) + 1
+        self.compteurs[ville] = numero
+        return f"{ville}-{numero:03d}"
+
+
+def _valider_ou_signaler(valeur, handler):
+    """Valide un bien ; en cas d'échec, renvoie l'erreur au lieu d'interrompre la liste."""
+    try:
+        return handler(valeur)
+    except ValidationError as e:
+        return e
+
+# Validation groupée : une seule passe pydantic pour toute la liste, puis, si elle échoue,
+# une passe qui renvoie l'erreur de chaque bien invalide au lieu d'interrompre la liste
+_PROPERTIES_ADAPTER = TypeAdapter(List[Property])
+_PROPERTIES_ADAPTER_SIGNALE = TypeAdapter(List[Annotated[Property, WrapValidator(_valider_ou_signaler)]])
+
+# Champs numériques exposés par la vue en colonnes
+NUMERIC_FIELDS = ('surface', 'prix', 'prix_hors_honoraires', 'prix_m2', 'charges_mensuelles',
+                  'taxe_fonciere', 'energie')
+
+class LoadError(BaseModel):
+    id: str
+    champ: Optional[str] = None
+    message: str
+
+@dataclass
+class LoadReport:
+    properties: Dict[str, Property] = field(default_factory=dict)
+    erreurs: List[LoadError] = field(default_factory=list)
+
+    def colonnes(self) -> Dict[str, np.ndarray]:
+        """Vue en colonnes des champs numériques (NaN pour les valeurs absentes)."""
+        biens = list(self.properties.values())
+        colonnes = {'id': np.array([p.id for p in biens], dtype=object)}
+        for nom in NUMERIC_FIELDS:
+            colonnes[nom] = np.array(
+                [getattr(p, nom) if getattr(p, nom) is not None else np.nan for p in biens], dtype=float
+            )
+        colonnes['dpe'] = np.array([p.dpe for p in biens], dtype=object)
+        colonnes['frais_agence_acquereur'] = np.array([p.frais_agence_acquereur for p in biens], dtype=bool)
+        return colonnes
+
+    def dataframe(self):
+        """Vue en colonnes sous forme de DataFrame pandas, indexée par identifiant."""
+        import pandas as pd
+        return pd.DataFrame(self.colonnes()).set_index('id')
@@ -0,0 +1,361 @@
+from typing import Dict, List, Optional
+import copy
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from pathlib import Path
+from threading import Lock, RLock
+from .property import Property, LoadReport, IdAllocator
+from .profiling import instrumenter
+
+
+def code_postal(adresse: str) -> Optional[str]:
+    """Extrait le code postal (5 chiffres) d'une adresse."""
+    match = re.search(r'\b\d{5}\b', adresse or '')
+    return match.group() if match else None
+
+
+def arrondissement(adresse: str) -> Optional[int]:
+    """Arrondissement parisien (1 à 20) d'une adresse, None hors de Paris."""
+    cp = code_postal(adresse)
+    return int(cp[3:]) if cp and cp.startswith('75') else None
+
+
+class JsonPropertyRepository:
+    """Stockage des biens dans properties.json, complété par un journal des modifications.
+
+    Chaque création, mise à jour ou suppression est ajoutée en fin de journal
+    (properties.json.journal, une ligne JSON par opération, synchronisée sur
+    disque) au lieu de réécrire tout le catalogue. Le journal est rejoué au
+    chargement ; au-delà de compaction_octets, il est intégré à un nouvel
+    instantané properties.json écrit dans un fichier temporaire puis renommé.
+    Rejouer un journal déjà intégré est sans effet, ce qui rend la compaction
+    sûre en cas d'interruption. Une dernière ligne incomplète (écriture
+    interrompue) est tronquée ; une ligne JSON qui n'est pas une opération
+    valide est ignorée et signalée dans operations_ignorees.
+
+    Le dernier numéro attribué par ville est conservé dans l'instantané
+    (clé id_counters) et tenu à jour au rejeu : comme pour le stockage
+    SQLite, un identifiant supprimé n'est pas réattribué.
+    """
+
+    def __init__(self, path: str, compaction_octets: int = 2**20):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compaction_octets = compaction_octets
+        self._lock = RLock()
+        self._etat = None  # (signature des fichiers, données rejouées)
+        self.operations_ignorees: List[str] = []  # lignes du journal ignorées au dernier rejeu
+
+    def signature(self) -> tuple:
+        """Signature (date, taille) de l'instantané et du journal, qui change à chaque écriture."""
+        signatures = []
+        for path in (self.path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                signatures.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signatures.append(None)
+        return tuple(signatures)
+
+    @staticmethod
+    def _valide(operation) -> bool:
+        """Vrai si une ligne du journal décrit une opération applicable."""
+        if not isinstance(operation, dict) or not isinstance(operation.get('id'), str):
+            return False
+        if operation.get('op') == 'upsert':
+            return isinstance(operation.get('data'), dict)
+        return operation.get('op') == 'delete'
+
+    @staticmethod
+    def _appliquer(data: Dict, operation: Dict):
+        if operation['op'] == 'upsert':
+            data['properties'][operation['id']] = operation['data']
+            IdAllocator.register_in(data['id_counters'], operation['id'])
+        elif operation['op'] == 'delete':
+            data['properties'].pop(operation['id'], None)
+
+    def _read(self) -> Dict:
+        """Instantané complété du journal, relu uniquement si l'un des fichiers a changé."""
+        with self._lock:
+            signature = self.signature()
+            if self._etat is not None and self._etat[0] == signature:
+                return self._etat[1]
+
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            compteurs = IdAllocator(data['properties']).compteurs
+            for ville, dernier in data.get('id_counters', {}).items():
+                compteurs[ville] = max(compteurs.get(ville, 0), dernier)
+            data['id_counters'] = compteurs
+            if signature[1] is not None:
+                with open(self.journal_path, 'rb') as f:
+                    contenu = f.read()
+                valide = 0
+                ignorees = []
+                for numero, ligne in enumerate(contenu.splitlines(keepends=True), 1):
+                    try:
+                        operation = json.loads(ligne)
+                    except ValueError:
+                        break  # dernière ligne incomplète (écriture interrompue)
+                    if self._valide(operation):
+                        self._appliquer(data, operation)
+                    else:
+                        ignorees.append(f"ligne {numero} : opération invalide ignorée")
+                    valide += len(ligne)
+                self.operations_ignorees = ignorees
+                if valide < len(contenu):
+                    with open(self.journal_path, 'r+b') as f:
+                        f.truncate(valide)
+                    signature = self.signature()
+            self._etat = (signature, data)
+            return data
+
+    def _append(self, operations: List[Dict]):
+        """Ajoute des opérations au journal (fsync), puis compacte si le journal est trop gros."""
+        with self._lock:
+            data = self._read()
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(op, ensure_ascii=False) + '\n' for op in operations))
+                f.flush()
+                os.fsync(f.fileno())
+            for operation in operations:
+                self._appliquer(data, operation)
+            self._etat = (self.signature(), data)
+            if os.path.getsize(self.journal_path) > self.compaction_octets:
+                self.compact()
+
+    def _write(self, data: Dict, path: Optional[str] = None):
+        """Écrit un instantané complet de façon atomique (fichier temporaire puis renommage)."""
+        path = path or self.path
+        fd, temporaire = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(temporaire, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+            os.replace(temporaire, path)
+        except BaseException:
+            if os.path.exists(temporaire):
+                os.unlink(temporaire)
+            raise
+
+    def compact(self):
+        """Intègre le journal dans un nouvel instantané properties.json puis le vide."""
+        with self._lock:
+            data = self._read()
+            self._write(data)
+            if os.path.exists(self.journal_path):
+                os.truncate(self.journal_path, 0)
+            self._etat = (self.signature(), data)
+
+    def get(self, property_id: str) -> Optional[Dict]:
+        """Renvoie une copie de l'entrée JSON d'un bien, ou None s'il n'existe pas."""
+        return copy.deepcopy(self._read()['properties'].get(property_id))
+
+    def ids(self) -> List[str]:
+        """Liste des identifiants des biens."""
+        return list(self._read()['properties'].keys())
+
+    def upsert(self, property_id: str, property_data: Dict):
+        """Crée ou remplace un bien."""
+        self._append([{'op': 'upsert', 'id': property_id, 'data': property_data}])
+
+    def upsert_many(self, properties: Dict[str, Dict]):
+        """Crée ou remplace plusieurs biens en un seul ajout au journal."""
+        self._append([{'op': 'upsert', 'id': prop_id, 'data': prop_data} for prop_id, prop_data in properties.items()])
+
+    def insert_many(self, entries: List[Dict]) -> List[str]:
+        """Ajoute de nouveaux biens en un seul ajout au journal ; renvoie les identifiants attribués."""
+        with self._lock:
+            allocateur = IdAllocator()
+            allocateur.compteurs = dict(self._read()['id_counters'])
+            properties = {allocateur.allocate(property_data['adresse']): property_data for property_data in entries}
+            self.upsert_many(properties)
+        return list(properties)
+
+    def delete(self, property_id: str) -> bool:
+        """Supprime un bien ; renvoie False s'il n'existe pas."""
+        with self._lock:
+            if property_id not in self._read()['properties']:
+                return False
+            self._append([{'op': 'delete', 'id': property_id}])
+        return True
+
+    def entries(self) -> Dict[str, Dict]:
+        """Copie de toutes les entrées au format properties.json."""
+        return copy.deepcopy(self._read()['properties'])
+
+    def load_report(self) -> LoadReport:
+        """Charge tous les biens en mode rapide, avec le rapport des biens invalides."""
+        return Property.validate_bulk(self._read()['properties'])
+
+    @instrumenter()
+    def load_properties(self) -> Dict[str, Property]:
+        """Charge tous les biens sous forme d'objets Property."""
+        return self.load_report().properties
+
+    def export_json(self, json_file: str):
+        """Exporte le catalogue (journal compris) au format properties.json."""
+        self._write({'properties': self._read()['properties']}, json_file)
+
+
+class SQLitePropertyRepository:
+    """Stockage des biens dans une base SQLite embarquée.
+
+    Les champs de filtrage (code postal, arrondissement, prix, prix/m²,
+    surface, DPE, charges) sont des colonnes indexées ; l'entrée complète au
+    format properties.json (métros, atouts...) est conservée dans une colonne
+    JSON. Lecture, mise à jour et suppression par identifiant passent par la
+    clé primaire, sans réécrire le reste du catalogue.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS properties (
+            id TEXT PRIMARY KEY,
+            code_postal TEXT,
+            arrondissement INTEGER,
+            prix REAL,
+            prix_m2 REAL,
+            surface REAL,
+            dpe TEXT,
+            charges_mensuelles REAL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_properties_code_postal ON properties(code_postal);
+        CREATE INDEX IF NOT EXISTS idx_properties_arrondissement ON properties(arrondissement);
+        CREATE INDEX IF NOT EXISTS idx_properties_prix ON properties(prix);
+        CREATE INDEX IF NOT EXISTS idx_properties_prix_m2 ON properties(prix_m2);
+        CREATE INDEX IF NOT EXISTS idx_properties_surface ON properties(surface);
+        CREATE INDEX IF NOT EXISTS idx_properties_dpe ON properties(dpe);
+        CREATE TABLE IF NOT EXISTS id_counters (
+            ville TEXT PRIMARY KEY,
+            dernier INTEGER NOT NULL
+        );
+    """
+
+    # Dernier numéro attribué par ville ; jamais décrémenté, un identifiant supprimé n'est pas réattribué
+    UPDATE_COUNTER = """
+        INSERT INTO id_counters VALUES (?, ?)
+        ON CONFLICT(ville) DO UPDATE SET dernier = MAX(dernier, excluded.dernier)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+        # Connexion partagée entre les threads de Streamlit, protégée par le verrou
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(self.SCHEMA)
+            if self._conn.execute("SELECT COUNT(*) FROM id_counters").fetchone()[0] == 0:
+                # Base existante sans index des compteurs : reconstruction depuis les identifiants
+                ids = [row[0] for row in self._conn.execute("SELECT id FROM properties")]
+                self._conn.executemany(self.UPDATE_COUNTER, IdAllocator(ids).compteurs.items())
+
+    @staticmethod
+    def _row(property_id: str, property_data: Dict) -> tuple:
+        """Colonnes indexées extraites d'une entrée au format properties.json."""
+        bien = property_data.get('bien') or {}
+        prix = property_data.get('prix') or {}
+        charges = property_data.get('charges') or {}
+        return (
+            property_id,
+            code_postal(property_data.get('adresse', '')),
+            arrondissement(property_data.get('adresse', '')),
+            prix.get('annonce'),
+            prix.get('m2'),
+            bien.get('surface'),
+            bien.get('dpe'),
+            charges.get('mensuelles'),
+            json.dumps(property_data, ensure_ascii=False)
+        )
+
+    def signature(self) -> tuple:
+        """Signature (date, taille) de la base, qui change à chaque écriture."""
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, property_id: str) -> Optional[Dict]:
+        """Renvoie l'entrée JSON d'un bien, ou None s'il n'existe pas."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM properties WHERE id = ?", (property_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def ids(self) -> List[str]:
+        """Liste des identifiants des biens."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM properties ORDER BY id")]
+
+    def upsert(self, property_id: str, property_data: Dict):
+        """Crée ou remplace un bien."""
+        self.upsert_many({property_id: property_data})
+
+    def upsert_many(self, properties: Dict[str, Dict]):
+        """Crée ou remplace plusieurs biens dans une seule transaction."""
+        with self._lock, self._conn:
+            self._write_rows(properties)
+
+    def _write_rows(self, properties: Dict[str, Dict]):
+        """Écrit les biens et tient à jour les compteurs d'identifiants (dans la transaction courante)."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO properties VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [self._row(prop_id, prop_data) for prop_id, prop_data in properties.items()]
+        )
+        self._conn.executemany(self.UPDATE_COUNTER, IdAllocator(properties).compteurs.items())
+
+    def insert_many(self, entries: List[Dict]) -> List[str]:
+        """Ajoute de nouveaux biens dans une seule transaction ; renvoie les identifiants attribués."""
+        with self._lock, self._conn:
+            allocateur = IdAllocator()
+            allocateur.compteurs = dict(self._conn.execute("SELECT ville, dernier FROM id_counters"))
+            properties = {allocateur.allocate(property_data['adresse']): property_data for property_data in entries}
+            self._write_rows(properties)
+        return list(properties)
+
+    def delete(self, property_id: str) -> bool:
+        """Supprime un bien ; renvoie False s'il n'existe pas."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM properties WHERE id = ?", (property_id,))
+        return cursor.rowcount > 0
+
+    def entries(self) -> Dict[str, Dict]:
+        """Toutes les entrées au format properties.json."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, data FROM properties ORDER BY id").fetchall()
+        return {prop_id: json.loads(data) for prop_id, data in rows}
+
+    def load_report(self) -> LoadReport:
+        """Charge tous les biens en mode rapide, avec le rapport des biens invalides."""
+        return Property.validate_bulk(self.entries())
+
+    @instrumenter()
+    def load_properties(self) -> Dict[str, Property]:
+        """Charge tous les biens sous forme d'objets Property."""
+        return self.load_report().properties
+
+    def import_json(self, json_file: str) -> int:
+        """Importe (ou remplace) les biens d'un fichier properties.json ; renvoie leur nombre."""
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or 'properties' not in data:
+            raise ValueError("Format JSON invalide: 'properties' manquant")
+        self.upsert_many(data['properties'])
+        return len(data['properties'])
+
+    def export_json(self, json_file: str):
+        """Exporte le catalogue au format properties.json."""
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump({'properties': self.entries()}, f, ensure_ascii=False, indent=2)
+
+    def close(self):
+        self._conn.close()
+
+
+def open_repository(path: str):
+    """Ouvre le stockage des biens selon l'extension du fichier (.json ou .db/.sqlite)."""
+    if Path(path).suffix in ('.db', '.sqlite', '.sqlite3'):
+        return SQLitePropertyRepository(path)
+    return JsonPropertyRepository(path)
@@ -1,8 +1,18 @@
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Tuple
+import copy
+import os
 import yaml
 import numpy as np
 from .property import Property
+from .simulation import simulate_series, simulate_charges, epargne_plafonnee
+from .monte_carlo import MonteCarloConfig, MonteCarloResult, simulate_monte_carlo
+from .cache import LRUCache
+from .loan import Pret, Echeancier
+from .profiling import instrumenter
+
+# Résultats de simulation partagés entre calculate_metrics, le graphique et les résultats
+CACHE_SIMULATIONS = LRUCache(maxsize=256)
 
 @dataclass
 class ScenarioConfig:
@@ -19,13 +29,21 @@ class ScenarioConfig:
     horizon_simulation: int
     inflation: float
     evolution_charges: Dict[str, float]
+    seuils_alertes: Dict[str, float] = field(default_factory=dict)
 
     @classmethod
-    def from_yaml(cls, yaml_path):
-        """Charge la configuration depuis un fichier YAML."""
-        with open(yaml_path, 'r') as f:
-            data = yaml.safe_load(f)['scenarios']['default']
-        
+    def from_yaml(cls, yaml_path, nom: str = 'default'):
+        """Charge la configuration d'un scénario depuis un fichier YAML (héritage de 'default')."""
+        scenarios = load_scenarios(yaml_path)
+        if nom not in scenarios:
+            raise KeyError(f"Scénario inconnu: {nom}")
+        return scenarios[nom]
+
+    @classmethod
+    def from_dict(cls, data: Dict, nom: str = 'default'):
+        """Construit la configuration à partir de la section YAML d'un scénario (validée)."""
+        _valider_scenario(data, nom)
+
         # Calcul du pourcentage d'apport immobilier
         apport_total = data['apport']['total']
         apport_immo = data['apport']['immobilier']
@@ -49,120 +67,175 @@ class ScenarioConfig:
             evolution_immobilier=data['rendements']['evolution_immobilier'],
             horizon_simulation=data['parametres_simulation']['horizon'],
             inflation=data['parametres_simulation']['inflation'],
-            evolution_charges=data['charges_evolution']
+            evolution_charges=data['charges_evolution'],
+            seuils_alertes=data.get('seuils_alertes', {})
+        )
+
+    def cle(self) -> Tuple:
+        """Représentation figée et hashable de la configuration."""
+        return tuple(
+            (f.name, tuple(sorted(getattr(self, f.name).items())) if isinstance(getattr(self, f.name), dict)
+             else getattr(self, f.name))
+            for f in fields(self)
         )
 
+# Champs numériques obligatoires de chaque scénario (après héritage de 'default')
+CHAMPS_SCENARIO = (
+    ('apport', 'total'), ('apport', 'immobilier'),
+    ('credit', 'taux'), ('credit', 'duree'), ('credit', 'assurance'),
+    ('rendements', 'epargne_precaution'), ('rendements', 'investissement_risque'),
+    ('rendements', 'evolution_immobilier'),
+    ('parametres_simulation', 'horizon'), ('parametres_simulation', 'inflation'),
+)
+
+# Scénarios déjà lus, par version du fichier (clé : chemin, date, taille)
+_SCENARIOS = LRUCache(maxsize=8)
+
+def _valider_scenario(data: Dict, nom: str):
+    """Vérifie la présence et le type des champs obligatoires d'un scénario."""
+    for chemin in CHAMPS_SCENARIO:
+        valeur = data
+        for cle in chemin:
+            if not isinstance(valeur, dict) or cle not in valeur:
+                raise ValueError(f"Scénario '{nom}' : champ '{'.'.join(chemin)}' manquant")
+            valeur = valeur[cle]
+        if isinstance(valeur, bool) or not isinstance(valeur, (int, float)):
+            raise ValueError(f"Scénario '{nom}' : '{'.'.join(chemin)}' doit être un nombre (reçu {valeur!r})")
+    if not isinstance(data.get('charges_evolution'), dict):
+        raise ValueError(f"Scénario '{nom}' : section 'charges_evolution' manquante")
+
+def _fusionner(base: Dict, surcharge: Dict) -> Dict:
+    """Fusion récursive : les clés de surcharge remplacent celles de base."""
+    resultat = dict(base)
+    for cle, valeur in (surcharge or {}).items():
+        if isinstance(valeur, dict) and isinstance(resultat.get(cle), dict):
+            resultat[cle] = _fusionner(resultat[cle], valeur)
+        else:
+            resultat[cle] = valeur
+    return resultat
+
+def _lire_scenarios(yaml_path) -> Dict[str, ScenarioConfig]:
+    with open(yaml_path, 'r') as f:
+        sections = yaml.safe_load(f)['scenarios']
+    if 'default' not in sections:
+        raise ValueError("Le scénario 'default' est obligatoire")
+    # Chaque scénario nommé ne précise que les clés qui diffèrent de 'default'
+    return {nom: ScenarioConfig.from_dict(_fusionner(sections['default'], section) if nom != 'default' else section, nom)
+            for nom, section in sections.items()}
+
+def load_scenarios(yaml_path) -> Dict[str, ScenarioConfig]:
+    """Charge tous les scénarios nommés d'un fichier YAML, hérités de 'default'.
+
+    Le fichier n'est lu et validé qu'une fois par version ; chaque appel
+    renvoie des copies modifiables.
+    """
+    stat = os.stat(yaml_path)
+    scenarios = _SCENARIOS.get_or_compute((str(yaml_path), stat.st_mtime_ns, stat.st_size),
+                                          lambda: _lire_scenarios(yaml_path))
+    return copy.deepcopy(scenarios)
+
 class Scenario:
     LIVRET_A_PLAFOND = 23000
     LDD_PLAFOND = 12000
     
-    def __init__(self, property: Property, config: ScenarioConfig, cout_total: float = None):
+    def __init__(self, property: Property, config: ScenarioConfig, cout_total: float = None, pret: Pret = None):
         self.property = property
         self.config = config
         self.cout_total = cout_total if cout_total is not None else property.prix
+        self._pret = pret
         
-    def calculate_monthly_payment(self) -> float:
-        """Calcule la mensualité totale (crédit + assurance)."""
+    @property
+    def pret(self) -> Pret:
+        """Prêt du scénario : celui fourni, ou un prêt simple selon la configuration."""
+        if self._pret is not None:
+            return self._pret
         apport_immo = self.config.apport_total * (self.config.repartition_immobilier / 100)
         montant_pret = self.cout_total - apport_immo
-        
-        # Mensualité crédit
-        taux_mensuel = self.config.taux_credit / 12 / 100
-        nombre_mois = self.config.duree_credit * 12
-        mensualite = montant_pret * (taux_mensuel * (1 + taux_mensuel)**nombre_mois) / ((1 + taux_mensuel)**nombre_mois - 1)
-        
-        # Ajout assurance
-        mensualite_assurance = (montant_pret * self.config.taux_assurance / 100) / 12
-        
-        return round(mensualite + mensualite_assurance, 2)
+        return Pret.simple(montant_pret, self.config.taux_credit, self.config.duree_credit, self.config.taux_assurance)
+
+    def echeancier(self, nb_mois: int = None) -> Echeancier:
+        """Tableau d'amortissement du prêt (sur l'horizon de simulation par défaut)."""
+        return self.pret.echeancier(self.config.horizon_simulation * 12 if nb_mois is None else nb_mois)
+
+    def calculate_monthly_payment(self) -> float:
+        """Calcule la mensualité totale (crédit + assurance)."""
+        # Première échéance du tableau d'amortissement
+        return round(float(self.echeancier(1).mensualite_totale[1]), 2)
 
     def simulate_epargne_securisee(self, montant_initial, mois):
         """Simule l'évolution de l'épargne sécurisée en tenant compte des plafonds"""
-        # Répartition initiale
-        livret_a = min(montant_initial, self.LIVRET_A_PLAFOND)
-        reste_apres_livret_a = montant_initial - livret_a
-        
-        ldd = min(reste_apres_livret_a, self.LDD_PLAFOND)
-        reste_apres_ldd = reste_apres_livret_a - ldd
-        
-        # Le reste va sur un compte à terme ou livret bancaire avec une performance moindre
-        compte_terme = reste_apres_ldd
-        
-        evolution = np.zeros(mois)
-        for m in range(mois):
-            if m == 0:
-                evolution[m] = montant_initial
-            else:
-                # Livret A et LDD à taux plein
-                livret_a *= (1 + self.config.rendement_epargne/12/100)
-                livret_a = min(livret_a, self.LIVRET_A_PLAFOND)
-                
-                ldd *= (1 + self.config.rendement_epargne/12/100)
-                ldd = min(ldd, self.LDD_PLAFOND)
-                
-                # Compte à terme avec rendement réduit (environ 2% de moins)
-                if compte_terme > 0:
-                    compte_terme *= (1 + (self.config.rendement_epargne-2)/12/100)
-                
-                evolution[m] = livret_a + ldd + compte_terme
-        
-        return evolution
+        evolution = epargne_plafonnee(montant_initial, self.config.rendement_epargne, max(mois - 1, 0),
+                                      self.LIVRET_A_PLAFOND, self.LDD_PLAFOND)
+        return evolution[:mois]
 
-    def simulate_patrimoine(self) -> Dict[str, List[float]]:
-        """Simule l'évolution du patrimoine sur l'horizon défini."""
-        nb_mois = self.config.horizon_simulation * 12
-        
+    def _parametres_simulation(self) -> Dict:
+        """Rassemble les paramètres du moteur de simulation."""
         # Initialisation des composantes du patrimoine
-        apport_immo = self.config.apport_total * (self.config.repartition_immobilier / 100)
         epargne = self.config.apport_total * (self.config.repartition_epargne / 100)
         investissement = self.config.apport_total * (self.config.repartition_investissement / 100)
         
-        # Calcul du prêt
-        montant_pret = self.cout_total - apport_immo
-        # On ne prend que la mensualité du prêt, pas les autres charges
-        mensualite = self.calculate_monthly_payment()
-        
-        # Arrays pour stocker l'évolution
-        valeur_bien = np.zeros(nb_mois + 1)
-        capital_restant = np.zeros(nb_mois + 1)
-        epargne_evolution = np.zeros(nb_mois + 1)
-        investissement_evolution = np.zeros(nb_mois + 1)
-        patrimoine_total = np.zeros(nb_mois + 1)
-        
-        # Valeurs initiales
-        valeur_bien[0] = self.cout_total
-        capital_restant[0] = montant_pret
-        epargne_evolution[0] = epargne
-        investissement_evolution[0] = investissement
-        patrimoine_total[0] = valeur_bien[0] - capital_restant[0] + epargne + investissement
-        
-        # Simulation mois par mois
-        for mois in range(1, nb_mois + 1):
-            # Évolution du bien
-            valeur_bien[mois] = valeur_bien[mois-1] * (1 + self.config.evolution_immobilier/12/100)
-            
-            # Évolution du prêt (uniquement le remboursement, pas les charges)
-            taux_mensuel = self.config.taux_credit / 12 / 100
-            interet = capital_restant[mois-1] * taux_mensuel
-            capital_amorti = mensualite - interet
-            capital_restant[mois] = max(0, capital_restant[mois-1] - capital_amorti)
-            
-            # Évolution épargne et investissements
-            epargne_evolution[mois] = self.simulate_epargne_securisee(epargne, mois)[mois-1]
-            investissement_evolution[mois] = investissement_evolution[mois-1] * (1 + self.config.rendement_investissement/12/100)
-            
-            # Patrimoine total (valeur bien - capital restant + épargne + investissements)
-            patrimoine_total[mois] = (valeur_bien[mois] - capital_restant[mois] + 
-                                    epargne_evolution[mois] + investissement_evolution[mois])
+        # Calcul du prêt : le capital restant dû provient du tableau d'amortissement
+        nb_mois = self.config.horizon_simulation * 12
+        echeancier = self.echeancier(nb_mois)
         
         return {
-            'valeur_bien': valeur_bien.tolist(),
-            'capital_restant': capital_restant.tolist(),
-            'epargne': epargne_evolution.tolist(),
-            'investissement': investissement_evolution.tolist(),
-            'patrimoine_total': patrimoine_total.tolist()
+            'cout_total': self.cout_total,
+            'montant_pret': float(echeancier.total('capital_restant')[0]),
+            'mensualite': float(echeancier.mensualite[1]) if nb_mois > 0 else 0.0,
+            'capital_restant': echeancier.total('capital_restant'),
+            'epargne': epargne,
+            'investissement': investissement,
+            'taux_credit': self.config.taux_credit,
+            'evolution_immobilier': self.config.evolution_immobilier,
+            'rendement_epargne': self.config.rendement_epargne,
+            'rendement_investissement': self.config.rendement_investissement,
+            'nb_mois': nb_mois
         }
 
+    def cle(self) -> Tuple:
+        """Clé de cache : configuration, caractéristiques du bien, coût total et prêt."""
+        return (self.config.cle(), self.property.model_dump_json(), self.cout_total, self._pret)
+
+    @instrumenter()
+    def simulate_patrimoine(self) -> Dict[str, List[float]]:
+        """Simule l'évolution du patrimoine sur l'horizon défini."""
+        def simuler():
+            # Calcul vectorisé de toutes les séries en une passe
+            series = simulate_series(
+                **self._parametres_simulation(),
+                livret_a_plafond=self.LIVRET_A_PLAFOND,
+                ldd_plafond=self.LDD_PLAFOND,
+                inflation=self.config.inflation
+            )
+            return {nom: tuple(serie.tolist()) for nom, serie in series.items()}
+        
+        # Les séries sont stockées immuables et copiées pour l'appelant
+        series = CACHE_SIMULATIONS.get_or_compute(self.cle(), simuler)
+        return {nom: list(serie) for nom, serie in series.items()}
+
+    def simulate_charges(self) -> Dict[str, List[float]]:
+        """Flux mensuels de charges (copropriété, taxe foncière, énergie, assurance) sur l'horizon."""
+        def simuler():
+            nb_mois = self.config.horizon_simulation * 12
+            flux = simulate_charges(
+                charges_mensuelles=self.property.charges_mensuelles,
+                taxe_fonciere=self.property.taxe_fonciere or 0,
+                energie=self.property.energie or 0,
+                assurance=self.echeancier(nb_mois).total('assurance'),
+                evolution_charges=self.config.evolution_charges,
+                nb_mois=nb_mois
+            )
+            return {nom: tuple(serie.tolist()) for nom, serie in flux.items()}
+
+        flux = CACHE_SIMULATIONS.get_or_compute(('charges',) + self.cle(), simuler)
+        return {nom: list(serie) for nom, serie in flux.items()}
+
+    def simulate_monte_carlo(self, parametres: MonteCarloConfig = None) -> MonteCarloResult:
+        """Simule des trajectoires aléatoires du marché et de l'immobilier."""
+        return simulate_monte_carlo(**self._parametres_simulation(),
+                                    parametres=parametres or MonteCarloConfig())
+
+    @instrumenter()
     def calculate_metrics(self) -> Dict:
         """Calcule les métriques clés du scénario."""
         mensualite = self.calculate_monthly_payment()
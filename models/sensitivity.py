@@ -0,0 +1,152 @@
+import copy
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from .property import Property
+from .simulation import scenario_matrix
+
+# Paramètres perturbés : champs numériques de ScenarioConfig et négociation
+PARAMETRES_SENSIBILITE = (
+    'apport_total', 'repartition_immobilier', 'repartition_epargne', 'repartition_investissement',
+    'taux_credit', 'duree_credit', 'taux_assurance', 'rendement_epargne', 'rendement_investissement',
+    'evolution_immobilier', 'horizon_simulation', 'inflation', 'negociation'
+)
+# Paramètres exprimés en années entières
+PARAMETRES_ENTIERS = ('duree_credit', 'horizon_simulation')
+# Paramètres pouvant devenir négatifs (les autres sont bornés à 0)
+PARAMETRES_SIGNES = ('evolution_immobilier', 'rendement_investissement', 'inflation')
+# Répartitions hors immobilier : l'une varie au détriment de l'autre
+REPARTITIONS_ECHANGEES = {'repartition_epargne': 'repartition_investissement',
+                          'repartition_investissement': 'repartition_epargne'}
+PAS_ABSOLU = 1.0  # perturbation (en points) d'un paramètre nul
+METRIQUES_SENSIBILITE = ('patrimoine_final', 'patrimoine_reel')
+
+
+@dataclass
+class SensitivityResult:
+    """Sensibilité d'une métrique finale à chaque paramètre, perturbé de ±delta.
+
+    Les tableaux sont alignés sur parametres. elasticites donne la variation
+    relative de la métrique pour une variation relative de 1 du paramètre
+    (différence centrée) ; elle vaut NaN pour un paramètre de valeur nulle.
+    """
+    parametres: Tuple[str, ...]
+    valeur: np.ndarray
+    bas: np.ndarray
+    haut: np.ndarray
+    resultat_bas: np.ndarray
+    resultat_haut: np.ndarray
+    reference: float
+    elasticites: np.ndarray
+    metrique: str
+
+    @property
+    def impact(self) -> np.ndarray:
+        """Écart absolu de la métrique entre les deux perturbations."""
+        return np.abs(self.resultat_haut - self.resultat_bas)
+
+    def dataframe(self):
+        """Tableau des sensibilités, du paramètre le plus influent au moins influent."""
+        import pandas as pd
+        return pd.DataFrame({
+            'parametre': self.parametres,
+            'valeur': self.valeur,
+            'bas': self.bas,
+            'haut': self.haut,
+            'resultat_bas': self.resultat_bas,
+            'resultat_haut': self.resultat_haut,
+            'impact': self.impact,
+            'elasticite': self.elasticites
+        }).sort_values('impact', ascending=False, ignore_index=True)
+
+
+def _bornes(parametre: str, valeur: float, delta: float, config) -> Tuple[float, float]:
+    """Valeurs basse et haute d'un paramètre perturbé de ±delta %."""
+    pas = abs(valeur) * delta / 100 if valeur != 0 else PAS_ABSOLU
+    if parametre in PARAMETRES_ENTIERS:
+        pas = max(1, round(pas))
+    bas, haut = valeur - pas, valeur + pas
+    if parametre not in PARAMETRES_SIGNES:
+        bas = max(bas, 0)
+    if parametre == 'horizon_simulation':
+        bas = max(bas, 1)
+    # Les répartitions restent comprises entre 0 et 100 % et de somme 100 %
+    if parametre == 'repartition_immobilier':
+        haut = min(haut, 100)
+    elif parametre in REPARTITIONS_ECHANGEES:
+        haut = min(haut, valeur + getattr(config, REPARTITIONS_ECHANGEES[parametre]))
+    return bas, haut
+
+
+def _perturber(config, parametre: str, valeur: float):
+    """Copie de config dont un paramètre prend la valeur donnée, répartitions rééquilibrées."""
+    variante = copy.copy(config)
+    if parametre == 'repartition_immobilier':
+        # Le reste de l'apport garde ses proportions épargne / investissement
+        reste = config.repartition_epargne + config.repartition_investissement
+        part_epargne = config.repartition_epargne / reste if reste > 0 else 0.5
+        variante.repartition_epargne = (100 - valeur) * part_epargne
+        variante.repartition_investissement = (100 - valeur) * (1 - part_epargne)
+    elif parametre in REPARTITIONS_ECHANGEES:
+        # L'écart est pris sur (ou rendu à) l'autre poste hors immobilier
+        autre = REPARTITIONS_ECHANGEES[parametre]
+        setattr(variante, autre, getattr(config, autre) - (valeur - getattr(config, parametre)))
+    setattr(variante, parametre, int(valeur) if parametre in PARAMETRES_ENTIERS else valeur)
+    return variante
+
+
+def sensitivity_analysis(property: Property, config, negociation: float = 0, delta: float = 10.0,
+                         parametres: Optional[Sequence[str]] = None,
+                         metrique: str = 'patrimoine_final') -> SensitivityResult:
+    """Mesure l'effet de chaque hypothèse sur le patrimoine final du bien.
+
+    Chaque paramètre est perturbé de ±delta % (d'un point s'il est nul, d'au
+    moins un an pour les durées) toutes choses égales par ailleurs, les
+    répartitions de l'apport restant de somme 100 %. Les 2 x k scénarios et
+    la référence sont évalués d'un bloc par scenario_matrix (prêt simple,
+    sans PTZ).
+    """
+    parametres = tuple(parametres or PARAMETRES_SENSIBILITE)
+    inconnus = set(parametres) - set(PARAMETRES_SENSIBILITE)
+    if inconnus:
+        raise ValueError(f"Paramètres inconnus: {', '.join(sorted(inconnus))}")
+    if metrique not in METRIQUES_SENSIBILITE:
+        raise ValueError(f"Métrique inconnue: {metrique} (attendu: {', '.join(METRIQUES_SENSIBILITE)})")
+
+    valeurs = np.array([negociation if p == 'negociation' else getattr(config, p) for p in parametres], dtype=float)
+    bornes = np.array([_bornes(p, v, delta, config) for p, v in zip(parametres, valeurs)]).reshape(-1, 2)
+
+    # Scénario 0 : référence ; puis, pour chaque paramètre, la perturbation basse et haute
+    scenarios = {'reference': config}
+    negociations = [negociation]
+    for parametre, (bas, haut) in zip(parametres, bornes):
+        for sens, valeur in (('bas', bas), ('haut', haut)):
+            if parametre == 'negociation':
+                scenarios[f"{parametre}_{sens}"] = config
+                negociations.append(valeur)
+            else:
+                scenarios[f"{parametre}_{sens}"] = _perturber(config, parametre, valeur)
+                negociations.append(negociation)
+
+    resultats = scenario_matrix([property], scenarios, negociation=negociations).metriques[metrique][0]
+    reference = float(resultats[0])
+    resultat_bas, resultat_haut = resultats[1::2], resultats[2::2]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        elasticites = np.where(
+            valeurs != 0,
+            (resultat_haut - resultat_bas) / reference / ((bornes[:, 1] - bornes[:, 0]) / valeurs),
+            np.nan
+        )
+
+    return SensitivityResult(
+        parametres=parametres,
+        valeur=valeurs,
+        bas=bornes[:, 0],
+        haut=bornes[:, 1],
+        resultat_bas=resultat_bas,
+        resultat_haut=resultat_haut,
+        reference=reference,
+        elasticites=elasticites,
+        metrique=metrique
+    )
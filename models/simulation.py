@@ -0,0 +1,438 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from .property import Property
+from .loan import capital_restant_du, mensualite_constante, mensualite_credit, RESIDU_CAPITAL
+from .profiling import instrumenter
+
+# Plafonds réglementaires des livrets (identiques à Scenario)
+LIVRET_A_PLAFOND = 23000
+LDD_PLAFOND = 12000
+
+# Écart de rendement du compte à terme par rapport aux livrets (en points)
+ECART_COMPTE_TERME = 2
+
+# Frais de notaire appliqués à l'achat (ancien)
+TAUX_FRAIS_NOTAIRE = 0.08
+
+SERIES = ('valeur_bien', 'capital_restant', 'epargne', 'investissement', 'patrimoine_total')
+
+# Postes de charges, chacun indexé par son propre taux (section charges_evolution)
+CHARGES = ('copropriete', 'taxe_fonciere', 'energie', 'assurance')
+
+
+def croissance_composee(initial, taux_annuel, nb_mois: int) -> np.ndarray:
+    """Évolution mensuelle d'un capital à taux annuel constant (nb_mois + 1 valeurs).
+
+    Les paramètres peuvent être des scalaires ou des tableaux de même forme :
+    le résultat a alors la forme (..., nb_mois + 1). Le produit cumulé part du
+    montant initial pour reproduire exactement la multiplication mois par mois.
+    """
+    initial = np.asarray(initial, dtype=float)
+    facteur = 1 + np.asarray(taux_annuel, dtype=float) / 12 / 100
+    forme = np.broadcast(initial, facteur).shape
+    pas = np.empty(forme + (nb_mois + 1,))
+    pas[..., 0] = initial
+    pas[..., 1:] = facteur[..., None]
+    return np.cumprod(pas, axis=-1)
+
+
+def indexation_annuelle(taux_annuel, nb_mois: int) -> np.ndarray:
+    """Facteur de revalorisation d'un montant revu chaque année (nb_mois + 1 valeurs).
+
+    Le facteur vaut 1 au mois 0 et pendant la première année, puis est
+    multiplié par (1 + taux) à chaque anniversaire.
+    """
+    taux = np.asarray(taux_annuel, dtype=float)[..., None]
+    annees = np.maximum(np.arange(nb_mois + 1) - 1, 0) // 12
+    return (1 + taux / 100) ** annees
+
+
+def simulate_charges(charges_mensuelles, taxe_fonciere, energie, assurance,
+                     evolution_charges: Dict[str, float], nb_mois: int) -> Dict[str, np.ndarray]:
+    """Flux mensuels de charges sur nb_mois mois (mois 0 sans flux).
+
+    taxe_fonciere est annuelle et lissée sur douze mois ; assurance est la
+    prime mensuelle du prêt (scalaire) ou son échéancier (..., nb_mois + 1).
+    Chaque poste est revalorisé selon son taux de evolution_charges (0 à
+    défaut). Les paramètres acceptent des tableaux compatibles par broadcasting.
+    """
+    montants = {
+        'copropriete': np.asarray(charges_mensuelles, dtype=float),
+        'taxe_fonciere': np.asarray(taxe_fonciere, dtype=float) / 12,
+        'energie': np.asarray(energie, dtype=float),
+    }
+    flux = {}
+    for poste, montant in montants.items():
+        serie = montant[..., None] * indexation_annuelle(evolution_charges.get(poste, 0), nb_mois)
+        serie[..., 0] = 0
+        flux[poste] = serie
+    assurance = np.asarray(assurance, dtype=float)
+    if assurance.ndim == 0 or assurance.shape[-1] != nb_mois + 1:
+        assurance = np.broadcast_to(assurance[..., None], assurance.shape + (nb_mois + 1,))
+    flux['assurance'] = assurance * indexation_annuelle(evolution_charges.get('assurance', 0), nb_mois)
+    flux['assurance'][..., 0] = 0
+
+    flux = dict(zip(flux, np.broadcast_arrays(*flux.values())))
+    flux['total'] = sum(flux[poste] for poste in CHARGES)
+    return flux
+
+
+def deflater(serie, inflation, nb_mois: int) -> np.ndarray:
+    """Exprime une série mensuelle en euros constants du mois 0."""
+    return np.asarray(serie, dtype=float) / croissance_composee(1.0, inflation, nb_mois)
+
+
+def epargne_plafonnee(montant_initial, rendement_epargne, nb_mois: int,
+                      livret_a_plafond: float = LIVRET_A_PLAFOND,
+                      ldd_plafond: float = LDD_PLAFOND) -> np.ndarray:
+    """Évolution de l'épargne sécurisée (Livret A, LDD puis compte à terme).
+
+    Renvoie la valeur après 0, 1, ..., nb_mois mois de capitalisation. Les
+    livrets sont plafonnés en une seule passe (np.minimum sur le produit
+    cumulé), le surplus est placé sur un compte à terme moins rémunéré.
+    """
+    montant_initial = np.asarray(montant_initial, dtype=float)
+    rendement_epargne = np.asarray(rendement_epargne, dtype=float)
+
+    livret_a = np.minimum(montant_initial, livret_a_plafond)
+    reste_apres_livret_a = montant_initial - livret_a
+    ldd = np.minimum(reste_apres_livret_a, ldd_plafond)
+    compte_terme = reste_apres_livret_a - ldd
+
+    livret_a = np.minimum(croissance_composee(livret_a, rendement_epargne, nb_mois), livret_a_plafond)
+    ldd = np.minimum(croissance_composee(ldd, rendement_epargne, nb_mois), ldd_plafond)
+    compte_terme = croissance_composee(compte_terme, rendement_epargne - ECART_COMPTE_TERME, nb_mois)
+
+    evolution = livret_a + ldd + compte_terme
+    # Le premier mois correspond exactement au montant placé
+    evolution[..., 0] = montant_initial
+    return evolution
+
+
+def serie_epargne(epargne, rendement_epargne, nb_mois: int,
+                  livret_a_plafond: float = LIVRET_A_PLAFOND,
+                  ldd_plafond: float = LDD_PLAFOND) -> np.ndarray:
+    """Série de l'épargne sécurisée du patrimoine (nb_mois + 1 valeurs).
+
+    L'épargne du mois m correspond à m - 1 mois de capitalisation (décalage historique).
+    """
+    epargne_mensuelle = epargne_plafonnee(epargne, rendement_epargne, max(nb_mois - 1, 0),
+                                          livret_a_plafond, ldd_plafond)
+    epargne_evolution = np.concatenate([epargne_mensuelle[..., :1], epargne_mensuelle], axis=-1)
+    return epargne_evolution[..., :nb_mois + 1]
+
+
+def simulate_series(cout_total, montant_pret, mensualite, epargne, investissement,
+                    taux_credit, evolution_immobilier, rendement_epargne,
+                    rendement_investissement, nb_mois: int,
+                    livret_a_plafond: float = LIVRET_A_PLAFOND,
+                    ldd_plafond: float = LDD_PLAFOND,
+                    capital_restant: Optional[np.ndarray] = None,
+                    inflation=None) -> Dict[str, np.ndarray]:
+    """Calcule en une passe les cinq séries du patrimoine sur nb_mois mois.
+
+    Chaque série contient nb_mois + 1 valeurs (mois 0 inclus). Tous les
+    paramètres acceptent des tableaux NumPy compatibles par broadcasting.
+    mensualite est l'échéance hors assurance ; capital_restant permet de
+    fournir directement le capital issu d'un échéancier (prêt à tranches,
+    remboursements anticipés). Si inflation est fourni, la série
+    patrimoine_reel (en euros constants du mois 0) est ajoutée.
+    """
+    valeur_bien = croissance_composee(cout_total, evolution_immobilier, nb_mois)
+    if capital_restant is None:
+        capital_restant = capital_restant_du(montant_pret, mensualite, taux_credit, nb_mois)
+    capital_restant = np.asarray(capital_restant, dtype=float)
+    investissement_evolution = croissance_composee(investissement, rendement_investissement, nb_mois)
+
+    epargne_evolution = serie_epargne(epargne, rendement_epargne, nb_mois, livret_a_plafond, ldd_plafond)
+
+    forme = np.broadcast_shapes(valeur_bien.shape, capital_restant.shape,
+                                epargne_evolution.shape, investissement_evolution.shape)
+    valeur_bien, capital_restant, epargne_evolution, investissement_evolution = (
+        np.broadcast_to(serie, forme) for serie in
+        (valeur_bien, capital_restant, epargne_evolution, investissement_evolution)
+    )
+    patrimoine_total = valeur_bien - capital_restant + epargne_evolution + investissement_evolution
+
+    series = {
+        'valeur_bien': valeur_bien,
+        'capital_restant': capital_restant,
+        'epargne': epargne_evolution,
+        'investissement': investissement_evolution,
+        'patrimoine_total': patrimoine_total
+    }
+    if inflation is not None:
+        series['patrimoine_reel'] = deflater(patrimoine_total, inflation, nb_mois)
+    return series
+
+
+def cout_acquisition(prix, prix_hors_honoraires, frais_agence_acquereur, negociation=0):
+    """Coût total d'acquisition (prix négocié + frais de notaire), vectorisé.
+
+    Les frais de notaire portent sur le prix négocié si les frais d'agence sont
+    à la charge de l'acquéreur, sur le prix hors honoraires négocié sinon.
+    """
+    prix_negocie = np.asarray(prix, dtype=float) * (1 - np.asarray(negociation, dtype=float) / 100)
+    base_frais_notaire = np.where(
+        frais_agence_acquereur,
+        prix_negocie,
+        np.asarray(prix_hors_honoraires, dtype=float) * (1 - np.asarray(negociation, dtype=float) / 100)
+    )
+    return prix_negocie + base_frais_notaire * TAUX_FRAIS_NOTAIRE
+
+
+@dataclass
+class BatchResult:
+    """Résultat d'une simulation groupée.
+
+    series a la forme (scénario, mois, composante), les composantes suivant
+    l'ordre de SERIES. parametres contient, pour chaque scénario, la valeur
+    des paramètres utilisés (tableaux de longueur nb_scenarios). annexes
+    contient, sur demande, les flux de charges et le patrimoine réel
+    (tableaux (scénario, mois)).
+    """
+    series: np.ndarray
+    parametres: Dict[str, np.ndarray]
+    forme_grille: Tuple[int, ...]
+    composantes: Tuple[str, ...] = SERIES
+    annexes: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def serie(self, nom: str) -> np.ndarray:
+        """Renvoie une composante (ou une série annexe) sous la forme (scénario, mois)."""
+        if nom in self.annexes:
+            return self.annexes[nom]
+        return self.series[..., self.composantes.index(nom)]
+
+    def en_grille(self, nom: str = 'patrimoine_total') -> np.ndarray:
+        """Renvoie une composante remise à la forme de la grille de paramètres."""
+        return self.serie(nom).reshape(self.forme_grille + (-1,))
+
+
+def _part_securisee(config) -> float:
+    """Part (en %) de l'apport hors immobilier placée en épargne sécurisée."""
+    part_hors_immo = config.repartition_epargne + config.repartition_investissement
+    return config.repartition_epargne / part_hors_immo * 100 if part_hors_immo > 0 else 50.0
+
+
+@instrumenter()
+def simulate_batch(properties: Sequence[Property], config, taux_credit=None, duree_credit=None,
+                   apport_immobilier=None, negociation=None, evolution_immobilier=None,
+                   part_securisee=None, grille: bool = True, flux: bool = False) -> BatchResult:
+    """Simule d'un bloc tous les biens sous plusieurs jeux de paramètres.
+
+    Chaque paramètre est un scalaire ou un tableau ; à défaut, la valeur de
+    config est utilisée. Avec grille=True, les paramètres sont combinés en
+    produit cartésien (bien x taux x durée x apport x négociation x
+    valorisation x part sécurisée). Avec grille=False, ils sont appariés
+    élément par élément (par exemple une liste d'offres de financement
+    taux/durée) puis croisés avec les biens. apport_immobilier est exprimé en
+    euros ; le reste de l'apport total est réparti entre épargne sécurisée
+    (part_securisee, en pourcentage) et investissement, selon les proportions
+    de config par défaut. Avec flux=True, les flux mensuels de charges et le
+    patrimoine réel sont ajoutés aux annexes du résultat.
+    """
+    properties = list(properties)
+    prix = np.array([p.prix for p in properties], dtype=float)
+    prix_hors_honoraires = np.array([p.prix_hors_honoraires for p in properties], dtype=float)
+    frais_agence_acquereur = np.array([p.frais_agence_acquereur for p in properties], dtype=bool)
+
+    valeurs = {
+        'taux_credit': config.taux_credit if taux_credit is None else taux_credit,
+        'duree_credit': config.duree_credit if duree_credit is None else duree_credit,
+        'apport_immobilier': (config.apport_total * config.repartition_immobilier / 100
+                              if apport_immobilier is None else apport_immobilier),
+        'negociation': 0 if negociation is None else negociation,
+        'evolution_immobilier': config.evolution_immobilier if evolution_immobilier is None else evolution_immobilier,
+        'part_securisee': _part_securisee(config) if part_securisee is None else part_securisee,
+    }
+    valeurs = {nom: np.atleast_1d(np.asarray(v, dtype=float)) for nom, v in valeurs.items()}
+
+    # Axes : le premier pour les biens, puis un axe par paramètre (grille) ou un axe commun
+    if grille:
+        nb_axes = len(valeurs)
+        axes = {nom: v.reshape((1,) + tuple(-1 if k == i else 1 for k in range(nb_axes)))
+                for i, (nom, v) in enumerate(valeurs.items())}
+        forme = (len(properties),) + tuple(len(v) for v in valeurs.values())
+    else:
+        nb_offres = np.broadcast_shapes(*(v.shape for v in valeurs.values()))
+        axes = {nom: np.broadcast_to(v, nb_offres)[None, :] for nom, v in valeurs.items()}
+        forme = (len(properties),) + nb_offres
+
+    def par_bien(tableau):
+        return tableau.reshape((-1,) + (1,) * (len(forme) - 1))
+
+    cout_total = cout_acquisition(par_bien(prix), par_bien(prix_hors_honoraires),
+                                  par_bien(frais_agence_acquereur), axes['negociation'])
+    apport_immo = axes['apport_immobilier']
+    montant_pret = cout_total - apport_immo
+    mensualite = mensualite_credit(montant_pret, axes['taux_credit'], axes['duree_credit'], config.taux_assurance)
+    # Échéance hors assurance, qui seule amortit le capital
+    echeance = mensualite_constante(montant_pret, axes['taux_credit'], axes['duree_credit'] * 12)
+
+    # Répartition du reste de l'apport entre épargne et investissement
+    reste = config.apport_total - apport_immo
+    epargne = reste * axes['part_securisee'] / 100
+    investissement = reste * (1 - axes['part_securisee'] / 100)
+
+    champs = [cout_total, montant_pret, mensualite, echeance, epargne, investissement,
+              axes['taux_credit'], axes['evolution_immobilier']]
+    champs = [np.broadcast_to(c, forme).ravel() for c in champs]
+    cout_total, montant_pret, mensualite, echeance, epargne, investissement, taux, evolution = champs
+
+    series = simulate_series(
+        cout_total=cout_total,
+        montant_pret=np.maximum(montant_pret, 0),
+        mensualite=np.maximum(echeance, 0),
+        epargne=epargne,
+        investissement=investissement,
+        taux_credit=taux,
+        evolution_immobilier=evolution,
+        rendement_epargne=config.rendement_epargne,
+        rendement_investissement=config.rendement_investissement,
+        nb_mois=config.horizon_simulation * 12
+    )
+
+    indices_biens = np.broadcast_to(np.arange(len(properties)).reshape((-1,) + (1,) * (len(forme) - 1)), forme).ravel()
+    parametres = {nom: np.broadcast_to(v, forme).ravel() for nom, v in axes.items()}
+    parametres['bien'] = np.array([p.id for p in properties])[indices_biens]
+    parametres['indice_bien'] = indices_biens
+    parametres['cout_total'] = cout_total
+    parametres['montant_pret'] = montant_pret
+    parametres['mensualite'] = mensualite
+    parametres['epargne'] = epargne
+    parametres['investissement'] = investissement
+
+    annexes = {}
+    if flux:
+        nb_mois = config.horizon_simulation * 12
+        # Prime d'assurance sur le capital emprunté, due tant que le prêt court (résidus d'arrondi exclus, comme dans Pret.echeancier)
+        prime = np.maximum(montant_pret, 0) * config.taux_assurance / 100 / 12
+        assurance = np.zeros((len(montant_pret), nb_mois + 1))
+        assurance[:, 1:] = np.where(series['capital_restant'][:, :-1] >= RESIDU_CAPITAL, prime[:, None], 0.0)
+        annexes = simulate_charges(
+            charges_mensuelles=np.array([p.charges_mensuelles for p in properties], dtype=float)[indices_biens],
+            taxe_fonciere=np.array([p.taxe_fonciere or 0 for p in properties], dtype=float)[indices_biens],
+            energie=np.array([p.energie or 0 for p in properties], dtype=float)[indices_biens],
+            assurance=assurance,
+            evolution_charges=config.evolution_charges,
+            nb_mois=nb_mois
+        )
+        annexes = {f"charges_{poste}": serie for poste, serie in annexes.items()}
+        annexes['patrimoine_reel'] = deflater(series['patrimoine_total'], config.inflation, nb_mois)
+
+    return BatchResult(
+        series=np.stack([series[nom] for nom in SERIES]).transpose(1, 2, 0),
+        parametres=parametres,
+        forme_grille=forme,
+        annexes=annexes
+    )
+
+
+def batch_metrics(resultat: BatchResult, properties: Sequence[Property], config) -> Dict[str, np.ndarray]:
+    """Métriques de Scenario.calculate_metrics pour chaque scénario d'une simulation groupée."""
+    charges_fixes = np.array([p.charges_mensuelles + (p.energie or 0) + (p.taxe_fonciere or 0) / 12
+                              for p in properties], dtype=float)
+    parametres = resultat.parametres
+    # Pas de crédit (ni d'assurance) si l'apport couvre le coût total
+    mensualite = np.where(parametres['montant_pret'] > 0, parametres['mensualite'], 0.0)
+    patrimoine = resultat.serie('patrimoine_total')
+    patrimoine_initial = patrimoine[:, 0]
+    patrimoine_final = patrimoine[:, -1]
+    return {
+        'mensualite_credit': mensualite,
+        'charges_totales': mensualite + charges_fixes[parametres['indice_bien']],
+        'patrimoine_initial': patrimoine_initial,
+        'patrimoine_final': patrimoine_final,
+        'rendement_total': ((patrimoine_final / patrimoine_initial) ** (1 / config.horizon_simulation) - 1) * 100
+    }
+
+
+@dataclass
+class ScenarioMatrix:
+    """Métriques de chaque bien (lignes) sous chaque scénario nommé (colonnes)."""
+    biens: Tuple[str, ...]
+    scenarios: Tuple[str, ...]
+    metriques: Dict[str, np.ndarray]  # tableaux (bien, scénario)
+
+    def dataframe(self, metrique: str = 'patrimoine_final'):
+        """Tableau bien x scénario d'une métrique."""
+        import pandas as pd
+        return pd.DataFrame(self.metriques[metrique], index=list(self.biens), columns=list(self.scenarios))
+
+
+def scenario_matrix(properties: Sequence[Property], scenarios: Dict[str, object],
+                    taille_lot: int = 2000, negociation=0) -> ScenarioMatrix:
+    """Évalue chaque bien sous chaque scénario nommé en une passe vectorisée.
+
+    Les paramètres des scénarios (apport, crédit, rendements, horizon) forment
+    un axe de la simulation ; les séries sont calculées jusqu'à l'horizon le
+    plus long et lues à l'horizon propre à chaque scénario. negociation (en
+    pourcentage) est un scalaire ou une valeur par scénario. Les biens sont
+    traités par lots de taille_lot pour borner la mémoire.
+    """
+    properties = list(properties)
+    configs = list(scenarios.values())
+
+    def colonne(valeurs):
+        return np.array(valeurs, dtype=float)[None, :]
+
+    apport_total = colonne([c.apport_total for c in configs])
+    apport_immo = apport_total * colonne([c.repartition_immobilier for c in configs]) / 100
+    part_securisee = colonne([_part_securisee(c) for c in configs])
+    taux = colonne([c.taux_credit for c in configs])
+    duree = colonne([c.duree_credit for c in configs])
+    horizon_mois = np.array([c.horizon_simulation * 12 for c in configs])
+    negociation = np.broadcast_to(np.asarray(negociation, dtype=float), (len(configs),))[None, :]
+    reste = apport_total - apport_immo
+    charges_fixes = np.array([p.charges_mensuelles + (p.energie or 0) + (p.taxe_fonciere or 0) / 12
+                              for p in properties], dtype=float)[:, None]
+
+    lots = []
+    for debut in range(0, len(properties), taille_lot):
+        lot = properties[debut:debut + taille_lot]
+        cout_total = cout_acquisition(
+            np.array([p.prix for p in lot], dtype=float)[:, None],
+            np.array([p.prix_hors_honoraires for p in lot], dtype=float)[:, None],
+            np.array([p.frais_agence_acquereur for p in lot], dtype=bool)[:, None],
+            negociation
+        )
+        montant_pret = cout_total - apport_immo
+        series = simulate_series(
+            cout_total=cout_total,
+            montant_pret=np.maximum(montant_pret, 0),
+            mensualite=np.maximum(mensualite_constante(montant_pret, taux, duree * 12), 0),
+            epargne=reste * part_securisee / 100,
+            investissement=reste * (1 - part_securisee / 100),
+            taux_credit=taux,
+            evolution_immobilier=colonne([c.evolution_immobilier for c in configs]),
+            rendement_epargne=colonne([c.rendement_epargne for c in configs]),
+            rendement_investissement=colonne([c.rendement_investissement for c in configs]),
+            nb_mois=int(horizon_mois.max())
+        )
+        patrimoine = series['patrimoine_total']
+        final = np.take_along_axis(patrimoine, np.broadcast_to(horizon_mois[None, :, None], patrimoine.shape[:2] + (1,)),
+                                   axis=-1)[..., 0]
+        lots.append({
+            'cout_total': np.broadcast_to(cout_total, montant_pret.shape),
+            'montant_pret': montant_pret,
+            'mensualite_credit': np.where(montant_pret > 0, mensualite_credit(
+                montant_pret, taux, duree, colonne([c.taux_assurance for c in configs])), 0.0),
+            'patrimoine_initial': patrimoine[..., 0],
+            'patrimoine_final': final
+        })
+
+    metriques = {nom: (np.concatenate([lot[nom] for lot in lots]) if lots else np.empty((0, len(configs))))
+                 for nom in ('cout_total', 'montant_pret', 'mensualite_credit', 'patrimoine_initial', 'patrimoine_final')}
+    # Patrimoine final en euros constants, déflaté sur l'horizon de chaque scénario
+    inflation = colonne([c.inflation for c in configs])
+    metriques['patrimoine_reel'] = metriques['patrimoine_final'] / (1 + inflation / 12 / 100) ** horizon_mois[None, :]
+    metriques['charges_totales'] = metriques['mensualite_credit'] + charges_fixes
+    metriques['rendement_total'] = ((metriques['patrimoine_final'] / metriques['patrimoine_initial'])
+                                    ** (1 / (horizon_mois[None, :] / 12)) - 1) * 100
+
+    return ScenarioMatrix(
+        biens=tuple(p.id for p in properties),
+        scenarios=tuple(scenarios),
+        metriques=metriques
+    )
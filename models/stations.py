@@ -0,0 +1,301 @@
+import csv
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .cache import LRUCache
+from .property import Metro, Property
+
+STATIONS_FILE = 'data/stations.csv'
+RAYON_TERRE = 6371000.0  # mètres
+LATITUDE_REFERENCE = 48.8566  # Paris : la projection locale est exacte à quelques mètres près sur l'Île-de-France
+RAYON_TRANSPORT = 1000.0  # au-delà, une station ne rapporte plus de points au score transport
+TAILLE_CELLULE = 500.0
+RAYON_LIGNE_MAX = 2000.0  # portée des requêtes de proximité à une ligne
+
+_INDEX_STATIONS = LRUCache(4)
+
+
+def normaliser_ligne(ligne: str) -> str:
+    """Nom d'une ligne de métro au format du fichier des stations (« L13 », « 13 » ou « Ligne 13 » : « M13 »)."""
+    correspondance = re.fullmatch(r'(?:M|L|Ligne|Métro)?\s*(\d{1,2})\s*(bis)?', ligne.strip(), re.IGNORECASE)
+    if not correspondance:
+        return ligne.strip()
+    return f"M{correspondance.group(1)}{'bis' if correspondance.group(2) else ''}"
+
+
+def projeter(latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+    """Projection équirectangulaire locale (en mètres) autour de LATITUDE_REFERENCE."""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    return RAYON_TERRE * lon * np.cos(np.radians(LATITUDE_REFERENCE)), RAYON_TERRE * lat
+
+
+class GridIndex:
+    """Index spatial en grille régulière d'un semis de points (latitude, longitude).
+
+    Les points sont triés par cellule ; chaque cellule occupée donne la plage
+    de ses points dans les tableaux triés. Une requête ne mesure la distance
+    qu'aux points des cellules voisines.
+    """
+
+    def __init__(self, latitudes, longitudes, taille_cellule: float = TAILLE_CELLULE):
+        self.taille_cellule = float(taille_cellule)
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self._grilles: Dict[float, 'GridIndex'] = {}
+        x, y = projeter(latitudes, longitudes)
+        cx, cy = self._cellule(x), self._cellule(y)
+        ordre = np.lexsort((cy, cx))
+        self.indices = ordre
+        self.x, self.y = x[ordre], y[ordre]
+        # Plage [début, fin) des points de chaque cellule occupée
+        cx, cy = cx[ordre], cy[ordre]
+        debuts = np.flatnonzero(np.r_[True, (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])]) if len(ordre) else []
+        fins = np.r_[debuts[1:], len(ordre)].astype(int)
+        self._plages: Dict[Tuple[int, int], Tuple[int, int]] = {
+            (int(cx[d]), int(cy[d])): (int(d), int(f)) for d, f in zip(debuts, fins)
+        }
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def _cellule(self, coordonnee):
+        return np.floor(np.asarray(coordonnee) / self.taille_cellule).astype(np.int64)
+
+    def _candidats(self, cx: int, cy: int, portee: int, anneau_min: int = 0) -> np.ndarray:
+        """Positions (dans les tableaux triés) des points des cellules à moins de portee cellules."""
+        plages = [self._plages[(cx + dx, cy + dy)]
+                  for dx in range(-portee, portee + 1) for dy in range(-portee, portee + 1)
+                  if max(abs(dx), abs(dy)) >= anneau_min and (cx + dx, cy + dy) in self._plages]
+        if not plages:
+            return np.array([], dtype=int)
+        return np.concatenate([np.arange(d, f) for d, f in plages])
+
+    def rayon(self, latitude: float, longitude: float, rayon: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Points à moins de rayon mètres : (indices d'origine, distances), par distance croissante."""
+        x, y = projeter(latitude, longitude)
+        portee = int(np.ceil(rayon / self.taille_cellule))
+        positions = self._candidats(int(self._cellule(x)), int(self._cellule(y)), portee)
+        distances = np.hypot(self.x[positions] - x, self.y[positions] - y)
+        garder = distances <= rayon
+        positions, distances = positions[garder], distances[garder]
+        ordre = np.argsort(distances, kind='stable')
+        return self.indices[positions[ordre]], distances[ordre]
+
+    def plus_proches(self, latitude: float, longitude: float, k: int = 1,
+                     rayon_max: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Les k points les plus proches (indices d'origine, distances), par anneaux de cellules croissants."""
+        x, y = projeter(latitude, longitude)
+        cx, cy = int(self._cellule(x)), int(self._cellule(y))
+        k = min(k, len(self))
+        positions = np.array([], dtype=int)
+        anneau = 0
+        while True:
+            positions = np.r_[positions, self._candidats(cx, cy, anneau, anneau_min=anneau)]
+            distances = np.hypot(self.x[positions] - x, self.y[positions] - y)
+            # Tout point hors des anneaux parcourus est à plus de anneau * taille_cellule
+            couvert = anneau * self.taille_cellule
+            assez = len(positions) >= k and np.partition(distances, k - 1)[k - 1] <= couvert if k else True
+            if assez or (rayon_max is not None and couvert >= rayon_max) or len(positions) == len(self):
+                break
+            anneau += 1
+        ordre = np.argsort(distances, kind='stable')[:k]
+        positions, distances = positions[ordre], distances[ordre]
+        if rayon_max is not None:
+            garder = distances <= rayon_max
+            positions, distances = positions[garder], distances[garder]
+        return self.indices[positions], distances
+
+    def paires(self, latitudes, longitudes, rayon: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Toutes les paires (requête, point) à moins de rayon mètres, pour un lot de requêtes.
+
+        Les requêtes sont regroupées par cellule : les distances sont calculées
+        par blocs (requêtes d'une cellule x points des cellules voisines).
+        Pour un rayon plus grand que les cellules, une grille de cellules de
+        la taille du rayon est construite (et conservée) pour limiter le
+        nombre de blocs. Renvoie les indices des requêtes, les indices
+        d'origine des points et les distances.
+        """
+        if rayon > self.taille_cellule:
+            if rayon not in self._grilles:
+                self._grilles[rayon] = GridIndex(self.latitudes, self.longitudes, rayon)
+            return self._grilles[rayon].paires(latitudes, longitudes, rayon)
+        x, y = projeter(latitudes, longitudes)
+        valides = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        portee = int(np.ceil(rayon / self.taille_cellule))
+        cx, cy = self._cellule(x[valides]), self._cellule(y[valides])
+        ordre = np.lexsort((cy, cx))
+        valides, cx, cy = valides[ordre], cx[ordre], cy[ordre]
+        ruptures = np.flatnonzero(np.r_[True, (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])]) if len(valides) else []
+
+        requetes, points, distances = [], [], []
+        for debut, fin in zip(ruptures, np.r_[ruptures[1:], len(valides)].astype(int)):
+            positions = self._candidats(int(cx[debut]), int(cy[debut]), portee)
+            if not len(positions):
+                continue
+            bloc = valides[debut:fin]
+            d = np.hypot(x[bloc, None] - self.x[positions], y[bloc, None] - self.y[positions])
+            i, j = np.nonzero(d <= rayon)
+            requetes.append(bloc[i])
+            points.append(self.indices[positions[j]])
+            distances.append(d[i, j])
+        if not requetes:
+            return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+        return np.concatenate(requetes), np.concatenate(points), np.concatenate(distances)
+
+
+@dataclass
+class StationIndex:
+    """Stations de métro (une ligne par couple station / ligne) et leur index spatial."""
+    stations: np.ndarray
+    lignes: np.ndarray
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    index: GridIndex
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], taille_cellule: float = TAILLE_CELLULE) -> 'StationIndex':
+        """Construit l'index à partir d'enregistrements station, ligne, latitude, longitude."""
+        latitudes = np.array([float(r['latitude']) for r in records])
+        longitudes = np.array([float(r['longitude']) for r in records])
+        return cls(
+            stations=np.array([r['station'] for r in records], dtype=object),
+            lignes=np.array([r['ligne'] for r in records], dtype=object),
+            latitudes=latitudes,
+            longitudes=longitudes,
+            index=GridIndex(latitudes, longitudes, taille_cellule)
+        )
+
+    @classmethod
+    def from_csv(cls, path: str = STATIONS_FILE) -> 'StationIndex':
+        """Charge les stations embarquées ; l'index n'est construit qu'une fois par version du fichier."""
+        stat = os.stat(path)
+
+        def construire():
+            with open(path, newline='', encoding='utf-8') as f:
+                return cls.from_records(list(csv.DictReader(f)))
+
+        return _INDEX_STATIONS.get_or_compute((str(path), stat.st_mtime_ns, stat.st_size), construire)
+
+    def metros(self, latitude: float, longitude: float, rayon: float = RAYON_TRANSPORT,
+               max_lignes: Optional[int] = None) -> List[Metro]:
+        """Station la plus proche de chaque ligne à moins de rayon mètres, par distance croissante."""
+        indices, distances = self.index.rayon(latitude, longitude, rayon)
+        metros, vues = [], set()
+        for i, distance in zip(indices, distances):
+            if self.lignes[i] in vues:
+                continue
+            vues.add(self.lignes[i])
+            metros.append(Metro(ligne=self.lignes[i], station=self.stations[i], distance=int(round(distance))))
+        return metros[:max_lignes]
+
+    def metros_bien(self, bien: Property, rayon: float = RAYON_TRANSPORT) -> List[Metro]:
+        """Métros d'un bien : stations embarquées s'il est localisé, métros de l'annonce sinon.
+
+        Les métros saisis sont aussi conservés quand aucune station de leurs
+        lignes n'est dans le rayon (ligne ou station absente du fichier).
+        """
+        if bien.latitude is None or bien.longitude is None:
+            return bien.metros
+        metros = self.metros(bien.latitude, bien.longitude, rayon)
+        lignes_saisies = {normaliser_ligne(m.ligne) for m in bien.metros}
+        if lignes_saisies and not lignes_saisies & {m.ligne for m in metros}:
+            return bien.metros
+        return metros
+
+    def metros_catalogue(self, latitudes, longitudes,
+                         rayon: float = RAYON_TRANSPORT) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Station la plus proche de chaque ligne, pour tous les biens d'un coup.
+
+        Renvoie (indice du bien, indice de la station, distance), trié par
+        bien puis par distance croissante.
+        """
+        biens, stations, distances = self.index.paires(latitudes, longitudes, rayon)
+        # Une seule station par couple (bien, ligne) : la plus proche
+        _, codes_lignes = np.unique(self.lignes[stations].astype(str), return_inverse=True)
+        ordre = np.lexsort((distances, codes_lignes, biens))
+        biens, lignes, stations, distances = biens[ordre], codes_lignes[ordre], stations[ordre], distances[ordre]
+        premiere = np.r_[True, (biens[1:] != biens[:-1]) | (lignes[1:] != lignes[:-1])] if len(biens) else np.array([], dtype=bool)
+        biens, stations, distances = biens[premiere], stations[premiere], distances[premiere]
+        ordre = np.lexsort((distances, biens))
+        return biens[ordre], stations[ordre], distances[ordre]
+
+    def distances_lignes(self, latitudes, longitudes,
+                         rayon_max: float = RAYON_LIGNE_MAX) -> Tuple[Tuple[str, ...], np.ndarray]:
+        """Distance de chaque point à la station la plus proche de chaque ligne.
+
+        Calculée une fois pour tout le catalogue, la matrice (point x ligne)
+        répond ensuite aux requêtes « à moins de r mètres de la ligne L » par
+        une simple comparaison de colonne. Les distances au-delà de rayon_max
+        valent inf.
+        """
+        lignes = tuple(sorted(set(self.lignes)))
+        matrice = np.full((len(np.atleast_1d(latitudes)), len(lignes)), np.inf)
+        points, stations, distances = self.metros_catalogue(latitudes, longitudes, rayon_max)
+        colonnes = np.searchsorted(np.array(lignes), self.lignes[stations].astype(str))
+        matrice[points, colonnes] = distances
+        return lignes, matrice
+
+    def indices_ligne(self, ligne: str) -> np.ndarray:
+        """Indices des stations d'une ligne."""
+        return np.flatnonzero(self.lignes == ligne)
+
+
+def coordonnees(properties: Sequence[Property]) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitudes et longitudes des biens (NaN pour les biens non localisés)."""
+    return (np.array([p.latitude if p.latitude is not None else np.nan for p in properties], dtype=float),
+            np.array([p.longitude if p.longitude is not None else np.nan for p in properties], dtype=float))
+
+
+def distances_transport(properties: Sequence[Property], index: StationIndex,
+                        rayon: float = RAYON_TRANSPORT) -> Tuple[np.ndarray, np.ndarray]:
+    """Distances aux stations de chaque bien, au format de comparison.scores_transport.
+
+    Les biens localisés utilisent la station la plus proche de chaque ligne
+    dans le rayon, sauf si aucune ne dessert les lignes saisies dans leur
+    annonce (comme StationIndex.metros_bien) ; les autres conservent les
+    métros saisis. Renvoie les distances concaténées et le nombre de
+    stations par bien.
+    """
+    latitudes, longitudes = coordonnees(properties)
+    biens, stations, distances_index = index.metros_catalogue(latitudes, longitudes, rayon)
+
+    # Biens dont au moins une station trouvée dessert une ligne saisie, par clé (bien, ligne)
+    biens_saisis = np.array([i for i, p in enumerate(properties) for _ in p.metros], dtype=int)
+    lignes_saisies = np.array([normaliser_ligne(m.ligne) for p in properties for m in p.metros], dtype=object)
+    noms, codes = np.unique(np.r_[lignes_saisies, index.lignes[stations]].astype(str), return_inverse=True)
+    cles_saisies = biens_saisis * len(noms) + codes[:len(biens_saisis)]
+    cles_index = biens * len(noms) + codes[len(biens_saisis):]
+    desservis = np.zeros(len(properties), dtype=bool)
+    desservis[biens[np.isin(cles_index, cles_saisies)]] = True
+    avec_saisies = np.bincount(biens_saisis, minlength=len(properties)) > 0
+    # Distances recalculées pour les biens localisés, sauf ceux dont l'annonce cite des lignes non trouvées
+    calcules = np.isfinite(latitudes) & np.isfinite(longitudes) & (desservis | ~avec_saisies)
+    garder = calcules[biens]
+    biens, distances_index = biens[garder], distances_index[garder]
+
+    nb_stations = np.where(calcules, np.bincount(biens, minlength=len(properties)),
+                           [len(p.metros) for p in properties])
+    # Concaténation dans l'ordre des biens : distances issues de l'index ou de l'annonce
+    saisies = np.array([m.distance for p, l in zip(properties, calcules) if not l for m in p.metros], dtype=float)
+    source = np.r_[np.zeros(len(biens), dtype=int), np.ones(len(saisies), dtype=int)]
+    proprietaire = np.r_[biens, np.repeat(np.flatnonzero(~calcules), nb_stations[~calcules])]
+    ordre = np.lexsort((source, proprietaire))
+    # Distances arrondies au mètre, comme les métros d'une annonce
+    return np.r_[np.round(distances_index), saisies][ordre], nb_stations
+
+
+def biens_proches_ligne(distances: np.ndarray, lignes: Sequence[str], ligne: str,
+                        rayon: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Biens à moins de rayon mètres d'une station de la ligne : (indices, distance à la plus proche).
+
+    distances est la matrice (bien x ligne) de StationIndex.distances_lignes ;
+    rayon ne doit pas dépasser le rayon utilisé pour la calculer.
+    """
+    if ligne not in lignes:
+        return np.array([], dtype=int), np.array([])
+    colonne = distances[:, list(lignes).index(ligne)]
+    indices = np.flatnonzero(colonne <= rayon)
+    return indices, colonne[indices]
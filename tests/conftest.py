@@ -0,0 +1,37 @@
+import os
+import sys
+import pytest
+
+# Les tests importent les modules du dépôt (models, benchmarks) depuis la racine
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from models.property import Property  # noqa: E402
+from models.scenario import ScenarioConfig  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def config() -> ScenarioConfig:
+    """Configuration par défaut de data/scenarios.yaml."""
+    return ScenarioConfig.from_yaml(os.path.join(RACINE, 'data', 'scenarios.yaml'))
+
+
+@pytest.fixture(scope='session')
+def biens():
+    """Petit catalogue : prix, charges et frais d'agence variés."""
+    caracteristiques = [
+        # (adresse, surface, prix, prix hors honoraires, charges, taxe foncière, énergie, dpe, frais acquéreur)
+        ('12 rue Championnet, 75018 Paris', 42.0, 385000, 370000, 120, 900, 60, 'D', False),
+        ('3 rue des Pyrénées, 75020 Paris', 28.5, 259000, 259000, 80, None, None, 'E', False),
+        ('40 avenue Jean Jaurès, 75019 Paris', 65.0, 520000, 500000, 210, 1300, 95, 'C', True),
+        ('8 rue de la République, 93100 Montreuil', 55.0, 330000, 318000, 150, 1100, 80, 'D', True),
+        ('21 rue Victor Hugo, 94300 Vincennes', 48.0, 455000, 440000, 175, 1000, None, 'B', False),
+        ('5 rue Marcadet, 75018 Paris', 19.0, 189000, 180000, 60, 450, 40, 'F', False),
+    ]
+    return [
+        Property(id=f"bien-{i:03d}", adresse=adresse, surface=surface, etage='2', prix=prix,
+                 prix_hors_honoraires=hors_honoraires, prix_m2=prix / surface, charges_mensuelles=charges,
+                 taxe_fonciere=taxe, energie=energie, dpe=dpe, frais_agence_acquereur=frais)
+        for i, (adresse, surface, prix, hors_honoraires, charges, taxe, energie, dpe, frais)
+        in enumerate(caracteristiques, 1)
+    ]
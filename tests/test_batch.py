@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+import pandas as pd
+import pytest
+from batch.run import main
+
+DONNEES = Path(__file__).resolve().parent.parent / 'data'
+
+
+@pytest.fixture
+def catalogue_vide(tmp_path):
+    path = tmp_path / 'properties.json'
+    path.write_text(json.dumps({'properties': {}}))
+    return str(path)
+
+
+@pytest.mark.parametrize('option', ['--pas-series', '--taille-lot'])
+def test_pas_et_taille_de_lot_strictement_positifs(tmp_path, option):
+    with pytest.raises(SystemExit) as erreur:
+        main(['--output', str(tmp_path / 'resultats.csv'), '--series', str(tmp_path / 'series.csv'), option, '0'])
+    assert erreur.value.code == 2
+
+
+def test_catalogue_vide_ecrit_les_en_tetes(tmp_path, catalogue_vide):
+    sortie, series = tmp_path / 'resultats.csv', tmp_path / 'series.csv'
+    assert main(['--properties', catalogue_vide, '--scenarios', str(DONNEES / 'scenarios.yaml'), '--output', str(sortie), '--series', str(series),
+                 '--pas-series', '12', '--workers', '1']) == 0
+    metriques = pd.read_csv(sortie)
+    assert metriques.empty
+    assert {'bien', 'scenario', 'cout_total', 'patrimoine_total_final'} <= set(metriques.columns)
+    assert list(pd.read_csv(series).columns[:3]) == ['bien', 'scenario', 'mois']
+
+
+def test_series_echantillonnees(tmp_path, config):
+    sortie, series = tmp_path / 'resultats.csv', tmp_path / 'series.csv'
+    assert main(['--properties', str(DONNEES / 'properties.json'), '--scenarios', str(DONNEES / 'scenarios.yaml'),
+                 '--output', str(sortie), '--series', str(series), '--pas-series', '12',
+                 '--scenario', 'default', '--workers', '1']) == 0
+    metriques = pd.read_csv(sortie)
+    mois = pd.read_csv(series).groupby('bien')['mois'].agg(list)
+    assert set(mois.index) == set(metriques['bien'])
+    nb_mois = config.horizon_simulation * 12
+    assert all(m == list(range(0, nb_mois + 1, 12)) + ([nb_mois] if nb_mois % 12 else []) for m in mois)
@@ -0,0 +1,75 @@
+import random
+import pytest
+from benchmarks.generators import generate_properties
+from models.catalog import CatalogIndex
+
+REQUETES = [
+    {},
+    {'bornes': {'prix': (200000, 600000)}},
+    {'bornes': {'surface': (30, None), 'prix_m2': (None, 11000)}},
+    {'egal': {'dpe': ['C', 'D']}},
+    {'bornes': {'charges_mensuelles': (50, 250)}, 'egal': {'arrondissement': [18, 19, 20]}},
+    {'bornes': {'surface': (25, None)}, 'tri': 'prix'},
+    {'tri': 'score_transport', 'croissant': False},
+]
+
+
+def reconstruit(catalogue) -> CatalogIndex:
+    index = CatalogIndex()
+    index.reconstruire(catalogue.values())
+    return index
+
+
+@pytest.fixture(scope='module')
+def catalogue_initial():
+    return generate_properties(300, graine=11)
+
+
+def test_requetes_identiques_a_un_filtrage_direct(catalogue_initial):
+    index = reconstruit({p.id: p for p in catalogue_initial})
+    attendu = [p.id for p in catalogue_initial if 200000 <= p.prix <= 600000 and p.dpe in ('C', 'D')]
+    assert index.requete({'prix': (200000, 600000)}, {'dpe': ['C', 'D']}).tolist() == attendu
+    assert index.compter({'prix': (200000, 600000)}, {'dpe': ['C', 'D']}) == len(attendu)
+    assert index.etendue('prix') == (min(p.prix for p in catalogue_initial), max(p.prix for p in catalogue_initial))
+    with pytest.raises(ValueError):
+        index.requete({'adresse': (0, 1)})
+
+
+def test_mises_a_jour_incrementales_identiques_a_une_reconstruction(catalogue_initial):
+    rnd = random.Random(3)
+    catalogue = {p.id: p for p in catalogue_initial[:150]}
+    reserve = list(catalogue_initial[150:])
+    index = reconstruit(catalogue)
+    for _ in range(25):
+        supprimes = rnd.sample(list(catalogue), 4)
+        for property_id in supprimes:
+            del catalogue[property_id]
+        assert index.supprimer(supprimes + ['inconnu']) == 4
+
+        # Nouveaux biens (emplacements libérés réutilisés) et biens modifiés
+        modifies = [catalogue[i].model_copy(update={'prix': rnd.uniform(1e5, 9e5), 'dpe': rnd.choice('ABCDEFG')})
+                    for i in rnd.sample(list(catalogue), 3)]
+        ajoutes = [reserve.pop() for _ in range(3)]
+        for bien in modifies + ajoutes:
+            catalogue[bien.id] = bien
+        index.upsert(modifies + ajoutes)
+
+        reference = reconstruit(catalogue)
+        assert len(index) == len(catalogue)
+        # Même résultat et même ordre (celui du catalogue) qu'après une reconstruction
+        assert index.requete().tolist() == list(catalogue)
+        for requete in REQUETES:
+            assert index.requete(**requete).tolist() == reference.requete(**requete).tolist(), requete
+            if 'tri' not in requete:
+                assert index.compter(**requete) == reference.compter(**requete)
+        for champ in ('prix', 'surface'):
+            assert index.etendue(champ) == reference.etendue(champ)
+        assert index.valeurs('dpe') == reference.valeurs('dpe')
+
+
+def test_agrandissement(catalogue_initial):
+    index = CatalogIndex(capacite=16)
+    index.upsert(catalogue_initial[:100])
+    assert index.capacite >= 100
+    assert index.requete(tri='prix').tolist() == reconstruit({p.id: p for p in catalogue_initial[:100]}).requete(
+        tri='prix').tolist()
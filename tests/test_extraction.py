@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from models.cache import DiskCache
+from models.extraction import ExtractionConfig, creer_client, extract_listings
+
+PROMPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data',
+                       'renseignement-prompt.yaml')
+REPONSE = {"error": "", "property": {"adresse": "1 rue Ordener, 75018 Paris"}}
+DELAI_SERVEUR = 0.2  # secondes demandées par l'en-tête Retry-After
+DUREE_REQUETE = 0.1
+
+
+class ServeurFactice(ThreadingHTTPServer):
+    """Serveur compatible OpenAI (chat.completions) qui note les requêtes reçues.
+
+    Une annonce contenant LIMITE reçoit d'abord une réponse 429 avec
+    Retry-After, une annonce contenant REFUS une erreur 400.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), GestionnaireFactice)
+        self.verrou = threading.Lock()
+        self.en_cours = 0
+        self.simultanees_max = 0
+        self.requetes = []  # (date, contenu du message utilisateur)
+
+
+class GestionnaireFactice(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _repondre(self, statut: int, corps: dict, entetes=()):
+        donnees = json.dumps(corps).encode()
+        self.send_response(statut)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(donnees)))
+        for nom, valeur in entetes:
+            self.send_header(nom, valeur)
+        self.end_headers()
+        self.wfile.write(donnees)
+
+    def do_POST(self):
+        serveur = self.server
+        requete = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        texte = requete['messages'][-1]['content']
+        with serveur.verrou:
+            deja_recue = any('LIMITE' in t for _, t in serveur.requetes) and 'LIMITE' in texte
+            serveur.requetes.append((time.monotonic(), texte))
+            serveur.en_cours += 1
+            serveur.simultanees_max = max(serveur.simultanees_max, serveur.en_cours)
+        try:
+            time.sleep(DUREE_REQUETE)
+        finally:
+            with serveur.verrou:
+                serveur.en_cours -= 1
+
+        if 'LIMITE' in texte and not deja_recue:
+            self._repondre(429, {"error": {"message": "Rate limit", "type": "rate_limit"}},
+                           [('Retry-After', str(DELAI_SERVEUR))])
+        elif 'REFUS' in texte:
+            self._repondre(400, {"error": {"message": "Annonce refusée", "type": "invalid_request_error"}})
+        else:
+            self._repondre(200, {
+                "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": requete['model'],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": json.dumps(REPONSE)}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            })
+
+
+@pytest.fixture
+def serveur(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'cle-de-test')
+    serveur = ServeurFactice()
+    fil = threading.Thread(target=serveur.serve_forever, daemon=True)
+    fil.start()
+    yield serveur
+    serveur.shutdown()
+    serveur.server_close()
+
+
+@pytest.fixture
+def configuration(serveur):
+    return ExtractionConfig(base_url=f"http://127.0.0.1:{serveur.server_port}/v1", concurrence=2,
+                            tentatives=3, delai_initial=0.01, delai_max=0.05, timeout=5)
+
+
+def requetes_contenant(serveur, marqueur: str):
+    return [date for date, texte in serveur.requetes if marqueur in texte]
+
+
+def test_extraction_concurrente_avec_reprises(serveur, configuration, tmp_path):
+    textes = [f"Annonce {i} : T2 de 40 m²" for i in range(5)] + ["Annonce LIMITE", "Annonce REFUS"]
+    cache = DiskCache(str(tmp_path / 'cache'))
+    progression = []
+    resultats = extract_listings(textes, config=configuration, prompts_path=PROMPTS, cache=cache,
+                                 progression=progression.append)
+
+    assert [r.indice for r in resultats] == list(range(len(textes)))
+    assert sorted(r.indice for r in progression) == list(range(len(textes)))
+    # Requêtes simultanées bornées par config.concurrence
+    assert serveur.simultanees_max == configuration.concurrence
+
+    for resultat in resultats[:5]:
+        assert resultat.succes and resultat.donnees == REPONSE
+        assert resultat.tentatives == 1 and resultat.tokens == 15 and not resultat.en_cache
+
+    # 429 : nouvelle tentative après le délai demandé par le serveur
+    limite = resultats[5]
+    assert limite.succes and limite.tentatives == 2
+    premiere, seconde = requetes_contenant(serveur, 'LIMITE')
+    assert seconde - premiere >= DELAI_SERVEUR
+
+    # 400 : erreur propre à l'annonce, sans nouvelle tentative ni interruption du lot
+    refus = resultats[6]
+    assert not refus.succes and refus.tentatives == 1
+    assert "400" in refus.erreur and refus.donnees is None
+    assert len(requetes_contenant(serveur, 'REFUS')) == 1
+
+
+def test_cache_disque_et_client_partage(serveur, configuration, tmp_path):
+    textes = ["Annonce A : studio", "Annonce B : T3", "Annonce REFUS"]
+    cache = DiskCache(str(tmp_path / 'cache'))
+    client = creer_client(configuration)
+
+    premier = extract_listings(textes, config=configuration, prompts_path=PROMPTS, cache=cache, client=client)
+    assert [r.succes for r in premier] == [True, True, False]
+    assert len(serveur.requetes) == 3
+
+    # Second passage avec le même client : les réponses valides viennent du cache, seul l'échec est rejoué
+    second = extract_listings(textes, config=configuration, prompts_path=PROMPTS, cache=cache, client=client)
+    assert [r.en_cache for r in second] == [True, True, False]
+    assert [r.contenu for r in second[:2]] == [r.contenu for r in premier[:2]]
+    assert len(serveur.requetes) == 4
+    assert not client.is_closed()
+
+    # Annonce identique aux espaces près : même clé de cache
+    troisieme = extract_listings(["  Annonce A :   studio "], config=configuration, prompts_path=PROMPTS,
+                                 cache=cache, client=client)
+    assert troisieme[0].en_cache
+    assert len(serveur.requetes) == 4
+
+    # Hors ligne : réponses servies par le cache, aucune requête
+    hors_ligne = ExtractionConfig(base_url=configuration.base_url, hors_ligne=True)
+    resultats = extract_listings(textes, config=hors_ligne, prompts_path=PROMPTS, cache=cache)
+    assert [r.succes for r in resultats] == [True, True, False]
+    assert len(serveur.requetes) == 4
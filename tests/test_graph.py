@@ -0,0 +1,113 @@
+from dataclasses import replace
+import numpy as np
+import pytest
+from models.graph import ComputationGraph, simulation_graph
+from models.loan import Pret, Tranche, RemboursementAnticipe
+from models.scenario import Scenario
+from models.simulation import cout_acquisition
+
+CENTIME = 0.01
+
+
+@pytest.fixture
+def entrees(config, biens):
+    return dict(
+        bien=biens[0], negociation=5.0, apport_total=200000, apport_immobilier=80000, horizon=20,
+        taux_credit=3.32, duree_credit=20, taux_assurance=0.34, montant_ptz=0, duree_ptz=15, differe_ptz=5,
+        annee_anticipe=0, montant_anticipe=0, evolution_immobilier=1.5, part_securisee=50.0,
+        rendement_epargne=3.0, rendement_investissement=7.0, inflation=2.0,
+        evolution_charges=config.evolution_charges,
+    )
+
+
+def scenario_equivalent(config, e) -> Scenario:
+    """Scenario construit directement à partir des mêmes entrées que le graphe."""
+    bien = e['bien']
+    cout_total = float(cout_acquisition(bien.prix, bien.prix_hors_honoraires, bien.frais_agence_acquereur,
+                                        e['negociation']))
+    immobilier = e['apport_immobilier'] / e['apport_total'] * 100
+    config = replace(
+        config, apport_total=e['apport_total'], repartition_immobilier=immobilier,
+        repartition_epargne=(100 - immobilier) * e['part_securisee'] / 100,
+        repartition_investissement=(100 - immobilier) * (1 - e['part_securisee'] / 100),
+        taux_credit=e['taux_credit'], duree_credit=e['duree_credit'], taux_assurance=e['taux_assurance'],
+        rendement_epargne=e['rendement_epargne'], rendement_investissement=e['rendement_investissement'],
+        evolution_immobilier=e['evolution_immobilier'], horizon_simulation=e['horizon'], inflation=e['inflation'],
+        evolution_charges=e['evolution_charges'],
+    )
+    montant_pret = cout_total - e['apport_immobilier']
+    tranches = [Tranche(montant_pret - e['montant_ptz'], e['taux_credit'], e['duree_credit'], e['taux_assurance'])]
+    if e['montant_ptz']:
+        tranches.append(Tranche(e['montant_ptz'], 0.0, e['duree_ptz'], e['taux_assurance'],
+                                differe=e['differe_ptz'] * 12, nom="PTZ"))
+    remboursements = ()
+    if e['annee_anticipe'] and e['montant_anticipe']:
+        remboursements = (RemboursementAnticipe(mois=e['annee_anticipe'] * 12, montant=e['montant_anticipe']),)
+    return Scenario(bien, config, cout_total=cout_total, pret=Pret(tuple(tranches), remboursements))
+
+
+def verifier(graphe, config, e):
+    scenario = scenario_equivalent(config, e)
+    assert graphe['cout_total'] == pytest.approx(scenario.cout_total)
+    for nom, serie in scenario.simulate_patrimoine().items():
+        np.testing.assert_allclose(graphe['patrimoine'][nom], serie, rtol=0, atol=CENTIME, err_msg=nom)
+    for nom, serie in scenario.simulate_charges().items():
+        np.testing.assert_allclose(graphe['charges'][nom], serie, rtol=0, atol=CENTIME, err_msg=nom)
+    assert graphe['mensualite'] + graphe['assurance_mensuelle'] == pytest.approx(
+        scenario.calculate_monthly_payment(), abs=CENTIME)
+
+
+@pytest.mark.parametrize('modifications', [
+    {},
+    {'montant_ptz': 40000, 'differe_ptz': 5},
+    {'annee_anticipe': 8, 'montant_anticipe': 30000},
+    {'duree_credit': 10, 'horizon': 25},
+])
+def test_graphe_identique_a_simulate_patrimoine(config, entrees, modifications):
+    entrees.update(modifications)
+    graphe = simulation_graph()
+    graphe.definir(**entrees)
+    verifier(graphe, config, entrees)
+
+
+def test_recalcul_limite_aux_dependants(config, entrees):
+    graphe = simulation_graph()
+    graphe.definir(**entrees)
+    verifier(graphe, config, entrees)
+    recalculs = dict(graphe.recalculs)
+
+    # La répartition de l'épargne ne touche ni au prêt ni à son amortissement
+    entrees['part_securisee'] = 80.0
+    graphe.definir(part_securisee=80.0)
+    verifier(graphe, config, entrees)
+    for nom in ('pret', 'echeancier', 'amortissement', 'serie_valeur_bien', 'charges'):
+        assert graphe.recalculs[nom] == recalculs[nom], nom
+    assert graphe.recalculs['serie_epargne'] == recalculs['serie_epargne'] + 1
+
+    # La négociation ne touche pas aux séries d'épargne
+    recalculs = dict(graphe.recalculs)
+    entrees['negociation'] = 8.0
+    graphe.definir(negociation=8.0)
+    verifier(graphe, config, entrees)
+    assert graphe.recalculs['serie_epargne'] == recalculs['serie_epargne']
+    assert graphe.recalculs['amortissement'] == recalculs['amortissement'] + 1
+
+    # Une entrée redéfinie à l'identique ne recalcule rien
+    graphe['resultats']
+    recalculs = dict(graphe.recalculs)
+    graphe.definir(**entrees)
+    graphe['resultats']
+    assert graphe.recalculs == recalculs
+
+
+def test_graphe_refuse_les_noeuds_invalides():
+    graphe = ComputationGraph(['a'])
+    graphe.noeud('b', lambda a: a + 1, 'a')
+    with pytest.raises(ValueError):
+        graphe.noeud('b', lambda a: a, 'a')
+    with pytest.raises(ValueError):
+        graphe.noeud('c', lambda d: d, 'd')
+    with pytest.raises(KeyError):
+        graphe['b']
+    graphe.definir(a=1)
+    assert graphe['b'] == 2
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from models.loan import Pret, Tranche, RemboursementAnticipe, mensualite_constante, penalite_remboursement
+
+CENTIME = 0.01
+
+
+def capital_mois_par_mois(montant, taux, duree, nb_mois, differe=0, remboursements=()):
+    """Capital restant dû d'une tranche, calculé échéance par échéance.
+
+    remboursements est une liste de (mois, montant, reduire_duree).
+    """
+    taux_mensuel = taux / 12 / 100
+    fin = differe + duree * 12
+    capital = [montant]
+    mensualite = mensualite_constante(montant, taux, duree * 12) if differe == 0 else 0.0
+    for mois in range(1, nb_mois + 1):
+        if mois - 1 == differe and differe > 0:
+            mensualite = mensualite_constante(capital[-1], taux, duree * 12)
+        echeance = mensualite if mois > differe else 0.0
+        restant = max(0.0, capital[-1] * (1 + taux_mensuel) - echeance)
+        for mois_remboursement, montant_rembourse, reduire_duree in remboursements:
+            if mois_remboursement == mois:
+                restant -= min(montant_rembourse, restant)
+                if not reduire_duree and fin > mois:
+                    mensualite = mensualite_constante(restant, taux, fin - mois)
+        capital.append(restant)
+    return np.array(capital)
+
+
+def test_pret_simple():
+    pret = Pret.simple(200000, 3.5, 20, taux_assurance=0.3)
+    echeancier = pret.echeancier()
+    assert echeancier.capital_restant.shape == (1, 241)
+    np.testing.assert_allclose(echeancier.capital_restant[0], capital_mois_par_mois(200000, 3.5, 20, 240),
+                               rtol=0, atol=CENTIME)
+    assert echeancier.capital_restant[0, -1] == 0
+    np.testing.assert_allclose(echeancier.mensualite[1:], mensualite_constante(200000, 3.5, 240))
+    np.testing.assert_allclose(echeancier.total('assurance')[1:], 200000 * 0.3 / 100 / 12)
+    assert echeancier.principal[0, 1:].sum() == pytest.approx(200000, abs=CENTIME)
+
+
+def test_ptz_differe_sans_interets():
+    pret = Pret(tranches=(Tranche(200000, 3.5, 20),
+                          Tranche(60000, 0.0, 10, differe=5 * 12, nom="PTZ")))
+    echeancier = pret.echeancier()
+    assert pret.duree_mois == 20 * 12
+    assert echeancier.noms == ("Prêt principal", "PTZ")
+    ptz = 1
+    # Pendant le différé : ni intérêts ni principal, capital inchangé
+    assert np.all(echeancier.capital_restant[ptz, :61] == 60000)
+    assert np.all(echeancier.principal[ptz, 1:61] == 0)
+    assert np.all(echeancier.interets[ptz] == 0)
+    # Puis amortissement linéaire sur dix ans
+    np.testing.assert_allclose(echeancier.principal[ptz, 61:181], 60000 / 120, rtol=0, atol=CENTIME)
+    assert np.all(echeancier.capital_restant[ptz, 180:] == 0)
+    assert np.all(echeancier.total('assurance')[181:] == 0)
+    # Le prêt principal est amorti indépendamment
+    np.testing.assert_allclose(echeancier.capital_restant[0], capital_mois_par_mois(200000, 3.5, 20, 240),
+                               rtol=0, atol=CENTIME)
+    np.testing.assert_allclose(echeancier.mensualite[61:181], mensualite_constante(200000, 3.5, 240) + 500,
+                               rtol=0, atol=CENTIME)
+
+
+def test_differe_avec_interets_capitalises():
+    pret = Pret(tranches=(Tranche(50000, 2.0, 10, differe=24),))
+    echeancier = pret.echeancier()
+    attendu = capital_mois_par_mois(50000, 2.0, 10, 24 + 120, differe=24)
+    np.testing.assert_allclose(echeancier.capital_restant[0], attendu, rtol=0, atol=CENTIME)
+    # Intérêts capitalisés : principal négatif pendant le différé
+    assert np.all(echeancier.principal[0, 1:25] < 0)
+    assert echeancier.capital_restant[0, 24] == pytest.approx(50000 * (1 + 2.0 / 1200) ** 24)
+    assert echeancier.mensualite[25] == pytest.approx(mensualite_constante(attendu[24], 2.0, 120))
+
+
+@pytest.mark.parametrize('reduire_duree', [True, False])
+def test_remboursement_anticipe_et_penalite(reduire_duree):
+    remboursement = RemboursementAnticipe(mois=36, montant=40000, reduire_duree=reduire_duree)
+    pret = Pret(tranches=(Tranche(250000, 3.0, 20),), remboursements=(remboursement,))
+    echeancier = pret.echeancier()
+
+    attendu = capital_mois_par_mois(250000, 3.0, 20, 240, remboursements=[(36, 40000, reduire_duree)])
+    np.testing.assert_allclose(echeancier.capital_restant[0], attendu, rtol=0, atol=CENTIME)
+    assert echeancier.remboursements_anticipes[0, 36] == 40000
+    # Indemnité plafonnée : min(3 % du capital remboursé, six mois d'intérêts)
+    assert echeancier.penalites[0, 36] == pytest.approx(min(0.03 * 40000, 40000 * 3.0 / 1200 * 6))
+    assert echeancier.penalites.sum() == echeancier.penalites[0, 36]
+    assert echeancier.cout_credit == pytest.approx(echeancier.interets.sum() + echeancier.penalites[0, 36])
+
+    mensualite_initiale = mensualite_constante(250000, 3.0, 240)
+    if reduire_duree:
+        # Même mensualité, prêt soldé plus tôt
+        assert echeancier.mensualite[37] == pytest.approx(mensualite_initiale)
+        assert echeancier.capital_restant[0, 220] == 0
+    else:
+        # Mensualité recalculée, prêt soldé à la date prévue
+        assert echeancier.mensualite[37] < mensualite_initiale
+        assert echeancier.capital_restant[0, 239] > 0
+        assert echeancier.capital_restant[0, 240] == 0
+
+
+def test_remboursement_superieur_au_capital():
+    pret = Pret(tranches=(Tranche(20000, 4.0, 5, taux_assurance=0.3),),
+               remboursements=(RemboursementAnticipe(mois=12, montant=1e6),))
+    echeancier = pret.echeancier()
+    assert np.all(echeancier.capital_restant[0, 12:] == 0)
+    rembourse = echeancier.remboursements_anticipes[0, 12]
+    assert rembourse == pytest.approx(capital_mois_par_mois(20000, 4.0, 5, 11)[-1] * (1 + 4.0 / 1200)
+                                      - mensualite_constante(20000, 4.0, 60))
+    assert echeancier.penalites[0, 12] == pytest.approx(float(penalite_remboursement(rembourse, 4.0)))
+    assert echeancier.total('assurance')[12] > 0
+    assert np.all(echeancier.total('assurance')[13:] == 0)
@@ -0,0 +1,58 @@
+import pytest
+from models.property import IdAllocator, Property
+
+
+def entree(**prix) -> dict:
+    return {
+        'adresse': '12 rue Ordener, 75018 Paris',
+        'bien': {'surface': 45, 'etage': '3/6', 'dpe': 'D'},
+        'prix': {'annonce': 320000, 'hors_honoraires': 305000, 'm2': 7111, **prix},
+        'charges': {'mensuelles': 180, 'taxe_fonciere': 900, 'energie': None},
+    }
+
+
+def test_validate_bulk_accepte_les_champs_nuls():
+    complet = entree(frais_agence_acquereur=True)
+    nuls = entree(frais_agence_acquereur=None)
+    nuls['bien']['etage'] = None
+    rapport = Property.validate_bulk({'paris18-001': complet, 'paris18-002': nuls})
+
+    assert rapport.erreurs == []
+    assert rapport.properties['paris18-001'].etage == '3/6'
+    assert rapport.properties['paris18-001'].frais_agence_acquereur
+    assert rapport.properties['paris18-002'].etage == '0'
+    assert not rapport.properties['paris18-002'].frais_agence_acquereur
+    assert rapport.properties['paris18-002'].energie is None
+    # Même résultat par le chargement bien par bien
+    assert Property.from_json_data('paris18-002', nuls) == rapport.properties['paris18-002']
+
+
+def test_validate_bulk_signale_les_biens_invalides():
+    invalide = entree()
+    invalide['prix']['annonce'] = 'sur demande'
+    rapport = Property.validate_bulk({'paris18-001': entree(), 'paris18-002': invalide})
+
+    assert list(rapport.properties) == ['paris18-001']
+    assert [(e.id, e.champ) for e in rapport.erreurs] == [('paris18-002', 'prix')]
+
+
+@pytest.mark.parametrize('adresse, attendu', [
+    ("23 ter rue du Télégraphe, 75020 Paris", 'paris20'),
+    ("118 Avenue Gabriel Peri, 93400 Saint-Ouen-Sur-Seine", 'saint-ouen-sur-seine'),
+    ("118 Avenue Gabriel Peri 93400 Saint-Ouen France", 'saint-ouen'),
+    ("118 Avenue Gabriel Peri, 93400 Saint-Ouen, France", 'saint-ouen'),
+    ("5 rue du Pont, 94100 Saint-Maur-des-Fossés Cedex 2", 'saint-maur-des-fossés'),
+    ("5 avenue Victor Hugo, 92100 Boulogne Billancourt", 'boulogne-billancourt'),
+    ("3 rue de Paris, Montreuil, 93100", 'montreuil'),
+])
+def test_ville_id(adresse, attendu):
+    assert Property.ville_id(adresse) == attendu
+
+
+def test_ville_id_rattachee_aux_prefixes_existants():
+    ids = ['paris20-001', 'saint-ouen-001', 'paris18-001', 'paris18-002']
+    adresse = "118 Avenue Gabriel Peri, 93400 Saint-Ouen-Sur-Seine"
+    assert Property.generate_id(adresse, ids) == 'saint-ouen-002'
+    assert IdAllocator(ids).allocate(adresse) == 'saint-ouen-002'
+    # Un préfixe qui n'est pas un mot entier du nom n'est pas retenu
+    assert Property.generate_id("3 rue de Paris, 93100 Montreuil", ['mont-001']) == 'montreuil-001'
@@ -0,0 +1,128 @@
+import json
+import os
+import pytest
+from models.repository import JsonPropertyRepository
+
+
+def entree(adresse: str, prix: float = 250000) -> dict:
+    return {'adresse': adresse, 'prix': {'annonce': prix}}
+
+
+@pytest.fixture
+def chemin(tmp_path):
+    path = tmp_path / 'properties.json'
+    path.write_text(json.dumps({'properties': {
+        'paris18-001': entree('1 rue Ordener, 75018 Paris'),
+        'paris19-001': entree('2 rue de Crimée, 75019 Paris'),
+    }}))
+    return str(path)
+
+
+def instantane(chemin: str) -> dict:
+    with open(chemin) as f:
+        return json.load(f)['properties']
+
+
+def test_journal_rejoue_au_chargement(chemin):
+    repository = JsonPropertyRepository(chemin)
+    repository.upsert('paris18-001', entree('1 rue Ordener, 75018 Paris', 240000))
+    ids = repository.insert_many([entree('3 rue Championnet, 75018 Paris')])
+    assert repository.delete('paris19-001')
+    assert not repository.delete('paris19-001')
+
+    # Les écritures vont au journal, l'instantané n'est pas réécrit
+    assert list(instantane(chemin)) == ['paris18-001', 'paris19-001']
+    assert os.path.getsize(f"{chemin}.journal") > 0
+
+    attendu = {'paris18-001': entree('1 rue Ordener, 75018 Paris', 240000),
+               'paris18-002': entree('3 rue Championnet, 75018 Paris')}
+    assert ids == ['paris18-002']
+    assert repository.entries() == attendu
+    # Une autre instance (autre processus) rejoue le journal
+    relu = JsonPropertyRepository(chemin)
+    assert relu.entries() == attendu
+    assert relu.operations_ignorees == []
+
+
+def test_ligne_interrompue_tronquee(chemin):
+    repository = JsonPropertyRepository(chemin)
+    repository.upsert('paris20-001', entree('4 rue des Pyrénées, 75020 Paris'))
+    taille = os.path.getsize(f"{chemin}.journal")
+    with open(f"{chemin}.journal", 'a') as f:
+        f.write('{"op": "upsert", "id": "paris20-002", "data": {"adr')
+
+    relu = JsonPropertyRepository(chemin)
+    assert 'paris20-002' not in relu.entries()
+    assert 'paris20-001' in relu.entries()
+    assert os.path.getsize(f"{chemin}.journal") == taille
+    # Les ajouts suivants repartent d'une ligne complète
+    relu.upsert('paris20-002', entree('5 rue des Pyrénées, 75020 Paris'))
+    assert JsonPropertyRepository(chemin).entries() == relu.entries()
+
+
+def test_operation_invalide_ignoree(chemin):
+    with open(f"{chemin}.journal", 'w') as f:
+        f.write('{"id": "paris18-001"}\n')
+        f.write('[1, 2]\n')
+        f.write('{"op": "delete", "id": "paris19-001"}\n')
+    repository = JsonPropertyRepository(chemin)
+    assert list(repository.entries()) == ['paris18-001']
+    assert repository.operations_ignorees == ["ligne 1 : opération invalide ignorée",
+                                              "ligne 2 : opération invalide ignorée"]
+
+
+def test_get_renvoie_une_copie(chemin):
+    repository = JsonPropertyRepository(chemin)
+    bien = repository.get('paris18-001')
+    bien['prix']['annonce'] = 1
+    assert repository.get('paris18-001')['prix']['annonce'] == 250000
+    assert repository.get('inconnu') is None
+
+
+def test_entries_renvoie_une_copie(chemin):
+    repository = JsonPropertyRepository(chemin)
+    entrees = repository.entries()
+    entrees['paris18-001']['prix']['annonce'] = 1
+    entrees.pop('paris19-001')
+    assert repository.entries() == {'paris18-001': entree('1 rue Ordener, 75018 Paris'),
+                                    'paris19-001': entree('2 rue de Crimée, 75019 Paris')}
+
+
+def test_identifiant_supprime_non_reattribue(chemin):
+    repository = JsonPropertyRepository(chemin)
+    assert repository.insert_many([entree('3 rue Championnet, 75018 Paris')]) == ['paris18-002']
+    assert repository.delete('paris18-002')
+    assert repository.insert_many([entree('4 rue Championnet, 75018 Paris')]) == ['paris18-003']
+    # Le compteur survit au rejeu du journal puis à la compaction
+    repository.delete('paris18-003')
+    assert JsonPropertyRepository(chemin).insert_many([entree('5 rue Championnet, 75018 Paris')]) == ['paris18-004']
+    repository.delete('paris18-004')
+    repository.compact()
+    assert 'paris18-004' not in instantane(chemin)
+    assert JsonPropertyRepository(chemin).insert_many([entree('6 rue Championnet, 75018 Paris')]) == ['paris18-005']
+
+
+def test_compaction(chemin):
+    repository = JsonPropertyRepository(chemin, compaction_octets=500)
+    for numero in range(10):
+        repository.upsert(f"paris11-{numero:03d}", entree(f"{numero} rue de Charonne, 75011 Paris"))
+    # Le journal a dépassé le seuil au moins une fois : il a été intégré à l'instantané
+    assert os.path.getsize(f"{chemin}.journal") <= 500
+    attendu = repository.entries()
+    assert len(attendu) == 12
+    repository.compact()
+    assert os.path.getsize(f"{chemin}.journal") == 0
+    assert instantane(chemin) == attendu
+    assert JsonPropertyRepository(chemin).entries() == attendu
+
+
+def test_compaction_interrompue(chemin):
+    repository = JsonPropertyRepository(chemin)
+    repository.upsert('paris18-001', entree('1 rue Ordener, 75018 Paris', 230000))
+    repository.delete('paris19-001')
+    attendu = repository.entries()
+    # Instantané écrit mais journal non vidé : le rejouer est sans effet
+    with open(chemin, 'w') as f:
+        json.dump({'properties': attendu}, f)
+    assert os.path.getsize(f"{chemin}.journal") > 0
+    assert JsonPropertyRepository(chemin).entries() == attendu
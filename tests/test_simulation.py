@@ -0,0 +1,133 @@
+from dataclasses import replace
+import numpy as np
+import pytest
+from models.loan import Pret
+from models.scenario import Scenario
+from models.simulation import simulate_series, simulate_batch, indexation_annuelle, SERIES
+
+CENTIME = 0.01
+
+
+def simulation_mois_par_mois(cout_total, montant_pret, mensualite, epargne, investissement, taux_credit,
+                             evolution_immobilier, rendement_epargne, rendement_investissement, nb_mois):
+    """Boucle mois par mois de référence (version d'origine de Scenario.simulate_patrimoine).
+
+    mensualite est l'échéance hors assurance, seule à amortir le capital.
+    """
+    valeur_bien = [cout_total]
+    capital_restant = [montant_pret]
+    investissement_evolution = [investissement]
+    # Épargne du mois m : m - 1 mois de capitalisation, livrets plafonnés
+    livret_a = min(epargne, 23000)
+    ldd = min(epargne - livret_a, 12000)
+    compte_terme = epargne - livret_a - ldd
+    epargne_evolution = [epargne]
+    for mois in range(1, nb_mois + 1):
+        valeur_bien.append(valeur_bien[-1] * (1 + evolution_immobilier / 12 / 100))
+        interet = capital_restant[-1] * taux_credit / 12 / 100
+        capital_restant.append(max(0, capital_restant[-1] - (mensualite - interet)))
+        investissement_evolution.append(investissement_evolution[-1] * (1 + rendement_investissement / 12 / 100))
+        if mois == 1:
+            epargne_evolution.append(epargne)
+            continue
+        livret_a = min(livret_a * (1 + rendement_epargne / 12 / 100), 23000)
+        ldd = min(ldd * (1 + rendement_epargne / 12 / 100), 12000)
+        if compte_terme > 0:
+            compte_terme *= 1 + (rendement_epargne - 2) / 12 / 100
+        epargne_evolution.append(livret_a + ldd + compte_terme)
+
+    series = {
+        'valeur_bien': np.array(valeur_bien),
+        'capital_restant': np.array(capital_restant),
+        'epargne': np.array(epargne_evolution),
+        'investissement': np.array(investissement_evolution),
+    }
+    series['patrimoine_total'] = (series['valeur_bien'] - series['capital_restant']
+                                  + series['epargne'] + series['investissement'])
+    return series
+
+
+def echeance(montant_pret, taux_credit, duree_credit):
+    """Mensualité hors assurance, formule d'origine."""
+    taux_mensuel = taux_credit / 12 / 100
+    nombre_mois = duree_credit * 12
+    if taux_mensuel == 0:
+        return montant_pret / nombre_mois
+    return montant_pret * (taux_mensuel * (1 + taux_mensuel) ** nombre_mois) / ((1 + taux_mensuel) ** nombre_mois - 1)
+
+
+@pytest.mark.parametrize('montant_pret, taux_credit, duree_credit, epargne, nb_mois', [
+    (250000, 3.32, 20, 40000, 240),
+    (180000, 4.1, 10, 15000, 300),   # prêt soldé avant l'horizon
+    (120000, 0.0, 15, 60000, 240),   # taux nul
+    (0, 3.0, 20, 10000, 120),        # achat sans emprunt
+])
+def test_simulate_series_identique_a_la_boucle(montant_pret, taux_credit, duree_credit, epargne, nb_mois):
+    parametres = dict(cout_total=300000, montant_pret=montant_pret,
+                      mensualite=echeance(montant_pret, taux_credit, duree_credit),
+                      epargne=epargne, investissement=25000, taux_credit=taux_credit,
+                      evolution_immobilier=1.5, rendement_epargne=3.0, rendement_investissement=7.0,
+                      nb_mois=nb_mois)
+    attendu = simulation_mois_par_mois(**parametres)
+    series = simulate_series(**parametres)
+    for nom in SERIES:
+        assert series[nom].shape == (nb_mois + 1,)
+        np.testing.assert_allclose(series[nom], attendu[nom], rtol=0, atol=CENTIME, err_msg=nom)
+
+
+def test_simulate_series_vectorisee_identique_scenario_par_scenario():
+    taux = np.array([2.5, 3.32, 4.5])
+    montants = np.array([150000.0, 250000.0, 320000.0])
+    mensualites = np.array([echeance(m, t, 20) for m, t in zip(montants, taux)])
+    series = simulate_series(cout_total=montants + 50000, montant_pret=montants, mensualite=mensualites,
+                             epargne=30000, investissement=20000, taux_credit=taux, evolution_immobilier=1.0,
+                             rendement_epargne=3.0, rendement_investissement=7.0, nb_mois=180)
+    for k in range(len(taux)):
+        attendu = simulation_mois_par_mois(montants[k] + 50000, montants[k], mensualites[k], 30000, 20000,
+                                           taux[k], 1.0, 3.0, 7.0, 180)
+        for nom in SERIES:
+            np.testing.assert_allclose(series[nom][k], attendu[nom], rtol=0, atol=CENTIME, err_msg=nom)
+
+
+def test_simulate_batch_identique_a_la_boucle(config, biens):
+    resultat = simulate_batch(biens, config, taux_credit=[2.8, 4.0], duree_credit=[15, 25],
+                              apport_immobilier=[50000, 120000])
+    nb_mois = config.horizon_simulation * 12
+    parametres = resultat.parametres
+    assert resultat.series.shape == (len(biens) * 8, nb_mois + 1, len(SERIES))
+    for k in range(len(parametres['bien'])):
+        montant_pret = max(parametres['montant_pret'][k], 0)
+        attendu = simulation_mois_par_mois(
+            parametres['cout_total'][k], montant_pret,
+            echeance(montant_pret, parametres['taux_credit'][k], parametres['duree_credit'][k]),
+            parametres['epargne'][k], parametres['investissement'][k], parametres['taux_credit'][k],
+            parametres['evolution_immobilier'][k], config.rendement_epargne, config.rendement_investissement,
+            nb_mois
+        )
+        for nom in SERIES:
+            np.testing.assert_allclose(resultat.serie(nom)[k], attendu[nom], rtol=0, atol=CENTIME,
+                                       err_msg=f"{parametres['bien'][k]} {nom}")
+
+
+def test_simulate_batch_identique_a_simulate_patrimoine(config, biens):
+    resultat = simulate_batch(biens, config)
+    for k, bien in enumerate(biens):
+        scenario = Scenario(bien, config, cout_total=resultat.parametres['cout_total'][k])
+        for nom, serie in scenario.simulate_patrimoine().items():
+            if nom in SERIES:
+                np.testing.assert_allclose(resultat.serie(nom)[k], serie, rtol=0, atol=CENTIME, err_msg=nom)
+
+
+def test_flux_assurance_du_lot_identiques_a_l_echeancier(config, biens):
+    # Prêt soldé avant l'horizon : plus d'assurance une fois le capital remboursé
+    config = replace(config, horizon_simulation=25, taux_assurance=0.34)
+    resultat = simulate_batch(biens, config, duree_credit=[10, 15], apport_immobilier=60000, flux=True)
+    nb_mois = config.horizon_simulation * 12
+    indexation = indexation_annuelle(config.evolution_charges.get('assurance', 0), nb_mois)
+    for k in range(len(resultat.parametres['bien'])):
+        pret = Pret.simple(resultat.parametres['montant_pret'][k], config.taux_credit,
+                           int(resultat.parametres['duree_credit'][k]), config.taux_assurance)
+        attendu = pret.echeancier(nb_mois).total('assurance') * indexation
+        attendu[0] = 0
+        np.testing.assert_allclose(resultat.serie('charges_assurance')[k], attendu, rtol=0, atol=CENTIME)
+        assert resultat.serie('charges_assurance')[k, -1] == 0
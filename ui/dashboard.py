@@ -2,12 +2,13 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 from pathlib import Path
 import sys
-import yaml
 import json
 import os
-from openai import OpenAI
+import copy
+import functools
 from dotenv import load_dotenv
 import re
 
@@ -21,59 +22,374 @@ if not os.getenv("OPENAI_API_KEY"):
     raise ValueError("La clé API OpenAI n'est pas définie dans le fichier .env")
 
 from models.property import Property
-from models.scenario import Scenario, ScenarioConfig
+from models.scenario import Scenario, ScenarioConfig, load_scenarios
+from models.monte_carlo import MonteCarloConfig
+from models.repository import open_repository
+from models.optimizer import optimize_allocation
+from models.sensitivity import sensitivity_analysis
+from models.comparison import comparison_table, AXES_RADAR
+from models.catalog import CatalogIndex
+from models.graph import simulation_graph
+from models.stations import StationIndex, STATIONS_FILE, RAYON_LIGNE_MAX
+from models.simulation import scenario_matrix, simulate_batch
+from models.downsampling import lttb, fenetre
+from models.extraction import extract_listings, creer_client, CACHE_DIR
+from models.cache import DiskCache
+from models.profiling import Trace, activer, desactiver, instrumenter, section, trace_active
 
-# Constantes pour les plafonds des livrets
-LIVRET_A_PLAFOND = 23000
-LDD_PLAFOND = 12000
+# Fichiers de données (PROPERTIES_STORE peut désigner une base SQLite .db)
+PROPERTIES_FILE = os.getenv("PROPERTIES_STORE", 'data/properties.json')
+SCENARIOS_FILE = 'data/scenarios.yaml'
+
+def signature_fichier(path: str):
+    """Signature (date de modification, taille) d'un fichier, utilisée comme clé de cache."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+@st.cache_resource(show_spinner=False)
+def get_repository(path: str):
+    """Stockage des biens (JSON ou SQLite selon l'extension), partagé entre les sessions."""
+    return open_repository(path)
+
+@st.cache_resource(show_spinner=False)
+def get_llm_cache():
+    """Cache disque des réponses de l'API (30 jours, 100 Mo), partagé entre les sessions."""
+    return DiskCache(CACHE_DIR, max_octets=100 * 2**20, max_age=30 * 24 * 3600)
+
+@st.cache_resource(show_spinner=False)
+def get_llm_client():
+    """Client de l'API créé une fois par processus : ses connexions servent à tous les appels."""
+    return creer_client()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _load_properties_cached(path: str, signature):
+    """Charge les biens une seule fois par version du fichier."""
+    return get_repository(path).load_properties()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _load_config_cached(path: str, signature):
+    """Charge la configuration une seule fois par version du fichier."""
+    return ScenarioConfig.from_yaml(path), MonteCarloConfig.from_yaml(path)
+
+def invalidate_data_cache():
+    """Vide le cache des données après une écriture."""
+    _load_properties_cached.clear()
+    _load_config_cached.clear()
 
 def load_data():
     """Charge les données des biens et la configuration."""
-    properties = Property.load_properties('data/properties.json')
-    config = ScenarioConfig.from_yaml('data/scenarios.yaml')
-    return properties, config
+    # Le cache est invalidé automatiquement dès que le fichier change sur disque
+    properties = _load_properties_cached(PROPERTIES_FILE, get_repository(PROPERTIES_FILE).signature())
+    config, _ = _load_config_cached(SCENARIOS_FILE, signature_fichier(SCENARIOS_FILE))
+    # Copies : la configuration est modifiée sur place par scenario_simulation
+    return dict(properties), copy.deepcopy(config)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_catalog_index(path: str, signature_stations):
+    """Index des biens pour la barre de filtres, partagé entre les sessions et tenu à jour à chaque écriture."""
+    return CatalogIndex(StationIndex.from_csv(STATIONS_FILE))
+
+def catalog_index(properties):
+    """Index du catalogue, reconstruit seulement si le stockage a été modifié hors du tableau de bord."""
+    index = get_catalog_index(PROPERTIES_FILE, signature_fichier(STATIONS_FILE))
+    index.synchroniser(get_repository(PROPERTIES_FILE).signature(), properties.values())
+    return index
+
+def indexer_ecriture(avant, upserts=None, suppressions=()):
+    """Répercute une écriture du stockage (entrées JSON par identifiant, suppressions) sur l'index du catalogue."""
+    try:
+        biens = [Property.from_json_data(prop_id, data) for prop_id, data in (upserts or {}).items()]
+    except ValueError:
+        return  # bien invalide : l'index sera reconstruit à partir du catalogue rechargé
+    get_catalog_index(PROPERTIES_FILE, signature_fichier(STATIONS_FILE)).appliquer(
+        avant, get_repository(PROPERTIES_FILE).signature(), biens, suppressions)
+
+def load_monte_carlo_config():
+    """Charge les paramètres du mode stochastique (copie modifiable)."""
+    _, mc_config = _load_config_cached(SCENARIOS_FILE, signature_fichier(SCENARIOS_FILE))
+    return copy.deepcopy(mc_config)
+
+HISTORIQUE_TRACES = 10  # dernières exécutions mesurées conservées par session
+
+def execution_mesuree(nom: str):
+    """Mesure une exécution (script complet ou fragment réexécuté seul) si l'instrumentation est activée.
 
-def property_comparison(properties):
-    """Affiche la comparaison des biens."""
+    Dans une exécution déjà mesurée, la fonction apparaît comme une section
+    de la trace en cours ; sinon sa trace rejoint l'historique de la session.
+    """
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def executer(*args, **kwargs):
+            if trace_active() is not None or not st.session_state.get('performance_actif'):
+                with section(nom):
+                    return fonction(*args, **kwargs)
+            activer(Trace(nom, memoire=st.session_state.get('performance_memoire', False)))
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                historique = st.session_state.setdefault('performance_traces', [])
+                historique.append(desactiver())
+                del historique[:-HISTORIQUE_TRACES]
+        return executer
+    return decorateur
+
+# Colonnes du tableau comparatif (libellé, format)
+COLONNES_COMPARAISON = {
+    'id': ("ID", None),
+    'adresse': ("Adresse", None),
+    'surface': ("Surface (m²)", "{:.1f}"),
+    'prix': ("Prix (€)", "{:,.0f}"),
+    'prix_m2': ("Prix/m² (€)", "{:,.0f}"),
+    'cout_mensuel': ("Coût mensuel total (€)", "{:,.0f}"),
+    'charges_mensuelles': ("Charges (€)", "{:,.0f}"),
+    'taxe_fonciere': ("Taxe Foncière (€)", "{:,.0f}"),
+    'dpe': ("DPE", None),
+    'score_transport': ("Score Transport", "{:.1f}"),
+    'score_dpe': ("Score DPE", "{:.0f}"),
+}
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _comparison_table_cached(path: str, signature, config_cle, signature_stations, _properties, _config):
+    """Indicateurs de comparaison calculés une seule fois par version du catalogue, de la configuration et des stations."""
+    return comparison_table(_properties.values(), _config, stations=StationIndex.from_csv(STATIONS_FILE))
+
+@st.fragment
+@execution_mesuree("Comparaison")
+def property_comparison():
+    """Affiche la comparaison des biens (filtres, tri et pagination sur la vue en colonnes).
+
+    Fragment : ses filtres ne réexécutent que la comparaison.
+    """
+    properties, config = load_data()
     st.header("Comparaison des Biens")
+    table = _comparison_table_cached(PROPERTIES_FILE, get_repository(PROPERTIES_FILE).signature(),
+                                     config.cle(), signature_fichier(STATIONS_FILE), properties, config)
+    if not len(table):
+        st.info("Aucun bien à comparer")
+        return
     
-    # Création du DataFrame pour la comparaison
-    data = []
-    for p in properties.values():
-        data.append({
-            'ID': p.id,
-            'Adresse': p.adresse,
-            'Surface': p.surface,
-            'Prix': p.prix,
-            'Prix/m²': p.prix_m2,
-            'Charges': p.charges_mensuelles,
-            'Taxe Foncière': p.taxe_fonciere if p.taxe_fonciere else 0,
-            'DPE': p.dpe,
-            'Score Transport': p.score_transport()
-        })
+    # Filtres
+    col_prix, col_surface, col_dpe, col_recherche = st.columns(4)
+    prix = table.colonnes['prix']
+    with col_prix:
+        prix_min, prix_max = st.slider("Prix (€)", int(prix.min()), int(prix.max()) + 1,
+                                       (int(prix.min()), int(prix.max()) + 1), step=5000, key="comparaison_prix")
+    with col_surface:
+        surface_min = st.number_input("Surface minimale (m²)", 0, 1000, 0, key="comparaison_surface")
+    with col_dpe:
+        classes_dpe = st.multiselect("DPE", sorted(set(table.colonnes['dpe'])), key="comparaison_dpe")
+    with col_recherche:
+        recherche = st.text_input("Adresse ou ID", key="comparaison_recherche")
     
-    df = pd.DataFrame(data)
-    st.dataframe(df)
+    # Proximité d'une ligne de métro (biens localisés uniquement)
+    lignes = [c.removeprefix('distance_') for c in table.colonnes if c.startswith('distance_')]
+    col_ligne, col_rayon = st.columns(2)
+    with col_ligne:
+        ligne = st.selectbox("Proche de la ligne", ["Toutes"] + lignes, key="comparaison_ligne")
+    with col_rayon:
+        rayon = st.slider("Distance maximale (m)", 100, int(RAYON_LIGNE_MAX), 500, step=100,
+                          key="comparaison_rayon", disabled=ligne == "Toutes")
     
-    # Graphique radar des caractéristiques
-    fig = go.Figure()
+    # Tri et pagination
+    col_tri, col_ordre, col_taille, col_page = st.columns(4)
+    colonnes_tri = [c for c in COLONNES_COMPARAISON if c != 'adresse']
+    with col_tri:
+        tri = st.selectbox("Trier par", colonnes_tri, index=colonnes_tri.index('prix_m2'),
+                           format_func=lambda c: COLONNES_COMPARAISON[c][0], key="comparaison_tri")
+    with col_ordre:
+        croissant = st.radio("Ordre", ["Croissant", "Décroissant"], horizontal=True, key="comparaison_ordre") == "Croissant"
+    with col_taille:
+        taille_page = st.selectbox("Biens par page", [25, 50, 100, 250], index=1, key="comparaison_taille")
+    
+    # Seule la page affichée est convertie en DataFrame
+    bornes = {'prix': (prix_min, prix_max), 'surface': (surface_min or None, None)}
+    if ligne != "Toutes":
+        bornes[f"distance_{ligne}"] = (None, rayon)
+    selection = table.selection(bornes, classes_dpe, recherche, tri, croissant)
+    nb_resultats = len(selection)
+    nb_pages = max(1, -(-nb_resultats // taille_page))
+    with col_page:
+        page = st.number_input(f"Page (sur {nb_pages})", 1, nb_pages, 1, key="comparaison_page")
+    debut = (min(page, nb_pages) - 1) * taille_page
+    st.caption(f"{nb_resultats} bien(s) sur {len(table)}")
+    
+    df = table.dataframe(selection[debut:debut + taille_page])[list(COLONNES_COMPARAISON)]
+    formats = {libelle: fmt for libelle, fmt in COLONNES_COMPARAISON.values() if fmt}
+    df = df.rename(columns={c: libelle for c, (libelle, _) in COLONNES_COMPARAISON.items()})
+    st.dataframe(df.style.format(formats), hide_index=True)
+    
+    # Graphique radar limité aux premiers biens selon le tri courant
+    if nb_resultats:
+        top_k = 1 if nb_resultats == 1 else st.slider("Biens affichés sur le radar", 1, min(20, nb_resultats),
+                                                      min(5, nb_resultats), key="comparaison_top_k")
+        with section("plotly.radar"):
+            theta = [libelle for _, libelle in AXES_RADAR]
+            fig = go.Figure()
+            for i in selection[:top_k]:
+                fig.add_trace(go.Scatterpolar(
+                    r=[table.colonnes[colonne][i] for colonne, _ in AXES_RADAR],
+                    theta=theta,
+                    name=table.colonnes['id'][i]
+                ))
+        
+            fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])))
+            st.plotly_chart(fig)
+
+# Filtres par intervalle de la barre de recherche (libellé, pas du curseur)
+FILTRES_CATALOGUE = {
+    'prix': ("Prix (€)", 5000),
+    'prix_m2': ("Prix/m² (€)", 100),
+    'surface': ("Surface (m²)", 1),
+    'charges_mensuelles': ("Charges (€/mois)", 10),
+    'score_transport': ("Score transport", 1),
+}
+LIMITE_SELECTION = 1000  # biens proposés au plus dans une liste de sélection
+
+def filtre_catalogue(properties, cle: str):
+    """Barre de filtres du catalogue (index en mémoire) ; renvoie les identifiants retenus, dans l'ordre du catalogue."""
+    index = catalog_index(properties)
+    bornes, egal = {}, {}
+    with st.expander("Filtrer les biens"):
+        colonnes = st.columns(len(FILTRES_CATALOGUE))
+        for colonne, (champ, (libelle, pas)) in zip(colonnes, FILTRES_CATALOGUE.items()):
+            etendue = index.etendue(champ)
+            if etendue is None:
+                continue
+            minimum, maximum = int(etendue[0]), int(etendue[1]) + 1
+            with colonne:
+                choix = st.slider(libelle, minimum, maximum, (minimum, maximum), step=pas, key=f"{cle}_filtre_{champ}")
+            # Intervalle complet : pas de prédicat
+            if choix != (minimum, maximum):
+                bornes[champ] = choix
+        col_dpe, col_arrondissement = st.columns(2)
+        with col_dpe:
+            egal['dpe'] = st.multiselect("DPE", index.valeurs('dpe'), key=f"{cle}_filtre_dpe")
+        with col_arrondissement:
+            egal['arrondissement'] = st.multiselect("Arrondissement (Paris)", index.valeurs('arrondissement'),
+                                                    key=f"{cle}_filtre_arrondissement")
+    ids = index.requete(bornes, egal).tolist()
+    if bornes or any(egal.values()) or len(ids) > LIMITE_SELECTION:
+        st.caption(f"{len(ids)} bien(s) sur {len(index)}"
+                   + (f", {LIMITE_SELECTION} premiers proposés" if len(ids) > LIMITE_SELECTION else ""))
+    return ids[:LIMITE_SELECTION]
+
+# Métriques proposées dans la comparaison des scénarios (libellé, format)
+METRIQUES_SCENARIOS = {
+    'patrimoine_final': ("Patrimoine final (€)", "{:,.0f}"),
+    'patrimoine_reel': ("Patrimoine final réel (€)", "{:,.0f}"),
+    'rendement_total': ("Rendement annualisé (%)", "{:.2f}"),
+    'mensualite_credit': ("Mensualité crédit (€)", "{:,.0f}"),
+    'charges_totales': ("Coût mensuel total (€)", "{:,.0f}"),
+    'montant_pret': ("Montant emprunté (€)", "{:,.0f}"),
+}
+
+# Libellés des paramètres de l'analyse de sensibilité
+LIBELLES_SENSIBILITE = {
+    'apport_total': "Apport total",
+    'repartition_immobilier': "Part de l'apport dans le bien",
+    'repartition_epargne': "Part en épargne sécurisée",
+    'repartition_investissement': "Part en investissement",
+    'taux_credit': "Taux du crédit",
+    'duree_credit': "Durée du crédit",
+    'taux_assurance': "Taux d'assurance",
+    'rendement_epargne': "Rendement épargne",
+    'rendement_investissement': "Rendement investissement",
+    'evolution_immobilier': "Valorisation immobilière",
+    'horizon_simulation': "Horizon",
+    'inflation': "Inflation",
+    'negociation': "Négociation",
+}
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _scenario_matrix_cached(path: str, signature, signature_scenarios, _properties):
+    """Matrice biens x scénarios calculée une seule fois par version du catalogue et des scénarios."""
+    return scenario_matrix(list(_properties.values()), load_scenarios(SCENARIOS_FILE))
+
+@st.fragment
+@execution_mesuree("Scénarios")
+def scenario_comparison():
+    """Compare tous les biens sous tous les scénarios nommés de scenarios.yaml (fragment)."""
+    properties, _ = load_data()
+    st.markdown('<p style="color: #ff4b4b; font-size: 1.25rem; font-weight: 600">Comparaison des Scénarios</p>', unsafe_allow_html=True)
+    scenarios = load_scenarios(SCENARIOS_FILE)
     
-    for p in properties.values():
-        fig.add_trace(go.Scatterpolar(
-            r=[p.prix_m2/100, p.score_transport(), 
-               100 if p.dpe == 'A' else 80 if p.dpe == 'B' else 60 if p.dpe == 'C' else 40 if p.dpe == 'D' else 20,
-               len(p.atouts)*10],
-            theta=['Prix/m²', 'Transport', 'DPE', 'Atouts'],
-            name=p.id
-        ))
+    # Hypothèses de chaque scénario (héritées de 'default' sauf surcharge)
+    st.dataframe(pd.DataFrame({
+        nom: {
+            'Apport (€)': c.apport_total,
+            'Taux (%)': c.taux_credit,
+            'Durée (ans)': c.duree_credit,
+            'Assurance (%)': c.taux_assurance,
+            'Placement sécurisé (%)': c.rendement_epargne,
+            'Placement dynamique (%)': c.rendement_investissement,
+            'Évolution immobilier (%)': c.evolution_immobilier,
+            'Horizon (ans)': c.horizon_simulation,
+        } for nom, c in scenarios.items()
+    }))
     
-    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])))
-    st.plotly_chart(fig)
+    metrique = st.selectbox("Métrique", list(METRIQUES_SCENARIOS), format_func=lambda m: METRIQUES_SCENARIOS[m][0])
+    matrice = _scenario_matrix_cached(PROPERTIES_FILE, get_repository(PROPERTIES_FILE).signature(),
+                                      signature_fichier(SCENARIOS_FILE), properties)
+    df = matrice.dataframe(metrique)
+    df.index = [f"{i} - {properties[i].adresse}" for i in df.index]
+    # Meilleur scénario de chaque bien surligné (le plus bas pour les coûts)
+    style = df.style.format(METRIQUES_SCENARIOS[metrique][1])
+    if metrique in ('mensualite_credit', 'charges_totales', 'montant_pret'):
+        style = style.highlight_min(axis=1, color='rgba(50, 205, 50, 0.25)')
+    else:
+        style = style.highlight_max(axis=1, color='rgba(50, 205, 50, 0.25)')
+    st.dataframe(style)
+
+def graphe_simulation():
+    """Graphe de calcul de la simulation, propre à la session et conservé d'une réexécution à l'autre."""
+    if 'graphe_simulation' not in st.session_state:
+        st.session_state['graphe_simulation'] = simulation_graph()
+    return st.session_state['graphe_simulation']
+
+# Graphique d'évolution : points par courbe après réduction LTTB, et nombre total de points affichés au-delà duquel le rendu passe en WebGL
+POINTS_GRAPHIQUE = 150
+SEUIL_WEBGL = 2000
+MAX_BIENS_SUPERPOSES = 20
+
+def courbes_reduites(x, series, nb_points, periode=None):
+    """Courbes (nom, x, y) de séries alignées sur x, restreintes à la période affichée et réduites par LTTB."""
+    garder = fenetre(x, periode)
+    x = np.asarray(x, dtype=float)[garder]
+    noms = list(series)
+    y = np.vstack([np.asarray(series[nom], dtype=float)[garder] for nom in noms])
+    indices = lttb(x, y, nb_points)
+    return [(nom, x[i], y[k, i]) for k, (nom, i) in enumerate(zip(noms, indices))]
+
+def figure_courbes(courbes, styles=None, **layout):
+    """Figure des courbes, en traces WebGL (Scattergl) si le nombre total de points dépasse SEUIL_WEBGL."""
+    styles = styles or {}
+    trace = go.Scattergl if sum(len(x) for _, x, _ in courbes) > SEUIL_WEBGL else go.Scatter
+    fig = go.Figure()
+    for nom, x, y in courbes:
+        fig.add_trace(trace(x=x, y=y, mode='lines', name=nom, **styles.get(nom, {})))
+    fig.update_layout(**layout)
+    return fig
+
+@st.fragment
+@execution_mesuree("Simulation")
+def scenario_simulation():
+    """Interface de simulation des scénarios.
 
-def scenario_simulation(properties, config):
-    """Interface de simulation des scénarios."""
+    Fragment : ses saisies ne réexécutent que la simulation, et les autres
+    onglets ne la réexécutent pas.
+    """
+    # Données chargées par le fragment (cache), et copie de la configuration modifiée sur place par les saisies
+    properties, config = load_data()
     st.markdown('<p style="color: #ff4b4b; font-size: 1.25rem; font-weight: 600">Simulation des Scénarios</p>', unsafe_allow_html=True)
     
+    # Seules les grandeurs dont une entrée a changé depuis la dernière exécution sont recalculées
+    graphe = graphe_simulation()
+    
+    biens_filtres = filtre_catalogue(properties, "simulation")
+    if not biens_filtres:
+        st.info("Aucun bien ne correspond aux filtres")
+        return
+    
     # Création des colonnes principales (1:2 ratio)
     col_gauche, col_droite = st.columns([1, 2])
     
@@ -86,7 +402,7 @@ def scenario_simulation(properties, config):
         # Sélection du bien
         selected_property = st.selectbox(
             "Sélectionner un bien",
-            options=list(properties.keys()),
+            options=biens_filtres,
             format_func=lambda x: properties[x].adresse
         )
         
@@ -115,19 +431,14 @@ def scenario_simulation(properties, config):
                 help="Pourcentage de remise négociée sur le prix"
             )
         
-        prix_negocie = properties[selected_property].prix * (1 - negociation/100)
+        graphe.definir(bien=properties[selected_property], negociation=negociation, apport_total=montant_total,
+                       apport_immobilier=apport_immo, horizon=horizon)
+        prix_negocie = graphe['prix_negocie']
         prix_m2_negocie = prix_negocie / properties[selected_property].surface
         
-        # Calcul des frais de notaire et du coût total
-        if properties[selected_property].frais_agence_acquereur:
-            base_frais_notaire = prix_negocie
-            frais_notaire = base_frais_notaire * 0.08
-            cout_total = prix_negocie + frais_notaire
-            frais_agence_note = "(charge acquéreur)"
-        else:
-            base_frais_notaire = properties[selected_property].prix_hors_honoraires * (1 - negociation/100)
-            frais_notaire = base_frais_notaire * 0.08
-            cout_total = prix_negocie + frais_notaire
+        # Frais de notaire (sur le prix hors honoraires si l'agence est payée par le vendeur) et coût total
+        frais_notaire = graphe['frais_notaire']
+        cout_total = graphe['cout_total']
 
         # Affichage dans col_negociation
         with col_negociation:
@@ -144,21 +455,28 @@ def scenario_simulation(properties, config):
     with col_credit:
         st.markdown('<p style="color: #ff4b4b; font-size: 1.25rem; font-weight: 600">Crédit</p>', unsafe_allow_html=True)
         # Calcul du montant du prêt basé uniquement sur l'apport immobilier et le coût total
-        montant_pret = max(0, cout_total - apport_immo)  # Ne peut pas être négatif
+        montant_pret = graphe['montant_pret']  # Ne peut pas être négatif
         taux = st.number_input("Taux crédit (%)", 0.0, 10.0, config.taux_credit, step=0.05, format="%.2f")
         duree = st.number_input("Durée crédit (années)", 5, 25, config.duree_credit, step=1)
         appreciation = st.number_input("Valorisation annuelle (%)", -2.0, 5.0, config.evolution_immobilier, step=0.1, format="%.1f")
 
-        # Calcul simple des mensualités
-        taux_mensuel = taux / 12 / 100
-        nombre_mois = duree * 12
-        if taux_mensuel > 0:
-            mensualite = montant_pret * (taux_mensuel * (1 + taux_mensuel)**nombre_mois) / ((1 + taux_mensuel)**nombre_mois - 1)
-        else:
-            mensualite = montant_pret / nombre_mois
-            
-        # Calcul de l'assurance
-        assurance_mensuelle = (montant_pret * config.taux_assurance / 100) / 12
+        # Tranches complémentaires et remboursement anticipé
+        with st.expander("PTZ et remboursement anticipé"):
+            montant_ptz = st.number_input("Montant PTZ (€)", 0, 500000, 0, step=1000)
+            duree_ptz = st.number_input("Durée PTZ (années)", 5, 25, 15, step=1)
+            differe_ptz = st.number_input("Différé PTZ (années)", 0, 15, 5, step=1)
+            annee_anticipe = st.number_input("Remboursement anticipé (année)", 0, 25, 0, step=1, help="0 : aucun remboursement anticipé")
+            montant_anticipe = st.number_input("Montant remboursé par anticipation (€)", 0, 1000000, 0, step=1000)
+        
+        # Tableau d'amortissement : prêt principal et PTZ éventuel
+        graphe.definir(taux_credit=taux, duree_credit=duree, taux_assurance=config.taux_assurance,
+                       montant_ptz=montant_ptz, duree_ptz=duree_ptz, differe_ptz=differe_ptz,
+                       annee_anticipe=annee_anticipe, montant_anticipe=montant_anticipe,
+                       evolution_immobilier=appreciation)
+        pret = graphe['pret']
+        echeancier = graphe['echeancier']
+        mensualite = graphe['mensualite']
+        assurance_mensuelle = graphe['assurance_mensuelle']
         mensualite_totale = mensualite + assurance_mensuelle
         
         # Calcul des charges totales
@@ -179,16 +497,24 @@ def scenario_simulation(properties, config):
 </small>
 </div>"""
         st.markdown(charges_detail, unsafe_allow_html=True)
+        
+        with st.expander("Tableau d'amortissement"):
+            # Agrégation annuelle de l'échéancier mensuel
+            nb_annees = pret.duree_mois // 12
+            annuel = lambda serie: serie[1:nb_annees * 12 + 1].reshape(nb_annees, 12).sum(axis=1)
+            st.dataframe(pd.DataFrame({
+                'Année': range(1, nb_annees + 1),
+                'Intérêts': annuel(echeancier.total('interets')),
+                'Capital amorti': annuel(echeancier.total('principal') + echeancier.total('remboursements_anticipes')),
+                'Assurance': annuel(echeancier.total('assurance')),
+                'Capital restant': echeancier.total('capital_restant')[12:nb_annees * 12 + 1:12]
+            }).round(0), hide_index=True)
+            st.caption(f"Coût total du crédit : {echeancier.cout_credit:,.0f}€")
 
     with col_epargne:
         st.markdown('<p style="color: #ff4b4b; font-size: 1.25rem; font-weight: 600">Épargne</p>', unsafe_allow_html=True)
-        # Calcul des montants
-        montant_hors_immo = montant_total - apport_immo
         repartition_epargne = st.number_input("Part sécurisée (%)", 0, 100, 50, step=5)
         
-        montant_securise = montant_hors_immo * (repartition_epargne / 100)
-        montant_dynamique = montant_hors_immo * (1 - repartition_epargne / 100)
-        
         rdt_securise = st.number_input(
             "Taux placement sécurisé (%)", 
             0.0, 5.0, config.rendement_epargne, step=0.1, format="%.1f"
@@ -197,12 +523,16 @@ def scenario_simulation(properties, config):
             "Taux placement dynamique (%)", 
             2.0, 12.0, config.rendement_investissement, step=0.1, format="%.1f"
         )
+        graphe.definir(part_securisee=repartition_epargne, rendement_epargne=rdt_securise,
+                       rendement_investissement=rdt_risque, inflation=config.inflation,
+                       evolution_charges=config.evolution_charges)
     
-    # Mise à jour de la configuration avec le coût total
+    # Mise à jour de la configuration (optimisation, sensibilité, mode stochastique)
+    repartition = graphe['repartition']
     config.apport_total = montant_total
-    config.repartition_immobilier = (apport_immo / montant_total) * 100 if montant_total > 0 else 0
-    config.repartition_epargne = (100 - config.repartition_immobilier) * (repartition_epargne / 100)
-    config.repartition_investissement = (100 - config.repartition_immobilier) * (1 - repartition_epargne / 100)
+    config.repartition_immobilier = repartition['immobilier']
+    config.repartition_epargne = repartition['epargne']
+    config.repartition_investissement = repartition['investissement']
     config.taux_credit = taux
     config.duree_credit = duree
     config.horizon_simulation = horizon
@@ -210,21 +540,22 @@ def scenario_simulation(properties, config):
     config.rendement_epargne = rdt_securise
     config.rendement_investissement = rdt_risque
     
-    # Création et exécution du scénario avec le coût total
-    scenario = Scenario(properties[selected_property], config, cout_total=cout_total)
-    simulation = scenario.simulate_patrimoine()
-    metrics = scenario.calculate_metrics()
+    # Scénario équivalent (mode stochastique) ; les séries proviennent du graphe de calcul
+    scenario = Scenario(properties[selected_property], config, cout_total=cout_total, pret=pret)
+    simulation = graphe['patrimoine']
+    resultats = graphe['resultats']
     
     with col_resultats:
         st.markdown(f'<p style="color: #ff4b4b; font-size: 1.25rem; font-weight: 600; margin: 0; padding: 0">Résultats à {horizon} ans</p>', unsafe_allow_html=True)
         
         # Récupération des valeurs nécessaires
         horizon_mois = horizon * 12
-        capital_restant_horizon = simulation['capital_restant'][horizon_mois]
-        valeur_bien_horizon = simulation['valeur_bien'][horizon_mois]
-        epargne_horizon = simulation['epargne'][horizon_mois] + simulation['investissement'][horizon_mois]
-        frais_agence_revente = valeur_bien_horizon * 0.05  # Estimation 5% frais d'agence à la revente
-        penalites = capital_restant_horizon * 0.03 if horizon < config.duree_credit else 0
+        capital_restant_horizon = resultats['capital_restant']
+        valeur_bien_horizon = resultats['valeur_bien']
+        epargne_horizon = resultats['epargne']
+        frais_agence_revente = resultats['frais_revente']  # Estimation 5% frais d'agence à la revente
+        # Indemnités de remboursement anticipé sur le capital restant de chaque tranche
+        penalites = resultats['penalites']
 
         patrimoine_detail = f"""<small><br>
 <b style="color: #ff4b4b">Épargne</b><br>
@@ -235,12 +566,12 @@ def scenario_simulation(properties, config):
 <span style="font-size: 1.5rem">{valeur_bien_horizon:,.0f}€</span><br><br>
 <span style="color: #666666">Si revente</span><br>
 """
-        if horizon < config.duree_credit:
+        if capital_restant_horizon > 0:
             patrimoine_detail += f"""<i style="color: #ff4b4b">Capital restant dû: -{capital_restant_horizon:,.0f}€<br>
-Pénalités (3%): -{penalites:,.0f}€</i><br>
+Pénalités (IRA): -{penalites:,.0f}€</i><br>
 """
-        total_revente = valeur_bien_horizon - capital_restant_horizon - penalites - frais_agence_revente
-        plus_value_immo = total_revente - cout_total
+        total_revente = resultats['total_revente']
+        plus_value_immo = resultats['plus_value']
 
         patrimoine_detail += f"""<span style="color: #666666">Frais d'agence (5%):</span> -{frais_agence_revente:,.0f}€<br>
 <span style="color: #666666">Total revente:</span><br>
@@ -248,30 +579,18 @@ Pénalités (3%): -{penalites:,.0f}€</i><br>
 <span style="color: #666666">Plus-value immobilière:</span> {plus_value_immo:+,.0f}€<br><br>
 
 <b style="color: #ff4b4b">Patrimoine final:</b><br>
-<span style="font-size: 2.5rem">{total_revente + epargne_horizon:,.0f}€</span></small>"""
+<span style="font-size: 2.5rem">{resultats['patrimoine_final']:,.0f}€</span></small>"""
 
         st.markdown(patrimoine_detail, unsafe_allow_html=True)
     
     # Affichage de la répartition dans la colonne de droite
     with col_epargne:
-        # Calcul de la répartition de l'épargne sécurisée
-        livret_a = min(montant_securise, LIVRET_A_PLAFOND)
-        reste_apres_livret_a = montant_securise - livret_a
-        ldd = min(reste_apres_livret_a, LDD_PLAFOND)
-        compte_terme = max(0, reste_apres_livret_a - ldd)
+        # Répartition de l'épargne sécurisée (Livret A, LDD, compte à terme) et rendement moyen
+        placements = graphe['placements']
+        livret_a, ldd, compte_terme = placements['livret_a'], placements['ldd'], placements['compte_terme']
+        montant_dynamique = placements['dynamique']
         
-        # Calcul du rendement moyen de l'épargne sécurisée
-        rendement_moyen = 0
-        montant_total_epargne = montant_securise + montant_dynamique
-        if montant_total_epargne > 0:
-            rendement_moyen = (
-                (livret_a * config.rendement_epargne + 
-                 ldd * config.rendement_epargne + 
-                 compte_terme * (config.rendement_epargne - 2) +
-                 montant_dynamique * config.rendement_investissement) / montant_total_epargne
-            )
-        
-        st.metric("Rendement épargne moyen", f"{rendement_moyen:.2f}%")
+        st.metric("Rendement épargne moyen", f"{placements['rendement_moyen']:.2f}%")
         repartition_detail = f"""<div style="margin-top: -1rem">
 <small>
 <span style="color: #666666">Épargne sécurisée :</span><br>
@@ -284,234 +603,246 @@ Pénalités (3%): -{penalites:,.0f}€</i><br>
 </div>"""
         st.markdown(repartition_detail, unsafe_allow_html=True)
     
-    # Graphique d'évolution du patrimoine
-    df_evolution = pd.DataFrame({
-        'Années': [i/12 for i in range(len(simulation['patrimoine_total']))],
-        'Patrimoine Total': simulation['patrimoine_total'],
-        'Valeur Bien': simulation['valeur_bien'],
-        'Capital Restant Dû': simulation['capital_restant'],
-        'Épargne Sécurisée': simulation['epargne'],
-        'Épargne Dynamique': simulation['investissement']
-    })
+    # Mode stochastique : trajectoires aléatoires du marché et de l'immobilier
+    resultat_mc = None
+    with st.expander("Simulation stochastique (Monte Carlo)"):
+        mc_config = load_monte_carlo_config()
+        if st.checkbox("Activer le mode stochastique", value=False):
+            col_mc1, col_mc2, col_mc3 = st.columns(3)
+            with col_mc1:
+                mc_config.nb_trajectoires = st.number_input("Nombre de trajectoires", 1000, 100000, mc_config.nb_trajectoires, step=1000)
+                mc_config.graine = st.number_input("Graine aléatoire", 0, 10**6, mc_config.graine if mc_config.graine is not None else 42, step=1)
+            with col_mc2:
+                mc_config.volatilite_investissement = st.number_input("Volatilité placement dynamique (%)", 0.0, 40.0, float(mc_config.volatilite_investissement), step=0.5, format="%.1f")
+                mc_config.volatilite_immobilier = st.number_input("Volatilité immobilier (%)", 0.0, 20.0, float(mc_config.volatilite_immobilier), step=0.5, format="%.1f")
+            with col_mc3:
+                mc_config.correlation = st.number_input("Corrélation marché / immobilier", -1.0, 1.0, float(mc_config.correlation), step=0.05, format="%.2f")
+            
+            resultat_mc = scenario.simulate_monte_carlo(mc_config)
+            
+            col_p5, col_p50, col_p95, col_perte = st.columns(4)
+            col_p5.metric("Patrimoine final P5", f"{resultat_mc.bandes['P5'][-1]:,.0f}€")
+            col_p50.metric("Patrimoine final P50", f"{resultat_mc.bandes['P50'][-1]:,.0f}€")
+            col_p95.metric("Patrimoine final P95", f"{resultat_mc.bandes['P95'][-1]:,.0f}€")
+            col_perte.metric("Probabilité de perte", f"{resultat_mc.probabilite_perte:.1%}")
     
-    fig = px.line(df_evolution.melt(id_vars=['Années'], 
-                                  value_vars=['Patrimoine Total', 'Valeur Bien', 
-                                            'Capital Restant Dû', 'Épargne Sécurisée', 'Épargne Dynamique']),
-                  x='Années', y='value', color='variable',
-                  title="Évolution du Patrimoine",
-                  labels={'value': 'Valeur (€)'})
+    # Graphique d'évolution du patrimoine : séries passées telles quelles, réduites à la période affichée
+    with st.expander("Options du graphique"):
+        col_points, col_periode = st.columns(2)
+        with col_points:
+            nb_points = st.number_input("Points par courbe", 50, 2000, POINTS_GRAPHIQUE, step=50,
+                                        help="Réduction LTTB : conserve les pics et la forme des courbes")
+        with col_periode:
+            # Une période plus courte est réduite au même nombre de points, donc plus détaillée
+            periode = st.slider("Période affichée (années)", 0, horizon, (0, horizon))
+        superposes = st.multiselect("Superposer le patrimoine d'autres biens",
+                                    [i for i in biens_filtres if i != selected_property],
+                                    format_func=lambda i: f"{i} - {properties[i].adresse}",
+                                    max_selections=MAX_BIENS_SUPERPOSES)
+        if superposes:
+            st.caption("Biens superposés simulés avec un prêt simple (sans PTZ ni remboursement anticipé)")
+
+    with section("plotly.evolution"):
+        annees = np.arange(len(simulation['patrimoine_total'])) / 12
+        courbes = courbes_reduites(annees, {
+            'Patrimoine Total': simulation['patrimoine_total'],
+            'Patrimoine Réel': simulation['patrimoine_reel'],
+            'Valeur Bien': simulation['valeur_bien'],
+            'Capital Restant Dû': simulation['capital_restant'],
+            'Épargne Sécurisée': simulation['epargne'],
+            'Épargne Dynamique': simulation['investissement'],
+        }, nb_points, periode)
+
+        if superposes:
+            lot = simulate_batch([properties[i] for i in superposes], config, negociation=negociation)
+            courbes += courbes_reduites(annees, {f"Patrimoine Total - {i}": serie for i, serie in
+                                                 zip(superposes, lot.serie('patrimoine_total'))}, nb_points, periode)
+
+        # Bandes de percentiles du mode stochastique
+        styles = {}
+        if resultat_mc is not None:
+            courbes += courbes_reduites(resultat_mc.mois / 12, {
+                'Patrimoine P95': resultat_mc.bandes['P95'],
+                'Patrimoine P5-P95': resultat_mc.bandes['P5'],
+                'Patrimoine médian (P50)': resultat_mc.bandes['P50'],
+            }, nb_points, periode)
+            styles = {
+                'Patrimoine P95': dict(line=dict(width=0), showlegend=False, hoverinfo='skip'),
+                'Patrimoine P5-P95': dict(line=dict(width=0), fill='tonexty', fillcolor='rgba(255, 75, 75, 0.15)'),
+                'Patrimoine médian (P50)': dict(line=dict(color='#ff4b4b', dash='dash')),
+            }
+
+        fig = figure_courbes(courbes, styles, title="Évolution du Patrimoine",
+                             xaxis_title="Années", yaxis_title="Valeur (€)", legend_title_text="")
+
+        # Formatage des axes
+        fig.update_xaxes(tickformat='.0f')  # Pas de décimales pour les années
+        fig.update_yaxes(tickformat=',d')   # Format des montants avec séparateur de milliers
+
+        st.plotly_chart(fig)
     
-    # Formatage des axes
-    fig.update_xaxes(tickformat='.0f')  # Pas de décimales pour les années
-    fig.update_yaxes(tickformat=',d')   # Format des montants avec séparateur de milliers
+    # Flux de charges indexés sur leurs taux d'évolution respectifs
+    with st.expander("Charges et flux mensuels"):
+        flux = graphe['charges']
+        postes = {'copropriete': 'Copropriété', 'taxe_fonciere': 'Taxe foncière',
+                  'energie': 'Énergie', 'assurance': 'Assurance emprunteur'}
+        df_charges = pd.DataFrame({libelle: flux[poste] for poste, libelle in postes.items()})
+        # Cumul annuel (mois 1 à 12 pour l'année 1, etc.)
+        df_charges['Année'] = (df_charges.index + 11) // 12
+        df_annuel = df_charges[df_charges['Année'] > 0].groupby('Année').sum()
+        
+        with section("plotly.charges"):
+            fig_charges = go.Figure()
+            for libelle in postes.values():
+                fig_charges.add_trace(go.Bar(x=df_annuel.index, y=df_annuel[libelle], name=libelle))
+            fig_charges.update_layout(barmode='stack', title="Charges annuelles",
+                                      xaxis_title="Année", yaxis_title="Montant (€)")
+            fig_charges.update_yaxes(tickformat=',d')
+            st.plotly_chart(fig_charges)
+        
+        col_mois1, col_dernier, col_cumul = st.columns(3)
+        col_mois1.metric("Charges du 1er mois", f"{flux['total'][1]:,.0f}€")
+        col_dernier.metric(f"Charges du mois {horizon_mois}", f"{flux['total'][-1]:,.0f}€")
+        col_cumul.metric(f"Total sur {horizon} ans", f"{sum(flux['total']):,.0f}€")
+        st.caption(f"Patrimoine final en euros d'aujourd'hui (inflation {config.inflation:.1f}%/an) : "
+                   f"{simulation['patrimoine_reel'][-1]:,.0f}€")
     
-    st.plotly_chart(fig)
-
-def load_prompts():
-    """Charge les prompts depuis le fichier YAML."""
-    with open("data/renseignement-prompt.yaml", "r") as f:
-        return yaml.safe_load(f)
+    # Recherche de la meilleure répartition de l'apport (prêt simple, sans PTZ)
+    with st.expander("Optimisation de la répartition"):
+        col_obj, col_aversion, col_reserve = st.columns(3)
+        with col_obj:
+            objectif = st.radio("Objectif", ['patrimoine', 'ajuste'],
+                                format_func=lambda o: "Patrimoine final" if o == 'patrimoine' else "Ajusté du risque")
+        with col_aversion:
+            aversion = st.number_input("Aversion au risque", 0.0, 3.0, 0.5, step=0.1, format="%.1f",
+                                       disabled=objectif == 'patrimoine')
+        with col_reserve:
+            reserve_min = st.number_input("Réserve de sécurité minimale (€)", 0, 1000000,
+                                          int(config.seuils_alertes.get('reserve_securite_min', 0)), step=1000)
+        
+        if st.button("Optimiser la répartition"):
+            try:
+                optimisation = optimize_allocation(
+                    properties[selected_property], config, negociation=negociation,
+                    durees=sorted({10, 15, 20, 25, duree}), objectif=objectif,
+                    aversion_risque=aversion, reserve_min=reserve_min, mc_config=mc_config
+                )
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                meilleure = optimisation.meilleure
+                col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+                col_m1.metric("Apport appartement", f"{meilleure['apport_immobilier']:,.0f}€")
+                col_m2.metric("Part sécurisée", f"{meilleure['part_securisee']:.0f}%")
+                col_m3.metric("Durée du crédit", f"{meilleure['duree_credit']:.0f} ans")
+                col_m4.metric("Patrimoine final", f"{meilleure['patrimoine_final']:,.0f}€",
+                              f"{meilleure['patrimoine_final'] - simulation['patrimoine_total'][-1]:+,.0f}€")
+                
+                candidats = pd.DataFrame(optimisation.candidats)
+                admissibles = candidats[candidats['admissible']]
+                with section("plotly.frontiere"):
+                    fig_frontiere = px.scatter(admissibles, x='ecart_type', y='patrimoine_final', color='duree_credit',
+                                               title="Patrimoine final et risque des répartitions admissibles",
+                                               labels={'ecart_type': 'Écart-type (€)', 'patrimoine_final': 'Patrimoine final (€)',
+                                                       'duree_credit': 'Durée (ans)'})
+                    frontiere = candidats.iloc[optimisation.frontiere]
+                    fig_frontiere.add_trace(go.Scatter(x=frontiere['ecart_type'], y=frontiere['patrimoine_final'],
+                                                       mode='lines', line=dict(color='#ff4b4b'), name='Frontière efficace'))
+                    fig_frontiere.update_xaxes(tickformat=',d')
+                    fig_frontiere.update_yaxes(tickformat=',d')
+                    st.plotly_chart(fig_frontiere)
+                
+                st.dataframe(admissibles.nlargest(10, 'score')[
+                    ['apport_immobilier', 'part_securisee', 'duree_credit', 'mensualite', 'patrimoine_final', 'ecart_type']
+                ].rename(columns={
+                    'apport_immobilier': 'Apport (€)', 'part_securisee': 'Part sécurisée (%)',
+                    'duree_credit': 'Durée (ans)', 'mensualite': 'Mensualité (€)',
+                    'patrimoine_final': 'Patrimoine final (€)', 'ecart_type': 'Écart-type (€)'
+                }).round(0), hide_index=True)
+    
+    # Effet de chaque hypothèse sur le patrimoine final (prêt simple, sans PTZ)
+    with st.expander("Analyse de sensibilité"):
+        # Une matrice de scénarios complète : calculée seulement à la demande
+        if st.checkbox("Calculer l'analyse de sensibilité", value=False):
+            col_delta, col_metrique = st.columns(2)
+            with col_delta:
+                delta = st.slider("Variation des paramètres (±%)", 1, 50, 10)
+            with col_metrique:
+                metrique_sensibilite = st.radio("Métrique", ['patrimoine_final', 'patrimoine_reel'], horizontal=True,
+                                                format_func=lambda m: "Patrimoine final" if m == 'patrimoine_final' else "Patrimoine réel")
+        
+            sensibilite = sensitivity_analysis(properties[selected_property], config, negociation=negociation,
+                                               delta=delta, metrique=metrique_sensibilite)
+            df_sensibilite = sensibilite.dataframe()
+            df_sensibilite['libelle'] = df_sensibilite['parametre'].map(LIBELLES_SENSIBILITE)
+            # Le paramètre le plus influent en haut du graphique
+            df_tornado = df_sensibilite.iloc[::-1]
+        
+            with section("plotly.sensibilite"):
+                fig_tornado = go.Figure()
+                for sens, couleur in (('bas', '#1f77b4'), ('haut', '#ff4b4b')):
+                    fig_tornado.add_trace(go.Bar(
+                        y=df_tornado['libelle'], x=df_tornado[f'resultat_{sens}'] - sensibilite.reference,
+                        base=sensibilite.reference, orientation='h', marker_color=couleur,
+                        name=f"Paramètre {'-' if sens == 'bas' else '+'}{delta}%",
+                        customdata=df_tornado[sens], hovertemplate="%{y} = %{customdata:.4g}<br>%{x:+,.0f}€<extra></extra>"
+                    ))
+                libelle_metrique = METRIQUES_SCENARIOS[metrique_sensibilite][0]
+                fig_tornado.update_layout(barmode='overlay', title=f"Sensibilité : {libelle_metrique}",
+                                          xaxis_title=libelle_metrique, height=450)
+                fig_tornado.update_xaxes(tickformat=',d')
+                st.plotly_chart(fig_tornado)
+        
+            st.dataframe(df_sensibilite[['libelle', 'valeur', 'bas', 'haut', 'impact', 'elasticite']].rename(columns={
+                'libelle': 'Paramètre', 'valeur': 'Valeur', 'bas': 'Bas', 'haut': 'Haut',
+                'impact': 'Écart (€)', 'elasticite': 'Élasticité'
+            }).round(3), hide_index=True)
 
+@instrumenter()
 def call_openai_api(text: str, existing_property=None):
     """Appelle l'API OpenAI pour extraire les informations du bien."""
-    try:
-        # Initialisation du client avec la clé API chargée depuis .env
-        client = OpenAI()  # La clé sera automatiquement chargée depuis la variable d'environnement
-        prompts = load_prompts()
-
-        # Prépare les messages pour l'API
-        messages = [
-            {"role": "system", "content": prompts["system"]}
-        ]
-
-        if existing_property:
-            # Cas de mise à jour
-            prompt = prompts["update_prompt"].format(
-                existing_details=json.dumps(existing_property, ensure_ascii=False, indent=2),
-                user_input=text
-            )
-        else:
-            # Nouveau bien
-            prompt = prompts["new_prompt"].format(user_input=text)
-
-        messages.append({"role": "user", "content": prompt})
-
-        # Appel à l'API avec Structured Output
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "property_schema",
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "error": {
-                                "type": "string",
-                                "description": "Message d'erreur si les informations sont insuffisantes"
-                            },
-                            "property": {
-                                "type": "object",
-                                "properties": {
-                                    # Copie du schéma de notre properties.json
-                                    "adresse": {"type": "string"},
-                                    "lien_annonce": {"type": ["string", "null"]},
-                                    "bien": {
-                                        "type": "object",
-                                        "properties": {
-                                            "type": {"type": "string"},
-                                            "surface": {"type": "number"},
-                                            "etage": {"type": "string"},
-                                            "nb_pieces": {"type": ["integer", "null"]},
-                                            "orientation": {"type": ["string", "null"]},
-                                            "pieces": {
-                                                "type": "object",
-                                                "properties": {
-                                                    "sejour_cuisine": {"type": ["number", "null"]},
-                                                    "chambre": {"type": ["number", "null"]}
-                                                },
-                                                "required": ["sejour_cuisine", "chambre"],
-                                                "additionalProperties": False
-                                            },
-                                            "dpe": {"type": ["string", "null"]},
-                                            "ges": {"type": ["string", "null"]},
-                                            "cave": {"type": "boolean"}
-                                        },
-                                        "required": ["type", "surface", "etage", "orientation", "pieces", "dpe", "ges", "cave"],
-                                        "additionalProperties": False
-                                    },
-                                    "prix": {
-                                        "type": "object",
-                                        "properties": {
-                                            "annonce": {"type": "number"},
-                                            "hors_honoraires": {"type": "number"},
-                                            "m2": {"type": "number"},
-                                            "honoraires": {
-                                                "type": "object",
-                                                "properties": {
-                                                    "montant": {"type": "number"},
-                                                    "pourcentage": {"type": "number"}
-                                                },
-                                                "required": ["montant", "pourcentage"],
-                                                "additionalProperties": False
-                                            },
-                                            "negociable": {"type": ["boolean", "null"]},
-                                            "frais_agence_acquereur": {"type": "boolean"}
-                                        },
-                                        "required": ["annonce", "hors_honoraires", "m2", "honoraires", "negociable", "frais_agence_acquereur"],
-                                        "additionalProperties": False
-                                    },
-                                    "metros": {
-                                        "type": "array",
-                                        "items": {
-                                            "type": "object",
-                                            "properties": {
-                                                "ligne": {"type": "string"},
-                                                "station": {"type": "string"},
-                                                "distance": {"type": "number"}
-                                            },
-                                            "required": ["ligne", "station", "distance"],
-                                            "additionalProperties": False
-                                        }
-                                    },
-                                    "charges": {
-                                        "type": "object",
-                                        "properties": {
-                                            "mensuelles": {"type": "number"},
-                                            "taxe_fonciere": {"type": ["number", "null"]},
-                                            "energie": {"type": ["number", "null"]},
-                                            "chauffage": {"type": ["string", "null"]}
-                                        },
-                                        "required": ["mensuelles", "taxe_fonciere", "energie", "chauffage"],
-                                        "additionalProperties": False
-                                    },
-                                    "copro": {
-                                        "type": "object",
-                                        "properties": {
-                                            "lots": {"type": ["number", "null"]}
-                                        },
-                                        "required": ["lots"],
-                                        "additionalProperties": False
-                                    },
-                                    "atouts": {
-                                        "type": "array",
-                                        "items": {"type": "string"}
-                                    },
-                                    "vigilance": {
-                                        "type": "array",
-                                        "items": {"type": "string"}
-                                    },
-                                    "contact": {"type": "string"}
-                                },
-                                "required": ["adresse", "bien", "prix", "metros", "charges", "copro", "atouts", "vigilance", "contact"],
-                                "additionalProperties": False
-                            }
-                        },
-                        "required": ["error", "property"],
-                        "additionalProperties": False
-                    },
-                    "strict": True
-                }
-            }
-        )
-        
-        return True, response.choices[0].message.content
-    except Exception as e:
-        return False, f"Erreur lors de l'appel à l'API : {str(e)}"
+    resultat = extract_listings([text], [existing_property], cache=get_llm_cache(), client=get_llm_client())[0]
+    return (True, resultat.contenu) if resultat.succes else (False, resultat.erreur)
 
 def update_properties_json(new_property_data: dict, selected_id: str = None):
-    """Met à jour le fichier properties.json avec les nouvelles données."""
+    """Met à jour le stockage des biens avec les nouvelles données."""
     try:
-        # Charger le fichier properties.json existant
-        with open('data/properties.json', 'r') as f:
-            data = json.load(f)
+        repository = get_repository(PROPERTIES_FILE)
+        avant = repository.signature()
         
         if selected_id and selected_id != "nouveau bien":
-            # Mise à jour d'un bien existant
-            data['properties'][selected_id] = new_property_data
+            # Mise à jour d'un bien existant (la localisation, absente du schéma d'extraction, est conservée)
+            existant = repository.get(selected_id) or {}
+            if 'localisation' in existant and 'localisation' not in new_property_data:
+                new_property_data = {**new_property_data, 'localisation': existant['localisation']}
+            repository.upsert(selected_id, new_property_data)
+            indexer_ecriture(avant, {selected_id: new_property_data})
         else:
-            # Nouveau bien : générer un nouvel ID
-            properties = Property.load_properties('data/properties.json')
-            existing_ids = list(properties.keys())
-            
-            # Créer un Property temporaire pour utiliser generate_id
-            temp_property = Property(
-                id="temp",
-                adresse=new_property_data['adresse'],
-                surface=new_property_data['bien']['surface'],
-                etage=new_property_data['bien']['etage'],
-                nb_pieces=new_property_data['bien'].get('nb_pieces'),
-                exposition=new_property_data['bien'].get('exposition'),
-                type_chauffage=new_property_data['bien'].get('type_chauffage'),
-                travaux=new_property_data['bien'].get('travaux'),
-                etat=new_property_data['bien'].get('etat'),
-                prix=new_property_data['prix']['annonce'],
-                prix_hors_honoraires=new_property_data['prix']['hors_honoraires'],
-                prix_m2=new_property_data['prix']['m2'],
-                charges_mensuelles=new_property_data['charges']['mensuelles'],
-                taxe_fonciere=new_property_data['charges']['taxe_fonciere'],
-                energie=new_property_data['charges']['energie'],
-                dpe=new_property_data['bien']['dpe'],
-                ges=new_property_data['bien']['ges'],
-                metros=[],
-                atouts=[],
-                vigilance=[],
-                frais_agence_acquereur=new_property_data['prix']['frais_agence_acquereur'],
-                lien_annonce=new_property_data.get('lien_annonce')
-            )
-            
-            new_id = Property.generate_id(new_property_data['adresse'], existing_ids)
-            data['properties'][new_id] = new_property_data
+            # Nouveau bien : validation puis attribution d'un ID par l'index des villes
+            Property.from_json_data("temp", new_property_data)
+            ids = repository.insert_many([new_property_data])
+            indexer_ecriture(avant, dict(zip(ids, [new_property_data])))
         
-        # Sauvegarder les modifications
-        with open('data/properties.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        invalidate_data_cache()
         
         return True, None
     except Exception as e:
         return False, str(e)
 
+def insert_properties(new_properties: list):
+    """Ajoute plusieurs nouveaux biens en une seule écriture ; renvoie les IDs attribués."""
+    try:
+        for property_data in new_properties:
+            Property.from_json_data("temp", property_data)
+        repository = get_repository(PROPERTIES_FILE)
+        avant = repository.signature()
+        ids = repository.insert_many(new_properties)
+        indexer_ecriture(avant, dict(zip(ids, new_properties)))
+        invalidate_data_cache()
+        return ids, None
+    except Exception as e:
+        return None, str(e)
+
 def property_to_dict(property_obj):
     """Convertit un objet Property en dictionnaire compatible JSON."""
     return {
@@ -551,6 +882,8 @@ def property_to_dict(property_obj):
             "station": m.station,
             "distance": m.distance
         } for m in property_obj.metros],
+        **({"localisation": {"latitude": property_obj.latitude, "longitude": property_obj.longitude}}
+           if property_obj.latitude is not None and property_obj.longitude is not None else {}),
         "charges": {
             "mensuelles": property_obj.charges_mensuelles,
             "taxe_fonciere": property_obj.taxe_fonciere,
@@ -566,24 +899,29 @@ def property_to_dict(property_obj):
     }
 
 def delete_property(property_id: str):
-    """Supprime un bien du fichier properties.json."""
+    """Supprime un bien du stockage."""
     try:
-        with open('data/properties.json', 'r') as f:
-            data = json.load(f)
-        
-        if property_id in data['properties']:
-            del data['properties'][property_id]
-            
-            with open('data/properties.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+        repository = get_repository(PROPERTIES_FILE)
+        avant = repository.signature()
+        if repository.delete(property_id):
+            indexer_ecriture(avant, suppressions=[property_id])
+            invalidate_data_cache()
             return True, None
         else:
             return False, "Bien non trouvé"
     except Exception as e:
         return False, str(e)
 
-def property_details(properties):
-    """Interface pour la gestion des biens."""
+@st.fragment
+@execution_mesuree("Biens")
+def property_details():
+    """Interface pour la gestion des biens.
+
+    Fragment : saisie, confirmation de suppression et filtres ne réexécutent
+    que ce panneau ; une écriture relance toute l'application pour recharger
+    le catalogue.
+    """
+    properties, _ = load_data()
     st.header("Gestion des Biens", divider="red")
     
     # Style CSS pour l'icône de suppression
@@ -605,6 +943,8 @@ def property_details(properties):
         </style>
     """, unsafe_allow_html=True)
     
+    biens_filtres = filtre_catalogue(properties, "biens")
+    
     # Création de colonnes pour le selectbox et l'icône de suppression
     col_select, col_delete = st.columns([0.9, 0.1])
     
@@ -612,7 +952,7 @@ def property_details(properties):
         # Sélection du bien
         selected = st.selectbox(
             "Sélectionner un bien",
-            ["nouveau bien"] + list(properties.keys()),
+            ["nouveau bien"] + biens_filtres,
             format_func=lambda x: f"{x} - {properties[x].adresse}" if x in properties else x
         )
     
@@ -645,9 +985,9 @@ def property_details(properties):
                     st.error(f"Erreur lors de la suppression : {error}")
         
         with c3:
-            if st.button("Non", key=f"confirm_no_{selected}"):
-                st.session_state[modal_key] = False
-                st.rerun()
+            # Fermeture par rappel, appliquée avant la réexécution du fragment (sans relancer l'application)
+            st.button("Non", key=f"confirm_no_{selected}",
+                      on_click=lambda: st.session_state.update({modal_key: False}))
     
     # Section Renseignements
     st.subheader("Renseignements", divider="red")
@@ -690,7 +1030,59 @@ def property_details(properties):
                         st.error(f"Erreur : Réponse invalide de l'API\nDétails : {str(e)}\nRéponse reçue : {result}")
         else:
             st.warning("Veuillez entrer une description.")
-    
+
+    # Import de plusieurs annonces, extraites en parallèle
+    with st.expander("Import en lot"):
+        st.markdown('<p style="color: gray;">Collez plusieurs annonces séparées par une ligne contenant uniquement ---.</p>', unsafe_allow_html=True)
+        annonces = st.text_area("Annonces", height=200, key="import_lot")
+        if st.button("Extraire les annonces"):
+            textes = [t.strip() for t in re.split(r'^\s*---\s*$', annonces, flags=re.MULTILINE) if t.strip()]
+            if not textes:
+                st.warning("Veuillez entrer au moins une annonce.")
+            else:
+                barre = st.progress(0.0, text="Extraction en cours...")
+                termines = []
+
+                def progression(resultat):
+                    termines.append(resultat)
+                    barre.progress(len(termines) / len(textes), text=f"{len(termines)}/{len(textes)} annonces traitées")
+
+                lignes, nouveaux = [], []
+                for resultat in extract_listings(textes, progression=progression, cache=get_llm_cache(),
+                                                 client=get_llm_client()):
+                    statut, detail = "Erreur", resultat.erreur
+                    if resultat.succes:
+                        donnees = resultat.donnees
+                        if donnees.get("error") or "property" not in donnees:
+                            detail = donnees.get("error") or "Informations du bien absentes"
+                        else:
+                            try:
+                                Property.from_json_data("temp", donnees["property"])
+                                Property.ville_id(donnees["property"]["adresse"])
+                            except Exception as e:
+                                detail = str(e)
+                            else:
+                                statut, detail = "Enregistré", donnees["property"]["adresse"]
+                                nouveaux.append((len(lignes), donnees["property"]))
+                    lignes.append({"Annonce": resultat.indice + 1, "Statut": statut, "Détail": detail,
+                                   "Tentatives": resultat.tentatives, "En cache": resultat.en_cache,
+                                   "Durée (s)": round(resultat.duree, 1)})
+
+                # Enregistrement groupé des biens valides (une seule écriture)
+                if nouveaux:
+                    ids, error = insert_properties([donnees for _, donnees in nouveaux])
+                    for n, (ligne, _) in enumerate(nouveaux):
+                        if ids:
+                            lignes[ligne]["Détail"] = f"{ids[n]} - {lignes[ligne]['Détail']}"
+                        else:
+                            lignes[ligne].update({"Statut": "Erreur", "Détail": error})
+                st.dataframe(pd.DataFrame(lignes), hide_index=True)
+                stats = get_llm_cache().stats()
+                st.caption(f"Cache des réponses : {stats['hits']} réutilisée(s), {stats['misses']} appel(s), "
+                           f"{stats['taille']} entrée(s), {stats['octets'] / 2**20:.1f} Mo")
+                if any(ligne["Statut"] == "Enregistré" for ligne in lignes):
+                    st.success(f"{sum(ligne['Statut'] == 'Enregistré' for ligne in lignes)} bien(s) enregistré(s)")
+
     # Section Détails du bien
     if selected != "nouveau bien":
         property_data = properties[selected]
@@ -763,10 +1155,11 @@ def display_property_details(property_data):
         if lien:
             st.markdown('<div class="property-detail"><span class="property-label">Lien:</span><span class="property-value"><a href="{}" target="_blank">Voir l\'annonce</a></span></div>'.format(lien), unsafe_allow_html=True)
         
-        # Métros (affichés uniquement si présents)
-        if property_data.metros:
+        # Métros : calculés depuis les stations embarquées si le bien est localisé, sinon ceux de l'annonce
+        metros = StationIndex.from_csv(STATIONS_FILE).metros_bien(property_data)
+        if metros:
             st.markdown('<div class="property-section"><div class="section-title">Transports:</div>', unsafe_allow_html=True)
-            for metro in property_data.metros:
+            for metro in metros:
                 st.markdown(f'<div class="property-detail">• Ligne {metro.ligne} station {metro.station} à {metro.distance}m</div>', unsafe_allow_html=True)
 
     with col2:
@@ -782,20 +1175,63 @@ def display_property_details(property_data):
             for point in property_data.vigilance:
                 st.markdown(f'<div class="property-detail">• {point}</div>', unsafe_allow_html=True)
 
-def main():
-    st.title("Analyse Immobilière")
-    
-    # Chargement des données
-    properties, config = load_data()
-    
-    # Tabs pour la navigation
-    tab1, tab2 = st.tabs(["Simulation", "Biens"])
-    
+@st.fragment
+def performance_panel():
+    """Temps, appels et allocations d'une exécution mesurée, et export de sa trace en JSON.
+
+    Fragment : l'actualiser affiche les exécutions de fragments survenues depuis.
+    """
+    st.button("Actualiser", key='performance_actualiser')
+    traces = st.session_state.get('performance_traces', [])
+    if not traces:
+        st.caption("Aucune exécution mesurée")
+        return
+    # La plus récente en premier
+    trace = st.selectbox("Exécution", traces[::-1],
+                         format_func=lambda t: f"{t.date} - {t.nom} ({t.duree_s * 1000:,.0f} ms)")
+    df = pd.DataFrame(trace.resume())
+    for colonne in ('temps_total_s', 'temps_moyen_s', 'temps_max_s'):
+        df[colonne] = df[colonne] * 1000
+    colonnes = {'nom': 'Fonction', 'appels': 'Appels', 'temps_total_s': 'Total (ms)',
+                'temps_moyen_s': 'Moyen (ms)', 'temps_max_s': 'Max (ms)'}
+    if trace.memoire:
+        for colonne in ('memoire_pic_octets', 'memoire_nette_octets'):
+            df[colonne] = df[colonne] / 1024
+        colonnes.update({'memoire_pic_octets': 'Pic mémoire (Ko)', 'memoire_nette_octets': 'Mémoire nette (Ko)'})
+    st.dataframe(df[list(colonnes)].rename(columns=colonnes).round(2), hide_index=True)
+    st.download_button("Exporter la trace (JSON)", trace.to_json(), mime="application/json",
+                       file_name=f"trace_{trace.date.replace(':', '-')}.json")
+
+@execution_mesuree("Exécution complète")
+def navigation():
+    """Onglets : chaque onglet est un fragment qui charge ses données (en cache) et n'est réexécuté que par ses propres saisies."""
+    tab1, tab2, tab3, tab4 = st.tabs(["Simulation", "Scénarios", "Comparaison", "Biens"])
+
     with tab1:
-        scenario_simulation(properties, config)
-    
+        scenario_simulation()
+
     with tab2:
-        property_details(properties)
+        scenario_comparison()
+
+    with tab3:
+        property_comparison()
+
+    with tab4:
+        property_details()
+
+def main():
+    st.title("Analyse Immobilière")
+
+    # Instrumentation facultative : sans elle, les fonctions mesurées ne font que tester l'absence de trace
+    panneau = st.sidebar.expander("Performance")
+    with panneau:
+        st.checkbox("Mesurer les exécutions", key='performance_actif')
+        st.checkbox("Mesurer les allocations (plus lent)", key='performance_memoire',
+                    disabled=not st.session_state.get('performance_actif'))
+
+    navigation()
+    with panneau:
+        performance_panel()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file